@@ -0,0 +1,247 @@
+"""
+Walk-forward backtest of every forecaster tier.
+
+For each user in risk_timeseries.csv, rolling forecast origins are placed
+every --step days from --start-frac of the series onwards (the default 0.8
+keeps per-user models out of their own training split). At each origin,
+each tier forecasts --horizon days from the last --window days of history
+(what callers actually send), and the forecast is scored against the days
+that really followed. The published global_user model is fit on every row
+of the training CSV, so its scores on that file are in-sample; point --data
+at newer data for a like-for-like comparison.
+
+Reported per tier:
+- MAE / RMSE per horizon day
+- early-warning calibration: the rule from routes/recommendations.py is
+  applied to the forecast and to the realized series, giving precision,
+  recall and predicted vs. actual warning rate
+- forecast latency percentiles (one full multi-day forecast per call), for
+  models already loaded and compiled; the first call per user, which loads
+  and compiles the model, is timed separately as cold_ms
+
+Users are evaluated in parallel worker processes. With --baseline, the run
+exits non-zero if any tier's mean MAE regresses by more than --tolerance.
+
+Usage: python backtest_forecasters.py [--tiers per_user,global_7lag,...]
+                                      [--workers 4] [--out report.json]
+                                      [--baseline old.json --tolerance 0.05]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+warnings.filterwarnings('ignore')
+
+import numpy as np
+import pandas as pd
+
+DATA_DIR = Path("data/training_data")
+REPORT_DIR = Path("reports")
+
+_predictor = None
+
+
+def _init_worker():
+    """One predictor per worker process; stdout info lines are silenced"""
+    global _predictor
+    from services.xgboost_service import XGBoostPredictor
+    sys.stdout = open(os.devnull, "w")
+    sys.stderr = open(os.devnull, "w")
+    _predictor = XGBoostPredictor()
+
+
+def _backtest_user(task):
+    """Evaluate every tier at every origin for one user; returns raw samples"""
+    from services.xgboost_service import detect_early_warning
+
+    user_id, dates, risks, tiers, horizon, window, step, start_frac = task
+    result = {tier: {"abs_err": [[] for _ in range(horizon)],
+                     "sq_err": [[] for _ in range(horizon)],
+                     "warnings": [],  # (predicted, actual) per origin
+                     "latency_ms": [],
+                     "cold_ms": []} for tier in tiers}
+
+    first = max(window, int(len(risks) * start_frac))
+    if first <= len(risks) - horizon:
+        # Models are loaded (and compiled) lazily on first use: time that call
+        # apart from the steady-state forecasts
+        as_of = datetime.strptime(dates[first - 1], "%Y-%m-%d")
+        for tier in tiers:
+            t0 = time.perf_counter()
+            if _predictor.forecast(tier, user_id, risks[first - window:first], horizon, as_of):
+                result[tier]["cold_ms"].append((time.perf_counter() - t0) * 1000)
+    for origin in range(first, len(risks) - horizon + 1, step):
+        history = risks[origin - window:origin]
+        actual = risks[origin:origin + horizon]
+        as_of = datetime.strptime(dates[origin - 1], "%Y-%m-%d")
+        current = history[-1]
+        actual_warning = detect_early_warning(
+            [{"predicted_risk": r, "days_ahead": d + 1} for d, r in enumerate(actual)], current)
+
+        for tier in tiers:
+            t0 = time.perf_counter()
+            preds = _predictor.forecast(tier, user_id, history, horizon, as_of)
+            elapsed = (time.perf_counter() - t0) * 1000
+            if not preds:
+                continue
+            out = result[tier]
+            out["latency_ms"].append(elapsed)
+            for d, p in enumerate(preds):
+                err = p["predicted_risk"] - actual[d]
+                out["abs_err"][d].append(abs(err))
+                out["sq_err"][d].append(err * err)
+            out["warnings"].append((detect_early_warning(preds, current), actual_warning))
+
+    return result
+
+
+def _merge(results, tiers, horizon):
+    merged = {tier: {"abs_err": [[] for _ in range(horizon)],
+                     "sq_err": [[] for _ in range(horizon)],
+                     "warnings": [], "latency_ms": [], "cold_ms": []} for tier in tiers}
+    for result in results:
+        for tier in tiers:
+            for d in range(horizon):
+                merged[tier]["abs_err"][d] += result[tier]["abs_err"][d]
+                merged[tier]["sq_err"][d] += result[tier]["sq_err"][d]
+            merged[tier]["warnings"] += result[tier]["warnings"]
+            merged[tier]["latency_ms"] += result[tier]["latency_ms"]
+            merged[tier]["cold_ms"] += result[tier]["cold_ms"]
+    return merged
+
+
+def _summarize(samples, horizon):
+    if not samples["latency_ms"]:
+        return {"available": False}
+
+    per_horizon = []
+    for d in range(horizon):
+        per_horizon.append({
+            "days_ahead": d + 1,
+            "mae": round(float(np.mean(samples["abs_err"][d])), 4),
+            "rmse": round(float(np.sqrt(np.mean(samples["sq_err"][d]))), 4),
+            "n": len(samples["abs_err"][d]),
+        })
+
+    pairs = samples["warnings"]
+    tp = sum(1 for p, a in pairs if p and a)
+    fp = sum(1 for p, a in pairs if p and not a)
+    fn = sum(1 for p, a in pairs if not p and a)
+    tn = len(pairs) - tp - fp - fn
+    latency = np.array(samples["latency_ms"])
+    cold = np.array(samples["cold_ms"] or [np.nan])
+
+    return {
+        "available": True,
+        "origins": len(pairs),
+        "mean_mae": round(float(np.mean([h["mae"] for h in per_horizon])), 4),
+        "per_horizon": per_horizon,
+        "early_warning": {
+            "tp": tp, "fp": fp, "fn": fn, "tn": tn,
+            "precision": round(tp / (tp + fp), 4) if tp + fp else None,
+            "recall": round(tp / (tp + fn), 4) if tp + fn else None,
+            "predicted_rate": round((tp + fp) / len(pairs), 4),
+            "actual_rate": round((tp + fn) / len(pairs), 4),
+        },
+        "latency_ms": {
+            "p50": round(float(np.percentile(latency, 50)), 3),
+            "p90": round(float(np.percentile(latency, 90)), 3),
+            "p99": round(float(np.percentile(latency, 99)), 3),
+        },
+        "cold_ms": {
+            "p50": round(float(np.percentile(cold, 50)), 3),
+            "max": round(float(np.max(cold)), 3),
+            "n": len(samples["cold_ms"]),
+        },
+    }
+
+
+def _regressions(report, baseline, tolerance):
+    """Tiers whose mean MAE is worse than the baseline by more than `tolerance` (relative)"""
+    failed = []
+    for tier, summary in report["tiers"].items():
+        old = baseline.get("tiers", {}).get(tier, {})
+        if summary.get("available") and old.get("available"):
+            if summary["mean_mae"] > old["mean_mae"] * (1 + tolerance):
+                failed.append(f"{tier}: mean MAE {old['mean_mae']} -> {summary['mean_mae']}")
+    return failed
+
+
+def main():
+    from services.xgboost_service import XGBoostPredictor
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", default=str(DATA_DIR / "risk_timeseries.csv"))
+    parser.add_argument("--tiers", default=",".join(XGBoostPredictor.TIERS))
+    parser.add_argument("--horizon", type=int, default=7)
+    parser.add_argument("--window", type=int, default=7, help="days of history given to each forecast")
+    parser.add_argument("--step", type=int, default=1, help="days between forecast origins")
+    parser.add_argument("--start-frac", type=float, default=0.8)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--out", help="report path (default: reports/backtest-<timestamp>.json)")
+    parser.add_argument("--baseline", help="previous report to compare mean MAE against")
+    parser.add_argument("--tolerance", type=float, default=0.05)
+    args = parser.parse_args()
+
+    tiers = [t.strip() for t in args.tiers.split(",") if t.strip()]
+    unknown = set(tiers) - set(XGBoostPredictor.TIERS)
+    if unknown:
+        parser.error(f"unknown tiers: {sorted(unknown)}")
+
+    df = pd.read_csv(args.data).sort_values(["user_id", "date"])
+    tasks = [
+        (user_id, g["date"].tolist(), g["risk_score"].astype(float).tolist(),
+         tiers, args.horizon, args.window, args.step, args.start_frac)
+        for user_id, g in df.groupby("user_id")
+    ]
+
+    print(f"Backtesting {len(tiers)} tiers over {len(tasks)} users with {args.workers} workers...")
+    t0 = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker) as pool:
+        results = list(pool.map(_backtest_user, tasks, chunksize=max(1, len(tasks) // (4 * args.workers))))
+    elapsed = time.perf_counter() - t0
+
+    merged = _merge(results, tiers, args.horizon)
+    report = {
+        "created_at": datetime.now().isoformat(),
+        "model_version": XGBoostPredictor().version,
+        "config": {k: getattr(args, k) for k in ("data", "horizon", "window", "step", "start_frac")},
+        "users": len(tasks),
+        "elapsed_seconds": round(elapsed, 2),
+        "tiers": {tier: _summarize(merged[tier], args.horizon) for tier in tiers},
+    }
+
+    out = Path(args.out) if args.out else REPORT_DIR / f"backtest-{datetime.now():%Y%m%dT%H%M%S}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(report, f, indent=2)
+
+    for tier, summary in report["tiers"].items():
+        if not summary["available"]:
+            print(f"  {tier:12} no model available")
+            continue
+        ew = summary["early_warning"]
+        print(f"  {tier:12} MAE d1={summary['per_horizon'][0]['mae']:.3f} "
+              f"d{args.horizon}={summary['per_horizon'][-1]['mae']:.3f} mean={summary['mean_mae']:.3f} | "
+              f"EW precision={ew['precision']} recall={ew['recall']} | "
+              f"p50={summary['latency_ms']['p50']}ms p99={summary['latency_ms']['p99']}ms "
+              f"cold p50={summary['cold_ms']['p50']}ms")
+    print(f"✓ Report written to {out} ({elapsed:.1f}s)")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            failed = _regressions(report, json.load(f), args.tolerance)
+        if failed:
+            print("✗ Regressions vs baseline:\n  " + "\n  ".join(failed))
+            sys.exit(1)
+        print("✓ No regressions vs baseline")
+
+
+if __name__ == "__main__":
+    main()
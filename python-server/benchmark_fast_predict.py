@@ -0,0 +1,157 @@
+"""
+Parity check and microbenchmark for services/fast_predict.py.
+
+Parity: every per-user model (plus the global forecasters, when published)
+is scored on real feature rows built from risk_timeseries.csv and on random
+rows with NaNs mixed in, through model.predict and through the compiled
+forest; the largest absolute difference is reported per tier and the run
+fails if it exceeds --tolerance.
+
+Latency: p50 / p99 per call of a single-row predict via model.predict,
+Booster.inplace_predict and CompiledForest.predict, and of a full 7-day
+XGBoostPredictor forecast with FAST_PREDICT on and off (with every model
+already compiled for "on").
+
+Usage: python benchmark_fast_predict.py [--calls 2000] [--tolerance 1e-4] [--out report.json]
+"""
+
+import argparse
+import json
+import sys
+import time
+import warnings
+warnings.filterwarnings('ignore')
+
+import numpy as np
+import pandas as pd
+
+import services.fast_predict as fast_predict
+from services.fast_predict import CompiledForest
+from services.xgboost_service import XGBoostPredictor, step_features
+from train_global_forecaster import DATA_DIR
+
+
+def percentiles(samples_ms):
+    return {
+        "p50_ms": round(float(np.percentile(samples_ms, 50)), 4),
+        "p99_ms": round(float(np.percentile(samples_ms, 99)), 4),
+    }
+
+
+def time_calls(fn, calls):
+    fn()  # warm up
+    samples = []
+    for _ in range(calls):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return percentiles(samples)
+
+
+def feature_rows(df, n_features):
+    """Serving-time feature rows (lags, rolling stats, trend, day of week) from the real series"""
+    rows = []
+    for _, user_data in df.groupby('user_id'):
+        risks = user_data.sort_values('date')['risk_score'].astype(float).tolist()
+        dates = pd.to_datetime(user_data.sort_values('date')['date']).tolist()
+        for i in range(7, len(risks), 5):
+            rows.append(step_features(risks[:i], dates[i]))
+    X = np.array(rows, dtype=float)
+    if n_features > X.shape[1]:  # cross-user model: summary features too
+        X = np.column_stack([X, X[:, 8], X[:, 10], np.random.default_rng(0).integers(-1, 3, len(X))])
+    return X[:, :n_features]
+
+
+def random_rows(rng, n, n_features, nan_rate=0.1):
+    X = rng.uniform(0, 10, (n, n_features))
+    X[rng.random((n, n_features)) < nan_rate] = np.nan
+    return X
+
+
+def max_diff(model, compiled, X):
+    single = max(abs(float(model.predict(X[i:i + 1])[0]) - float(compiled.predict(X[i:i + 1])[0]))
+                 for i in range(min(len(X), 200)))
+    batch = float(np.max(np.abs(model.predict(X) - compiled.predict(X)))) if len(X) else 0.0
+    return max(single, batch)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=2000, help="calls per latency measurement")
+    parser.add_argument("--tolerance", type=float, default=1e-4, help="max allowed |model.predict - compiled|")
+    parser.add_argument("--out", help="write the JSON report here as well as stdout")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    df = pd.read_csv(DATA_DIR / "risk_timeseries.csv")
+    predictor = XGBoostPredictor()
+    predictor._preload(predictor._snapshot)
+    snapshot = predictor._snapshot
+
+    tiers = {"per_user": [model for model, _ in snapshot.users.values()]}
+    bundle = predictor._load_global_user_model(snapshot)
+    if bundle is not None:
+        tiers["global_user"] = [bundle["model"]]
+    if predictor._load_global_model(snapshot) is not None:
+        tiers["global_7lag"] = [snapshot.global_model]
+
+    # --- Parity ---
+    parity, failed = {}, False
+    for tier, models in tiers.items():
+        if not models:
+            continue
+        n_features = models[0].n_features_in_
+        real = feature_rows(df, n_features)
+        diffs = []
+        for model in models:
+            compiled = CompiledForest.from_model(model)
+            diffs.append(max(max_diff(model, compiled, real), max_diff(model, compiled, random_rows(rng, 500, n_features))))
+        parity[tier] = {"models": len(models), "max_abs_diff": float(max(diffs))}
+        failed |= max(diffs) > args.tolerance
+
+    # --- Single-row latency, on the first model of each tier ---
+    latency = {}
+    for tier, models in tiers.items():
+        if not models:
+            continue
+        model = models[0]
+        compiled = CompiledForest.from_model(model)
+        booster = model.get_booster()
+        x = feature_rows(df, model.n_features_in_)[:1]
+        latency[tier] = {
+            "model.predict": time_calls(lambda: model.predict(x), args.calls),
+            "inplace_predict": time_calls(lambda: booster.inplace_predict(x), args.calls),
+            "compiled": time_calls(lambda: compiled.predict(x), args.calls),
+            "trees": len(compiled.roots),
+            "depth": compiled.depth,
+        }
+
+    # --- Full 7-day forecast through the predictor ---
+    users = list(snapshot.users)
+    window = [5.1, 5.4, 5.0, 5.8, 6.1, 6.0, 6.3]
+    forecast = {}
+    for label, enabled in (("fast_predict_off", False), ("fast_predict_on", True)):
+        fast_predict.FAST_PREDICT = enabled
+        if enabled:
+            # compile every model first, as services/warmup.py does, so the
+            # timed calls measure steady-state forecasts rather than compiles
+            for models in tiers.values():
+                for model in models:
+                    fast_predict.fast_model(model)
+        it = iter(np.resize(users, args.calls // 4 + 1)) if users else None
+        if users:
+            forecast[label] = time_calls(
+                lambda: predictor.predict(next(it), days_ahead=7, recent_risks=window), args.calls // 4)
+
+    report = {"parity": parity, "single_row_latency": latency, "forecast_7d_latency": forecast}
+    print(json.dumps(report, indent=2))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+    if failed:
+        print(f"FAIL: compiled predictions differ by more than {args.tolerance}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Benchmark the global cross-user forecaster against the per-user models.
+
+Compares, on the same last-20%-of-days holdout per user:
+- accuracy:  one-step-ahead MAE / RMSE
+- memory:    on-disk size and RSS growth from loading each tier
+- latency:   p50 / p99 of a 7-day forecast through XGBoostPredictor
+
+The global model is retrained here on the 80% split so the comparison is
+fair (the published model is fit on every row).
+
+Usage: python benchmark_global_forecaster.py [--calls 500] [--out report.json]
+"""
+
+import argparse
+import gc
+import json
+import os
+import pickle
+import time
+import warnings
+warnings.filterwarnings('ignore')
+
+import numpy as np
+import pandas as pd
+
+from services.xgboost_service import XGBoostPredictor, step_features
+from train_global_forecaster import DATA_DIR, build_dataset, fit_global_model, load_user_types
+
+
+def rss_mb():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+
+
+def percentiles(samples_ms):
+    return {
+        "p50_ms": round(float(np.percentile(samples_ms, 50)), 3),
+        "p99_ms": round(float(np.percentile(samples_ms, 99)), 3),
+    }
+
+
+def per_user_holdout(df, predictor, split=0.8):
+    """One-step-ahead predictions of the per-user models on each user's holdout"""
+    y_true, y_pred = [], []
+    for user_id, user_data in df.groupby('user_id'):
+        model, scaler = predictor._load_model(user_id)
+        if model is None:
+            continue
+        user_data = user_data.sort_values('date')
+        risks = user_data['risk_score'].astype(float).tolist()
+        dates = pd.to_datetime(user_data['date']).tolist()
+        for i in range(max(7, int(len(risks) * split)), len(risks)):
+            x = scaler.transform(np.array(step_features(risks[:i], dates[i]), dtype=float).reshape(1, -1))
+            y_true.append(risks[i])
+            y_pred.append(float(np.clip(model.predict(x)[0], 0, 10)))
+    return np.array(y_true), np.array(y_pred)
+
+
+def errors(y_true, y_pred):
+    return {
+        "mae": round(float(np.mean(np.abs(y_true - y_pred))), 4),
+        "rmse": round(float(np.sqrt(np.mean((y_true - y_pred) ** 2))), 4),
+        "rows": int(len(y_true)),
+    }
+
+
+def time_calls(fn, calls):
+    fn()  # warm up
+    samples = []
+    for _ in range(calls):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return percentiles(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=500, help="forecast calls per tier for latency")
+    parser.add_argument("--out", help="write the JSON report here as well as stdout")
+    args = parser.parse_args()
+
+    df = pd.read_csv(DATA_DIR / "risk_timeseries.csv")
+    user_type_by_user, user_types = load_user_types()
+    user_ids = sorted(df['user_id'].unique())
+    window = df.sort_values('date').groupby('user_id')['risk_score'].apply(lambda s: s.tail(7).tolist())
+
+    # --- Per-user tier ---
+    gc.collect()
+    rss_before = rss_mb()
+    predictor = XGBoostPredictor()
+    predictor._preload(predictor._snapshot)
+    per_user_rss = rss_mb() - rss_before
+    per_user_files = list(predictor.model_dir.glob("user_*_*.pkl"))
+    per_user_disk = sum(p.stat().st_size for p in per_user_files)
+
+    y_true_pu, y_pred_pu = per_user_holdout(df, predictor)
+
+    # --- Global tier (trained on the 80% split) ---
+    X_train, y_train, X_test, y_test = build_dataset(df, user_type_by_user, user_types)
+    blob = pickle.dumps({
+        'model': fit_global_model(X_train, y_train),
+        'user_types': user_types,
+        'user_type_by_user': user_type_by_user,
+    })
+    gc.collect()
+    rss_before = rss_mb()
+    bundle = pickle.loads(blob)
+    global_rss = rss_mb() - rss_before
+    global_disk = len(blob)
+    y_pred_gl = np.clip(bundle['model'].predict(X_test), 0, 10)
+
+    # --- Latency of full 7-day forecasts, cycling through users ---
+    it = iter(np.resize(user_ids, args.calls + 1))
+    per_user_latency = time_calls(
+        lambda: predictor.predict(next(it), days_ahead=7, recent_risks=window[user_ids[0]]), args.calls)
+    it = iter(np.resize(user_ids, args.calls + 1))
+    global_latency = time_calls(
+        lambda: predictor.predict_global(next(it), window[user_ids[0]], 7, bundle), args.calls)
+
+    report = {
+        "users": len(user_ids),
+        "per_user": {
+            **errors(y_true_pu, y_pred_pu), **per_user_latency,
+            "files": len(per_user_files),
+            "disk_mb": round(per_user_disk / 2**20, 3),
+            "rss_mb": round(per_user_rss, 1),
+        },
+        "global": {
+            **errors(y_test, y_pred_gl), **global_latency,
+            "files": 1,
+            "disk_mb": round(global_disk / 2**20, 3),
+            "rss_mb": round(global_rss, 1),
+        },
+    }
+    print(json.dumps(report, indent=2))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
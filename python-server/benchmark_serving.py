@@ -0,0 +1,234 @@
+"""
+Single-process vs. multi-process serving: memory per worker and throughput.
+
+Starts the app twice on a free port:
+- uvicorn:   `uvicorn server:app`, one process (the previous Dockerfile CMD)
+- gunicorn:  `gunicorn -c gunicorn.conf.py server:app` with --workers workers
+             forked from a master that preloaded the models
+
+and for each reports
+- memory:      RSS, PSS (shared pages split between the processes sharing
+               them) and private (USS) per process, after startup and again
+               after the load; the sum of PSS is what the setup really costs
+- throughput:  requests/s, p50 / p99 latency and errors for --requests
+               requests at --concurrency, cycling through --workload
+
+The load generator runs on the same machine, so keep --concurrency modest
+on small hosts and compare the two modes rather than absolute numbers.
+
+Usage: python benchmark_serving.py [--workers 4] [--requests 2000] [--concurrency 32]
+                                   [--workload hatespeech,sentiment,predict] [--out report.json]
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+import numpy as np
+import pandas as pd
+
+from train_global_forecaster import DATA_DIR
+
+TEXTS = [
+    "I had a really good day with my friends today",
+    "I can't sleep and everything feels pointless lately",
+    "Work has been stressful but I'm managing",
+    "Nobody would even notice if I disappeared",
+]
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def process_tree(pid):
+    """pid and all its descendants"""
+    children = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+    tree, todo = [], [pid]
+    while todo:
+        p = todo.pop()
+        tree.append(p)
+        todo.extend(children.get(p, []))
+    return tree
+
+
+def memory_mb(pid):
+    fields = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 2 and parts[0].endswith(":") and parts[1].isdigit():
+                    fields[parts[0][:-1]] = int(parts[1]) / 1024
+    except OSError:
+        return None
+    return {
+        "rss_mb": round(fields.get("Rss", 0), 1),
+        "pss_mb": round(fields.get("Pss", 0), 1),
+        "private_mb": round(fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0), 1),
+    }
+
+
+def memory_report(pid):
+    processes = {p: m for p in process_tree(pid) if (m := memory_mb(p)) is not None}
+    return {
+        "processes": [{"pid": p, **m} for p, m in processes.items()],
+        "total_rss_mb": round(sum(m["rss_mb"] for m in processes.values()), 1),
+        "total_pss_mb": round(sum(m["pss_mb"] for m in processes.values()), 1),
+    }
+
+
+def requests_for(workloads, user_ids):
+    """Endless (method, path, json) cycle over the chosen workloads"""
+    users = itertools.cycle(user_ids or ["1"])
+    texts = itertools.cycle(TEXTS)
+    makers = {
+        "hatespeech": lambda: ("POST", "/hatespeech/analyze", {"text": next(texts)}),
+        "sentiment": lambda: ("POST", "/sentiment/analyze", {"text": next(texts)}),
+        "predict": lambda: ("GET", f"/api/predict/{next(users)}?days=7", None),
+        "weights": lambda: ("GET", "/api/risk-weights", None),
+    }
+    for name in itertools.cycle(workloads):
+        yield makers[name]()
+
+
+async def run_load(base_url, workloads, user_ids, total, concurrency):
+    plan = requests_for(workloads, user_ids)
+    latencies, errors = [], 0
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=60,
+                                 limits=httpx.Limits(max_connections=concurrency)) as client:
+        async def one():
+            nonlocal errors
+            method, path, body = next(plan)
+            t0 = time.perf_counter()
+            try:
+                response = await client.request(method, path, json=body)
+                if response.status_code >= 400:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append((time.perf_counter() - t0) * 1000)
+
+        async def worker(n):
+            for _ in range(n):
+                await one()
+
+        await asyncio.gather(*(worker(max(1, concurrency // 4)) for _ in range(concurrency)))  # warm up
+        latencies.clear()
+        errors = 0
+        started = time.perf_counter()
+        per_worker = [total // concurrency + (i < total % concurrency) for i in range(concurrency)]
+        await asyncio.gather(*(worker(n) for n in per_worker))
+        elapsed = time.perf_counter() - started
+
+    return {
+        "requests": total,
+        "errors": errors,
+        "seconds": round(elapsed, 2),
+        "requests_per_second": round(total / elapsed, 1),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 1),
+        "p99_ms": round(float(np.percentile(latencies, 99)), 1),
+    }
+
+
+def start_server(mode, app, workers, port):
+    env = {**os.environ, "PORT": str(port)}
+    if mode == "uvicorn":
+        cmd = [sys.executable, "-m", "uvicorn", app, "--host", "127.0.0.1", "--port", str(port)]
+    else:
+        env["WEB_CONCURRENCY"] = str(workers)
+        cmd = [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "--bind", f"127.0.0.1:{port}", app]
+    return subprocess.Popen(cmd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                            start_new_session=True)
+
+
+def wait_ready(process, base_url, timeout, expected_processes):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"server exited with code {process.returncode}")
+        try:
+            if httpx.get(f"{base_url}/health", timeout=2).status_code == 200 and \
+                    len(process_tree(process.pid)) >= expected_processes:
+                return time.monotonic() - (deadline - timeout)
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f"server not ready after {timeout}s")
+
+
+def bench_mode(mode, args, user_ids):
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    print(f"[benchmark_serving] {mode}: starting", file=sys.stderr)
+    process = start_server(mode, args.app, args.workers, port)
+    try:
+        ready = wait_ready(process, base_url, args.startup_timeout, 1 if mode == "uvicorn" else args.workers + 1)
+        idle = memory_report(process.pid)
+        load = asyncio.run(run_load(base_url, args.workload.split(","), user_ids, args.requests, args.concurrency))
+        loaded = memory_report(process.pid)
+    finally:
+        os.killpg(process.pid, signal.SIGTERM)
+        try:
+            process.wait(30)
+        except subprocess.TimeoutExpired:
+            os.killpg(process.pid, signal.SIGKILL)
+    print(f"[benchmark_serving] {mode}: {load['requests_per_second']} req/s, "
+          f"{loaded['total_pss_mb']} MB PSS", file=sys.stderr)
+    return {"processes": 1 if mode == "uvicorn" else args.workers, "startup_seconds": round(ready, 1),
+            "memory_idle": idle, "memory_after_load": loaded, "throughput": load}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--app", default="server:app")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="gunicorn workers")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--workload", default="hatespeech,sentiment,predict",
+                        help="comma-separated: hatespeech, sentiment, predict, weights")
+    parser.add_argument("--startup-timeout", type=float, default=300)
+    parser.add_argument("--out", help="write the JSON report here as well as stdout")
+    args = parser.parse_args()
+
+    user_ids = []
+    if "predict" in args.workload:
+        user_ids = [str(u) for u in pd.read_csv(DATA_DIR / "risk_timeseries.csv")["user_id"].unique()]
+
+    report = {mode: bench_mode(mode, args, user_ids) for mode in ("uvicorn", "gunicorn")}
+    single, multi = report["uvicorn"], report["gunicorn"]
+    report["summary"] = {
+        "workers": args.workers,
+        "throughput_ratio": round(multi["throughput"]["requests_per_second"] /
+                                  single["throughput"]["requests_per_second"], 2),
+        "pss_mb_per_worker": round(multi["memory_after_load"]["total_pss_mb"] / args.workers, 1),
+        "pss_mb_single_process": single["memory_after_load"]["total_pss_mb"],
+    }
+    print(json.dumps(report, indent=2))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
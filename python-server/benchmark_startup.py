@@ -0,0 +1,119 @@
+"""
+Cold-start profile: how long `import server` takes, and where the time goes.
+
+Imports the app in fresh interpreters (what a new replica or gunicorn
+master does before it can answer /health) and reports
+- import_seconds:  median wall time of `import server` over --runs runs
+- packages:        import time per top-level package (self time summed over
+                   its modules, from `python -X importtime`)
+- app_modules:     cumulative import time of each routes.* / services.* module
+- heavy_loaded:    heavy dependencies (torch, transformers, xgboost, textblob,
+                   sklearn, scipy) imported at startup; they should only be
+                   imported on first use
+
+and exits with status 1 if the median goes over --budget-ms
+(IMPORT_BUDGET_MS, default 1500) or a heavy dependency is loaded, so CI can
+run it as a check.
+
+Usage: python benchmark_startup.py [--runs 5] [--budget-ms 1500] [--top 15] [--out report.json]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+
+HEAVY = ("torch", "transformers", "xgboost", "textblob", "nltk", "sklearn", "scipy")
+
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - started
+print(json.dumps({{"seconds": elapsed, "modules": sorted(sys.modules)}}))
+"""
+
+
+def run_probe(module, env):
+    """Import `module` in a fresh interpreter: (seconds, loaded module names)"""
+    result = subprocess.run([sys.executable, "-c", PROBE.format(module=module)], cwd=HERE, env=env,
+                            capture_output=True, text=True, check=True)
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+    return report["seconds"], report["modules"]
+
+
+def import_profile(module, env):
+    """Parse `python -X importtime`: [(self_us, cumulative_us, depth, name), ...]"""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=HERE, env=env,
+                            capture_output=True, text=True, check=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((int(self_us), int(cumulative_us), depth, name.strip()))
+    return rows
+
+
+def summarize(rows, top):
+    packages = defaultdict(int)
+    for self_us, _, _, name in rows:
+        packages[name.split(".")[0]] += self_us
+    app_modules = {name: cumulative_us for _, cumulative_us, _, name in rows
+                   if name.startswith(("routes.", "services."))}
+    by_time = lambda d: sorted(d.items(), key=lambda kv: kv[1], reverse=True)[:top]  # noqa: E731
+    return {
+        "packages_ms": {name: round(us / 1000, 1) for name, us in by_time(packages)},
+        "app_modules_ms": {name: round(us / 1000, 1) for name, us in by_time(app_modules)},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="server", help="module to import (default: server)")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=float(os.environ.get("IMPORT_BUDGET_MS", "1500")))
+    parser.add_argument("--top", type=int, default=15, help="rows per table")
+    parser.add_argument("--out", help="write the JSON report here as well as stdout")
+    args = parser.parse_args()
+
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [str(HERE), os.environ.get("PYTHONPATH")]))}
+    run_probe(args.module, env)  # compiles the bytecode and fills the OS page cache; not counted
+    runs = [run_probe(args.module, env) for _ in range(args.runs)]
+    seconds = [s for s, _ in runs]
+    heavy = sorted({name for name in runs[-1][1] if name.split(".")[0] in HEAVY and "." not in name})
+
+    median_ms = statistics.median(seconds) * 1000
+    report = {
+        "module": args.module,
+        "import_seconds": {"median": round(median_ms / 1000, 3), "min": round(min(seconds), 3),
+                           "max": round(max(seconds), 3), "runs": args.runs},
+        "budget_ms": args.budget_ms,
+        "heavy_loaded": heavy,
+        **summarize(import_profile(args.module, env), args.top),
+    }
+    failures = []
+    if median_ms > args.budget_ms:
+        failures.append(f"import took {median_ms:.0f} ms, over the {args.budget_ms:.0f} ms budget")
+    if heavy:
+        failures.append(f"heavy dependencies imported at startup: {', '.join(heavy)}")
+    report["ok"] = not failures
+
+    print(json.dumps(report, indent=2))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+    for failure in failures:
+        print(f"[benchmark_startup] FAIL: {failure}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Build the on-disk recommendation retrieval index.
+
+Streams recommendation_pairs.csv in chunks and writes, to --out
+(default data/retrieval_index, or RECOMMENDATION_INDEX_DIR):
+
+    vectors.npy          float32 [rows, dim]  hashed, L2-normalized contexts
+    helpfulness.npy      float32 [rows]
+    rec_ids.npy          int32   [rows]       row -> distinct recommendation
+    recommendations.jsonl                     one distinct recommendation per line
+    rec_offsets.npy      int64   [recs + 1]   byte offsets into the .jsonl
+    meta.json
+
+Everything except the distinct-recommendation map is written through a
+memory map, so building millions of pairs needs little RAM. The server
+opens the files with mmap_mode="r" on first use; files are built in a
+temporary directory and swapped in with a rename.
+
+Usage: python build_recommendation_index.py [--pairs file.csv] [--out dir]
+"""
+
+import argparse
+import json
+import shutil
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from services.recommendation_retrieval import INDEX_DIR, PAIRS_FILE, RETRIEVAL_DIM, vectorize
+
+CHUNK_ROWS = 100_000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pairs", default=str(PAIRS_FILE))
+    parser.add_argument("--out", default=str(INDEX_DIR))
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    out = Path(args.out)
+    tmp = out.with_name(out.name + ".tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+
+    rows = sum(len(chunk) for chunk in pd.read_csv(args.pairs, usecols=["helpfulness_score"], chunksize=CHUNK_ROWS))
+    print(f"Indexing {rows} pairs from {args.pairs}...")
+
+    vectors = np.lib.format.open_memmap(tmp / "vectors.npy", mode="w+", dtype=np.float32, shape=(rows, RETRIEVAL_DIM))
+    helpfulness = np.lib.format.open_memmap(tmp / "helpfulness.npy", mode="w+", dtype=np.float32, shape=(rows,))
+    rec_ids = np.lib.format.open_memmap(tmp / "rec_ids.npy", mode="w+", dtype=np.int32, shape=(rows,))
+
+    rec_id_by_text, offsets = {}, [0]
+    row = 0
+    with open(tmp / "recommendations.jsonl", "wb") as rec_file:
+        for chunk in pd.read_csv(args.pairs, chunksize=CHUNK_ROWS):
+            n = len(chunk)
+            vectors[row:row + n] = np.vstack([vectorize(json.loads(c)) for c in chunk["input_context"]])
+            helpfulness[row:row + n] = chunk["helpfulness_score"].to_numpy(np.float32)
+            ids = []
+            for text in chunk["output_recommendation"]:
+                rec_id = rec_id_by_text.get(text)
+                if rec_id is None:
+                    rec_id = rec_id_by_text[text] = len(rec_id_by_text)
+                    line = json.dumps(json.loads(text), ensure_ascii=False).encode() + b"\n"
+                    rec_file.write(line)
+                    offsets.append(offsets[-1] + len(line))
+                ids.append(rec_id)
+            rec_ids[row:row + n] = ids
+            row += n
+
+    for arr in (vectors, helpfulness, rec_ids):
+        arr.flush()
+    del vectors, helpfulness, rec_ids
+    np.save(tmp / "rec_offsets.npy", np.array(offsets, dtype=np.int64))
+    with open(tmp / "meta.json", "w") as f:
+        json.dump({"rows": rows, "recommendations": len(offsets) - 1, "dim": RETRIEVAL_DIM,
+                   "source": str(args.pairs), "built_at": datetime.now().isoformat()}, f, indent=2)
+
+    old = out.with_name(out.name + ".old")
+    shutil.rmtree(old, ignore_errors=True)
+    if out.exists():
+        out.rename(old)
+    tmp.rename(out)
+    shutil.rmtree(old, ignore_errors=True)
+
+    print(f"✓ Index with {rows} pairs / {len(offsets) - 1} recommendations written to {out} "
+          f"({time.perf_counter() - t0:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+"""
+Run the population-wide early-warning sweep (services/early_warning.py).
+
+Forecasts every user with a recent score in the risk history store, applies
+the /api/recommendations early-warning rule, and writes the users it flags,
+ranked by forecast peak, to data/online/early_warnings/<date>.csv.
+
+Usage: python early_warning_sweep.py [--active-days 14] [--chunk 50000] [--as-of YYYY-MM-DD]
+"""
+
+import argparse
+import json
+from datetime import date
+
+from services.early_warning import SWEEP_ACTIVE_DAYS, SWEEP_CHUNK_USERS, EarlyWarningSweep
+from services.xgboost_service import XGBoostPredictor
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--active-days", type=int, default=SWEEP_ACTIVE_DAYS,
+                        help="skip users whose latest score is older than this")
+    parser.add_argument("--chunk", type=int, default=SWEEP_CHUNK_USERS, help="users per batched forecast")
+    parser.add_argument("--as-of", type=date.fromisoformat, default=None, help="forecast from this day (default today)")
+    args = parser.parse_args()
+
+    summary = EarlyWarningSweep(XGBoostPredictor()).run(args.active_days, args.chunk, args.as_of)
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Local stand-in for the Groq and Gemini REST APIs.
+
+Serves the endpoints services/llm_gateway.py calls (plain and streamed)
+and answers with canned, well-formed content: a question array for
+adaptive quiz prompts, a recommendation object for everything else. Latency and failures are
+configurable, so the gateway's pooling, timeouts and retries (and the
+endpoints built on it) can be exercised without network access or keys.
+
+Usage:
+    python fake_llm_server.py [--port 8765] [--latency 0.2] [--fail-rate 0.1]
+
+    GROQ_BASE_URL=http://127.0.0.1:8765/openai/v1 \\
+    GEMINI_BASE_URL=http://127.0.0.1:8765/v1beta \\
+    GROQ_API_KEY=fake GEMINI_API_KEY=fake uvicorn server:app
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import re
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+LATENCY_SECONDS = float(os.environ.get("FAKE_LLM_LATENCY", "0.2"))
+FAIL_RATE = float(os.environ.get("FAKE_LLM_FAIL_RATE", "0"))
+# Streamed responses: characters per chunk and delay between chunks
+STREAM_CHUNK_CHARS = 8
+TOKEN_DELAY_SECONDS = float(os.environ.get("FAKE_LLM_TOKEN_DELAY", "0.02"))
+
+app = FastAPI(title="Fake LLM API")
+_counter = itertools.count()
+stats = {"requests": 0, "failures": 0}
+
+
+def _completion(prompt: str) -> str:
+    n = next(_counter)
+    if "Reply ONLY as a JSON array" in prompt:
+        match = re.search(r"Generate exactly (\d+) targeted (\w+) questions", prompt)
+        count, category = (int(match.group(1)), match.group(2)) if match else (5, "general")
+        return json.dumps([
+            {"category": category, "type": "single_choice",
+             "question": f"Fake {category} question {n}-{i}: how has this been for you?",
+             "options": ["Very well", "Well", "Okay", "Poorly", "Very poorly"]}
+            for i in range(count)
+        ])
+    return json.dumps({
+        "motivational_message": f"Fake message {n}: showing up today counts.",
+        "coping_steps": ["Box breathing: inhale 4s, hold 4s, exhale 4s, hold 4s, for 5 minutes.",
+                         "Thought record: write down one worry and one piece of evidence against it."],
+    })
+
+
+async def _simulate():
+    """Sleep for the configured latency; return an error response or None"""
+    stats["requests"] += 1
+    await asyncio.sleep(random.uniform(0.5, 1.5) * LATENCY_SECONDS)
+    if random.random() < FAIL_RATE:
+        stats["failures"] += 1
+        return JSONResponse({"error": {"message": "simulated overload"}}, status_code=503)
+    return None
+
+
+def _sse(text: str, wrap):
+    async def events():
+        for i in range(0, len(text), STREAM_CHUNK_CHARS):
+            yield f"data: {json.dumps(wrap(text[i:i + STREAM_CHUNK_CHARS]))}\n\n"
+            await asyncio.sleep(TOKEN_DELAY_SECONDS)
+        yield "data: [DONE]\n\n"
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+@app.post("/openai/v1/chat/completions")
+async def groq_chat(request: Request):
+    body = await request.json()
+    error = await _simulate()
+    if error:
+        return error
+    prompt = body["messages"][-1]["content"]
+    if body.get("stream"):
+        return _sse(_completion(prompt), lambda t: {"choices": [{"index": 0, "delta": {"content": t}}]})
+    return {"choices": [{"index": 0, "message": {"role": "assistant", "content": _completion(prompt)}}]}
+
+
+@app.post("/v1beta/models/{model}:generateContent")
+async def gemini_generate(model: str, request: Request):
+    body = await request.json()
+    error = await _simulate()
+    if error:
+        return error
+    prompt = body["contents"][-1]["parts"][0]["text"]
+    return {"candidates": [{"content": {"role": "model", "parts": [{"text": _completion(prompt)}]}}]}
+
+
+@app.post("/v1beta/models/{model}:streamGenerateContent")
+async def gemini_stream(model: str, request: Request):
+    body = await request.json()
+    error = await _simulate()
+    if error:
+        return error
+    prompt = body["contents"][-1]["parts"][0]["text"]
+    return _sse(_completion(prompt), lambda t: {"candidates": [{"content": {"role": "model", "parts": [{"text": t}]}}]})
+
+
+@app.get("/stats")
+async def get_stats():
+    return stats
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=LATENCY_SECONDS)
+    parser.add_argument("--fail-rate", type=float, default=FAIL_RATE)
+    args = parser.parse_args()
+    LATENCY_SECONDS, FAIL_RATE = args.latency, args.fail_rate
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
@@ -0,0 +1,75 @@
+"""
+Multi-process serving:  gunicorn -c gunicorn.conf.py server:app
+
+The app is imported once in the gunicorn master (preload_app) and every
+model is loaded there (services/warmup.py) before the workers are forked, so
+toxic-bert, the XGBoost forecasters and the rest are shared copy-on-write
+rather than loaded once per worker. Each worker then runs its own event loop
+(UvicornWorker) with its own torch thread pool.
+
+    WEB_CONCURRENCY   worker processes (default: CPU count)
+    TORCH_THREADS     torch / OpenMP threads per worker (default: CPUs / workers)
+    PORT              listen port (default 8000)
+    METRICS_DIR       where workers share their /metrics values (default: a
+                      per-port directory under the system temp dir)
+    WARM_UP           1 (default): load the models in the master before forking;
+                      0: fork right away and let each worker load what it
+                      needs on first use (faster to start, more memory)
+
+WEB_CONCURRENCY=1 is the old single-process setup behind gunicorn's
+supervision. Compare the two with benchmark_serving.py.
+"""
+
+import gc
+import os
+import shutil
+import sys
+import tempfile
+
+_cpus = os.cpu_count() or 1
+
+workers = int(os.environ.get("WEB_CONCURRENCY", _cpus))
+TORCH_THREADS = int(os.environ.get("TORCH_THREADS", max(1, _cpus // workers)))
+# Read by torch, xgboost and numpy's BLAS when they are first imported
+os.environ.setdefault("OMP_NUM_THREADS", str(TORCH_THREADS))
+
+WARM_UP = os.environ.get("WARM_UP", "1") == "1"
+
+PORT = os.environ.get("PORT", "8000")
+bind = f"0.0.0.0:{PORT}"
+# Workers merge their /metrics values through this directory (services/metrics.py)
+os.environ.setdefault("METRICS_DIR", os.path.join(tempfile.gettempdir(), f"soulsync-metrics-{PORT}"))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+timeout = int(os.environ.get("WORKER_TIMEOUT", "120"))
+graceful_timeout = 30
+keepalive = 5
+
+
+def on_starting(server):
+    # Counters start from zero with a new master
+    shutil.rmtree(os.environ["METRICS_DIR"], ignore_errors=True)
+
+
+def when_ready(server):
+    """Master, after the app import and before the first fork: load everything"""
+    try:
+        import torch
+        torch.set_num_threads(1)  # no OpenMP pool in the master; it does not survive fork
+    except ImportError:
+        pass
+    if WARM_UP:
+        from services.warmup import warm_up
+        warm_up()
+    # Move everything loaded so far out of the collector's reach: a collection
+    # in a worker would otherwise write to (and so copy) every page it scans
+    gc.collect()
+    gc.freeze()
+    server.log.info("%s; forking %d worker(s) with %d torch thread(s) each",
+                    "Models loaded" if WARM_UP else "Warm-up skipped", workers, TORCH_THREADS)
+
+
+def post_fork(server, worker):
+    torch = sys.modules.get("torch")
+    if torch is not None:
+        torch.set_num_threads(TORCH_THREADS)
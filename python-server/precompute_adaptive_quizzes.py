@@ -0,0 +1,77 @@
+"""
+Materialize tomorrow's adaptive quiz for every active user.
+
+Reads the last category scores each user was served with (recorded by
+/api/adaptive-quiz), builds their quiz for --day from the question pool
+exactly as the endpoint would, and stores it pre-serialized in the
+precomputed quiz store. The endpoint then answers those users with a
+single lookup during the morning check-in rush; anyone whose scores have
+changed since, or who was not active, is still built live.
+
+Users whose last request used a different base quiz than
+data/dailyCheckinQuiz.json, or whose pool is short (and would need the
+LLM), are skipped and left to the live path.
+
+Run daily, e.g. from cron shortly before midnight:
+    python precompute_adaptive_quizzes.py [--day YYYY-MM-DD] [--active-days 7]
+"""
+
+import argparse
+import time
+from datetime import date, timedelta
+
+from routes.adaptive_quiz import HIGH_THRESHOLD, build_adaptive_quiz
+from services.precomputed_quizzes import quiz_fingerprint, quiz_store
+from services.question_bank import question_bank
+
+BATCH_SIZE = 500
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--day", default=(date.today() + timedelta(days=1)).isoformat(),
+                        help="quiz day to materialize (default: tomorrow)")
+    parser.add_argument("--active-days", type=float, default=7,
+                        help="only users seen within this many days")
+    parser.add_argument("--keep-days", type=int, default=2,
+                        help="drop materialized quizzes older than this many days before --day")
+    args = parser.parse_args()
+
+    base_hash, base_questions, _ = question_bank.base_quiz()
+    if base_questions is None:
+        parser.error("data/dailyCheckinQuiz.json not found")
+
+    t0 = time.perf_counter()
+    users = quiz_store.active_users(args.active_days * 86400)
+    print(f"Materializing {args.day} quizzes for {len(users)} active users...")
+
+    batch, stored, skipped = [], 0, {"not_elevated": 0, "other_base": 0, "pool_short": 0}
+    for user_id, score_map, user_base_hash in users:
+        if user_base_hash != base_hash:
+            skipped["other_base"] += 1
+            continue
+        if not any(score >= HIGH_THRESHOLD for score in score_map.values()):
+            skipped["not_elevated"] += 1
+            continue
+        quiz, complete = build_adaptive_quiz(score_map, base_questions, user_id, args.day)
+        if not complete:
+            skipped["pool_short"] += 1
+            continue
+        batch.append((user_id, quiz_fingerprint(score_map, base_hash), quiz))
+        if len(batch) >= BATCH_SIZE:
+            quiz_store.put_many(args.day, batch)
+            stored += len(batch)
+            batch = []
+    if batch:
+        quiz_store.put_many(args.day, batch)
+        stored += len(batch)
+
+    keep_from = (date.fromisoformat(args.day) - timedelta(days=args.keep_days)).isoformat()
+    pruned = quiz_store.prune(keep_from)
+
+    elapsed = time.perf_counter() - t0
+    print(f"✓ Stored {stored} quizzes in {elapsed:.1f}s, skipped {skipped}, pruned {pruned} old quizzes")
+
+
+if __name__ == "__main__":
+    main()
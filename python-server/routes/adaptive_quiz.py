@@ -1,50 +1,24 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request, Response
 from pydantic import BaseModel
-from typing import List, Optional, Dict
+from typing import List, Optional, Dict, Tuple
+import asyncio
+import fcntl
 import json
 import os
-import sys
-import hashlib
 from datetime import date
+from services.generated_questions import generated_store
+from services.llm_gateway import llm_gateway
+from services.log import get_logger
+from services.metrics import cache_requests
+from services.precomputed_quizzes import quiz_fingerprint, quiz_store
+from services.question_bank import SEVERITIES, base_quiz_hash, question_bank, severity_for_score
+
+log = get_logger(__name__)
 
 router = APIRouter()
 
-# ---------------------------------------------------------------------------
-# Load the full question pool from data/all_quiz.json at startup
-# ---------------------------------------------------------------------------
-_DATA_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "data")
-
-def _load_json(filename: str) -> dict:
-    path = os.path.join(_DATA_DIR, filename)
-    with open(path, "r", encoding="utf-8") as f:
-        content = f.read()
-        # Strip JS-style comments (the JSON files start with //)
-        lines = content.split("\n")
-        clean = "\n".join(l for l in lines if not l.strip().startswith("//"))
-        return json.loads(clean)
-
-_ALL_QUIZ = _load_json("all_quiz.json")
-_DAILY_QUIZ = _load_json("dailyCheckinQuiz.json")
-
-# Build the pool: questions from all_quiz that are NOT in the default daily set
-_DAILY_IDS = {q["id"] for q in _DAILY_QUIZ["questions"]}
-
-# Index the extra pool by category (exclude daily base + trivia/knowledge questions)
-_POOL_BY_CATEGORY: Dict[str, List[Dict]] = {}
-for q in _ALL_QUIZ["questions"]:
-    if q["id"] in _DAILY_IDS:
-        continue
-    cat = q.get("category", "")
-    if cat not in ("anxiety", "sleep", "stress", "depression"):
-        continue
-    # Skip trivia/knowledge questions (options starting with "A.", "B." etc.)
-    opts = q.get("options", [])
-    if opts and any(str(o).startswith(("A.", "B.", "C.", "D.", "E.", "F.", "G.")) for o in opts):
-        continue
-    _POOL_BY_CATEGORY.setdefault(cat, []).append(q)
-
-for cat, qs in _POOL_BY_CATEGORY.items():
-    print(f"[adaptive_quiz] Pool loaded: {cat} = {len(qs)} extra questions", file=sys.stderr)
+# Follow-up questions come from services.question_bank, which indexes every
+# quiz file in data/ and hot-reloads when the files change.
 
 
 # ---------------------------------------------------------------------------
@@ -60,7 +34,10 @@ class CategoryScores(BaseModel):
 
 class AdaptiveQuizRequest(BaseModel):
     category_scores: CategoryScores
-    base_questions: List[Dict]
+    # Either post the base quiz inline (legacy) or leave it out to use the
+    # server's copy; base_quiz_version pins that copy (412 if it changed)
+    base_questions: Optional[List[Dict]] = None
+    base_quiz_version: Optional[str] = None
     user_id: str = ""           # used for per-user seed
     today: str = ""             # YYYY-MM-DD — for daily rotation
 
@@ -71,6 +48,19 @@ HIGH_THRESHOLD = 0.5
 # How many follow-up questions per elevated category
 FOLLOWUP_COUNT = 5
 
+# Whole-request budget for LLM top-ups; late categories are served pool-only
+ADAPTIVE_QUIZ_DEADLINE_SECONDS = float(os.environ.get("ADAPTIVE_QUIZ_DEADLINE_SECONDS", "4"))
+# Start the backup provider if the first hasn't answered within this time
+LLM_HEDGE_SECONDS = float(os.environ.get("LLM_HEDGE_SECONDS", "1.5"))
+
+# Background top-up keeps at least this many generated questions per
+# category/severity band (curated questions, which fit every band, don't count)
+GENERATED_QUESTIONS_TARGET = int(os.environ.get("GENERATED_QUESTIONS_TARGET", "20"))
+GENERATED_TOPUP_SECONDS = float(os.environ.get("GENERATED_TOPUP_SECONDS", "600"))
+
+# Generated questions are served ahead of the curated files
+question_bank.add_source(generated_store)
+
 # Category order in the quiz
 _CATEGORY_ORDER = ["anxiety", "sleep", "stress", "depression"]
 
@@ -86,43 +76,24 @@ CATEGORY_META = {
 # Date-seeded question picker — different questions every day
 # ---------------------------------------------------------------------------
 
-def _pick_questions(category: str, count: int, user_id: str, today: str) -> List[Dict]:
+def _pick_questions(category: str, count: int, user_id: str, today: str,
+                    severity: Optional[str] = None) -> List[Dict]:
     """Pick `count` questions from the pool for `category`, rotated daily per user."""
-    pool = _POOL_BY_CATEGORY.get(category, [])
-    if not pool:
-        return []
-
-    # Create a deterministic seed from user_id + date so same user gets
-    # different questions each day, but the quiz is stable within a day
-    seed_str = f"{user_id}:{today}:{category}"
-    seed = int(hashlib.sha256(seed_str.encode()).hexdigest(), 16)
-
-    # Shuffle indices deterministically
-    indices = list(range(len(pool)))
-    # Simple Fisher-Yates with our seed
-    import random
-    rng = random.Random(seed)
-    rng.shuffle(indices)
-
-    picked = []
-    for idx in indices[:count]:
-        q = dict(pool[idx])  # shallow copy
+    # Deterministic seed from user_id + date so same user gets different
+    # questions each day, but the quiz is stable within a day
+    picked = question_bank.sample(category, count, f"{user_id}:{today}:{category}", severity)
+    for q in picked:
         q["is_adaptive"] = True
-        picked.append(q)
-
     return picked
 
 
 # ---------------------------------------------------------------------------
-# LLM fallback (only used when the pool has fewer questions than needed)
+# LLM generation (background top-ups, and the request path only when the
+# pool has fewer questions than needed)
 # ---------------------------------------------------------------------------
 
 def _build_category_prompt(category: str, score: float) -> str:
-    severity = "moderate"
-    if score >= 0.75:
-        severity = "severe"
-    elif score >= 0.6:
-        severity = "significant"
+    severity = severity_for_score(score)
 
     focus_map = {
         "sleep": "sleep onset, night wakings, sleep environment, pre-sleep habits, next-day impact, sleep hygiene",
@@ -142,28 +113,13 @@ Reply ONLY as a JSON array:
 [{{"category":"{category}","type":"single_choice","question":"...","options":["best","good","moderate","poor","worst"]}}]"""
 
 
-def _generate_via_gemini(prompt: str) -> str:
-    from google import genai
-    api_key = os.environ.get("GEMINI_API_KEY")
-    if not api_key:
-        raise ValueError("GEMINI_API_KEY not set")
-    client = genai.Client(api_key=api_key)
-    resp = client.models.generate_content(model="gemini-2.0-flash", contents=prompt)
-    return resp.text.strip()
+async def _generate_via_gemini(prompt: str) -> str:
+    return await llm_gateway.complete("gemini", prompt, model="gemini-2.0-flash")
 
 
-def _generate_via_groq(prompt: str) -> str:
-    import groq
-    api_key = os.environ.get("GROQ_API_KEY")
-    if not api_key:
-        raise ValueError("GROQ_API_KEY not set")
-    client = groq.Groq(api_key=api_key)
-    resp = client.chat.completions.create(
-        model="llama-3.3-70b-versatile",
-        messages=[{"role": "user", "content": prompt}],
-        temperature=0.7, max_tokens=1200,
-    )
-    return resp.choices[0].message.content.strip()
+async def _generate_via_groq(prompt: str) -> str:
+    return await llm_gateway.complete("groq", prompt, model="llama-3.3-70b-versatile",
+                                      temperature=0.7, max_tokens=1200)
 
 
 def _parse_llm_response(raw: str, category: str) -> List[Dict]:
@@ -182,24 +138,266 @@ def _parse_llm_response(raw: str, category: str) -> List[Dict]:
     return validated
 
 
-def _llm_generate(category: str, score: float) -> List[Dict]:
+_LLM_PROVIDERS = [("Groq", _generate_via_groq), ("Gemini", _generate_via_gemini)]
+
+
+async def _llm_generate(category: str, score: float) -> List[Dict]:
+    """
+    Hedged generation: start the first provider, and if it hasn't answered
+    within LLM_HEDGE_SECONDS (or fails), start the next one as well. The
+    first provider to return enough valid questions wins; the rest are
+    cancelled.
+    """
     prompt = _build_category_prompt(category, score)
-    for name, gen in [("Groq", _generate_via_groq), ("Gemini", _generate_via_gemini)]:
+
+    async def attempt(name, gen):
+        raw = await gen(prompt)
+        validated = _parse_llm_response(raw, category)
+        if len(validated) < 3:
+            raise ValueError(f"only {len(validated)} valid questions")
+        return name, validated
+
+    # Providers whose circuit is open would only fail; with none left the
+    # caller serves pool questions right away
+    providers = [(name, gen) for name, gen in _LLM_PROVIDERS if llm_gateway.available(name.lower())]
+    tasks = {}
+    try:
+        for i, (name, gen) in enumerate(providers):
+            tasks[asyncio.create_task(attempt(name, gen))] = name
+            is_last = i == len(providers) - 1
+            pending = {t for t in tasks if not t.done()}
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, timeout=None if is_last else LLM_HEDGE_SECONDS,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                for task in done:
+                    if task.exception() is None:
+                        winner, validated = task.result()
+                        log.info("LLM (%s) generated %d %s Qs", winner, len(validated), category)
+                        await asyncio.to_thread(_save_generated, category, score, validated, winner)
+                        return validated
+                    log.warning("LLM %s error for %s: %s", tasks[task], category, task.exception())
+                if not is_last:
+                    break  # slow or failed: hedge with the next provider
+        return []
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+def _save_generated(category: str, score: float, questions: List[Dict], provider: str):
+    """Keep generated questions for later requests and index them right away"""
+    try:
+        added = generated_store.add(category, severity_for_score(score), questions, source=provider)
+        if added:
+            question_bank.reload()
+    except Exception as e:
+        log.error("Could not store generated %s Qs: %s", category, e)
+
+
+async def _llm_top_up(shortfalls: Dict[str, int], score_map: Dict[str, float]) -> Dict[str, List[Dict]]:
+    """
+    Generate questions for every short category concurrently. Whatever has
+    not finished by ADAPTIVE_QUIZ_DEADLINE_SECONDS is dropped, and those
+    categories are served pool-only.
+    """
+    tasks = {cat: asyncio.create_task(_llm_generate(cat, score_map[cat])) for cat in shortfalls}
+    done, pending = await asyncio.wait(tasks.values(), timeout=ADAPTIVE_QUIZ_DEADLINE_SECONDS)
+    for task in pending:
+        task.cancel()
+
+    results = {}
+    for cat, task in tasks.items():
+        if task in done and task.exception() is None:
+            results[cat] = task.result()[:shortfalls[cat]]
+        elif task in pending:
+            log.warning("LLM deadline hit for %s, serving pool questions only", cat)
+    return results
+
+
+# Representative score per severity band, used in background prompts
+_BAND_SCORES = {"moderate": 0.55, "significant": 0.65, "severe": 0.85}
+
+_top_up_requested = asyncio.Event()
+
+
+async def _top_up_round():
+    for cat in _CATEGORY_ORDER:
+        for severity in SEVERITIES:
+            # Measured on the generated store: the curated files alone already
+            # fill every band of the bank past the target
+            before = await asyncio.to_thread(generated_store.count, cat, severity)
+            while before < GENERATED_QUESTIONS_TARGET:
+                await _llm_generate(cat, _BAND_SCORES[severity])
+                after = await asyncio.to_thread(generated_store.count, cat, severity)
+                if after <= before:
+                    return  # providers down or only duplicates came back; retry next round
+                before = after
+
+
+def _top_up_lock():
+    """Exclusive lock on the shared pool so one worker process tops up at a time; None if taken"""
+    generated_store.path.parent.mkdir(parents=True, exist_ok=True)
+    lock = open(generated_store.path.parent / ".topup.lock", "w")
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        lock.close()
+        return None
+    return lock
+
+
+async def top_up_generated_questions():
+    """
+    Background job: keep at least GENERATED_QUESTIONS_TARGET generated
+    questions in every category/severity band by generating (and storing)
+    more.
+    Runs every GENERATED_TOPUP_SECONDS, or sooner when a request came up short.
+    Under gunicorn every worker runs this loop; a round is skipped while
+    another worker's is in progress.
+    """
+    while True:
+        lock = _top_up_lock()
+        if lock is not None:
+            try:
+                await _top_up_round()
+            except Exception as e:
+                log.error("Question top-up failed: %s", e)
+            finally:
+                lock.close()
+
         try:
-            raw = gen(prompt)
-            validated = _parse_llm_response(raw, category)
-            if len(validated) >= 3:
-                print(f"[adaptive_quiz] LLM ({name}) generated {len(validated)} {category} Qs", file=sys.stderr)
-                return validated
-        except Exception as e:
-            print(f"[adaptive_quiz] LLM {name} error for {category}: {e}", file=sys.stderr)
-    return []
+            await asyncio.wait_for(_top_up_requested.wait(), timeout=GENERATED_TOPUP_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+        _top_up_requested.clear()
+
+
+# ---------------------------------------------------------------------------
+# Quiz assembly (pure: same inputs, same quiz)
+# ---------------------------------------------------------------------------
+
+def _score_map(scores: CategoryScores) -> Dict[str, float]:
+    return {
+        "sleep": scores.sleepScore,
+        "anxiety": scores.anxietyScore,
+        "stress": scores.stressScore,
+        "depression": scores.depressionScore,
+    }
+
+
+def _select_followups(score_map: Dict[str, float], user_id: str, today: str) -> Dict[str, List[Dict]]:
+    """Pool follow-ups for every elevated category (may be short)"""
+    return {
+        cat: _pick_questions(cat, FOLLOWUP_COUNT, user_id, today, severity_for_score(score_map[cat]))
+        for cat in _CATEGORY_ORDER if score_map[cat] >= HIGH_THRESHOLD
+    }
+
+
+def _assemble_quiz(score_map: Dict[str, float], generated: Dict[str, List[Dict]],
+                   base_questions: List[Dict]) -> Dict:
+    adaptations: Dict[str, Dict] = {}
+    for cat, pool_qs in generated.items():
+        adaptations[cat] = {
+            "adapted": True,
+            "reason": f"{CATEGORY_META[cat]['label']} score elevated ({score_map[cat]:.2f}). Showing detailed follow-up questions.",
+            "score": score_map[cat],
+            "questions_replaced": len(pool_qs),
+            "source": "question_pool",
+        }
+
+    # Mark non-adapted
+    for cat in _CATEGORY_ORDER:
+        if cat not in adaptations:
+            adaptations[cat] = {
+                "adapted": False,
+                "reason": f"{CATEGORY_META[cat]['label']} score within normal range.",
+                "score": score_map[cat],
+            }
+
+    if not generated:
+        return {"questions": base_questions, "adaptations": adaptations}
+
+    # Rebuild quiz: walk base questions, swap adapted categories
+    rebuilt: List[Dict] = []
+    seen: set = set()
+
+    for q in base_questions:
+        cat = q.get("category")
+        if cat in generated:
+            if cat not in seen:
+                rebuilt.extend(generated[cat])
+                seen.add(cat)
+            # skip original questions for this category
+        else:
+            rebuilt.append(dict(q))
+
+    # Re-number sequentially
+    for i, q in enumerate(rebuilt):
+        q["id"] = i + 1
+
+    return {"questions": rebuilt, "adaptations": adaptations}
+
+
+def build_adaptive_quiz(score_map: Dict[str, float], base_questions: List[Dict],
+                        user_id: str, today: str) -> Tuple[Dict, bool]:
+    """
+    Pool-only adaptive quiz for one user and day. Returns (quiz, complete);
+    complete is False when some category had fewer than FOLLOWUP_COUNT
+    pool questions (the endpoint would top those up from the LLM).
+    """
+    generated = _select_followups(score_map, user_id, today)
+    complete = all(len(qs) >= FOLLOWUP_COUNT for qs in generated.values())
+    return _assemble_quiz(score_map, generated, base_questions), complete
 
 
 # ---------------------------------------------------------------------------
 # Main endpoint
 # ---------------------------------------------------------------------------
 
+def _etag(version: str) -> str:
+    return f'"{version}"'
+
+
+def _resolve_base(body: AdaptiveQuizRequest):
+    """
+    (version, questions, serialized questions or None) for this request.
+    Inline base_questions win; otherwise the server copy is used, and a
+    base_quiz_version that doesn't match it is rejected with 412.
+    """
+    if body.base_questions is not None:
+        return base_quiz_hash(body.base_questions), body.base_questions, None
+    version, questions, serialized = question_bank.base_quiz()
+    if questions is None:
+        raise HTTPException(status_code=503, detail="Base quiz not available")
+    if body.base_quiz_version and body.base_quiz_version.strip('"') != version:
+        raise HTTPException(status_code=412, detail=f"Base quiz version is now {version}",
+                            headers={"ETag": _etag(version)})
+    return version, questions, serialized
+
+
+@router.get("/adaptive-quiz/base")
+async def get_base_quiz(request: Request):
+    """Server copy of the base daily check-in, with ETag revalidation"""
+    version, questions, serialized = question_bank.base_quiz()
+    if questions is None:
+        raise HTTPException(status_code=503, detail="Base quiz not available")
+    headers = {"ETag": _etag(version), "Cache-Control": "no-cache"}
+    if_none_match = request.headers.get("if-none-match", "")
+    if _etag(version) in if_none_match or if_none_match.strip() == "*":
+        return Response(status_code=304, headers=headers)
+    content = b'{"base_quiz_version":"' + version.encode() + b'","questions":' + serialized + b"}"
+    return Response(content=content, media_type="application/json", headers=headers)
+
+
+def _record_and_lookup(user_id: str, score_map: Dict[str, float], base_version: str, today: str,
+                       fingerprint: str) -> Optional[bytes]:
+    """sqlite writes and reads (with a commit): run off the event loop"""
+    quiz_store.record_inputs(user_id, score_map, base_version)
+    return quiz_store.get(user_id, today, fingerprint)
+
+
 @router.post("/adaptive-quiz")
 async def get_adaptive_quiz(body: AdaptiveQuizRequest):
     """
@@ -210,83 +408,65 @@ async def get_adaptive_quiz(body: AdaptiveQuizRequest):
     2. If the pool doesn't have enough questions, top up with LLM-generated ones.
     3. Non-elevated categories keep their default questions.
     4. Reflection paragraph question always stays.
+
+    Quizzes materialized by precompute_adaptive_quizzes.py are served as-is
+    when the user's scores and base quiz still match.
     """
+    base_version, base_questions, base_serialized = _resolve_base(body)
     try:
-        scores = body.category_scores
         today = body.today or date.today().isoformat()
         user_id = body.user_id or "default"
-
-        score_map = {
-            "sleep": scores.sleepScore,
-            "anxiety": scores.anxietyScore,
-            "stress": scores.stressScore,
-            "depression": scores.depressionScore,
-        }
-
-        categories_to_adapt = [c for c in _CATEGORY_ORDER if score_map[c] >= HIGH_THRESHOLD]
-        adaptations: Dict[str, Dict] = {}
+        score_map = _score_map(body.category_scores)
+
+        if not any(score >= HIGH_THRESHOLD for score in score_map.values()):
+            quiz = _assemble_quiz(score_map, {}, [])
+            if base_serialized is None:
+                return {**quiz, "questions": base_questions}
+            # Server copy is already serialized; only the adaptations are encoded
+            content = (b'{"questions":' + base_serialized + b',"adaptations":'
+                       + json.dumps(quiz["adaptations"], ensure_ascii=False).encode() + b"}")
+            return Response(content=content, media_type="application/json")
+
+        fingerprint = None
+        if body.user_id:
+            fingerprint = quiz_fingerprint(score_map, base_version)
+            try:
+                cached = await asyncio.to_thread(_record_and_lookup, user_id, score_map, base_version, today,
+                                                 fingerprint)
+                cache_requests.inc("precomputed_quizzes", "miss" if cached is None else "hit")
+                if cached is not None:
+                    return Response(content=cached, media_type="application/json")
+            except Exception as e:
+                log.error("Precomputed quiz lookup failed: %s", e)
 
         # Build replacement questions for elevated categories
-        generated: Dict[str, List[Dict]] = {}
-        for cat in categories_to_adapt:
-            # 1. Try pool first
-            pool_qs = _pick_questions(cat, FOLLOWUP_COUNT, user_id, today)
-
-            # 2. If pool is short, top up with LLM
-            if len(pool_qs) < FOLLOWUP_COUNT:
-                needed = FOLLOWUP_COUNT - len(pool_qs)
-                print(f"[adaptive_quiz] Pool has {len(pool_qs)} {cat} Qs, need {needed} more from LLM", file=sys.stderr)
-                llm_qs = _llm_generate(cat, score_map[cat])
-                pool_qs.extend(llm_qs[:needed])
-
-            generated[cat] = pool_qs
-            adaptations[cat] = {
-                "adapted": True,
-                "reason": f"{CATEGORY_META[cat]['label']} score elevated ({score_map[cat]:.2f}). Showing detailed follow-up questions.",
-                "score": score_map[cat],
-                "questions_replaced": len(pool_qs),
-                "source": "question_pool",
-            }
-            print(f"[adaptive_quiz] {cat} adapted: score={score_map[cat]:.2f}, "
-                  f"{len(pool_qs)} follow-up Qs (pool={len(_POOL_BY_CATEGORY.get(cat, []))})", file=sys.stderr)
-
-        # Mark non-adapted
-        for cat in _CATEGORY_ORDER:
-            if cat not in adaptations:
-                adaptations[cat] = {
-                    "adapted": False,
-                    "reason": f"{CATEGORY_META[cat]['label']} score within normal range.",
-                    "score": score_map[cat],
-                }
-
-        if not categories_to_adapt:
-            return {"questions": body.base_questions, "adaptations": adaptations}
-
-        # Rebuild quiz: walk base questions, swap adapted categories
-        adapted_set = set(categories_to_adapt)
-        rebuilt: List[Dict] = []
-        seen: set = set()
-
-        for q in body.base_questions:
-            cat = q.get("category")
-            if cat in adapted_set:
-                if cat not in seen:
-                    rebuilt.extend(generated[cat])
-                    seen.add(cat)
-                # skip original questions for this category
-            else:
-                rebuilt.append(q)
-
-        # Re-number sequentially
-        for i, q in enumerate(rebuilt):
-            q["id"] = i + 1
-
-        return {"questions": rebuilt, "adaptations": adaptations}
+        # 1. Try pool first
+        generated = _select_followups(score_map, user_id, today)
+
+        # 2. If the pool is short, top up with LLM (all categories at once, bounded by the deadline)
+        shortfalls = {cat: FOLLOWUP_COUNT - len(qs) for cat, qs in generated.items() if len(qs) < FOLLOWUP_COUNT}
+        if shortfalls:
+            log.info("Pool short for %s, topping up from LLM", shortfalls, extra={"event": "quiz_pool_short"})
+            _top_up_requested.set()
+            for cat, llm_qs in (await _llm_top_up(shortfalls, score_map)).items():
+                generated[cat].extend(llm_qs)
+
+        for cat, pool_qs in generated.items():
+            log.debug("%s adapted: score=%.2f, %d follow-up Qs (pool=%d)", cat, score_map[cat], len(pool_qs),
+                      question_bank.count(cat), extra={"event": "quiz_adapted"})
+
+        quiz = _assemble_quiz(score_map, generated, base_questions)
+        if fingerprint and not shortfalls:
+            # Pool-only quizzes are deterministic; repeat requests today can reuse it
+            try:
+                await asyncio.to_thread(quiz_store.put_many, today, [(user_id, fingerprint, quiz)])
+            except Exception as e:
+                log.error("Could not store quiz: %s", e)
+        return quiz
 
     except Exception as e:
-        print(f"[adaptive_quiz] Error: {e}", file=sys.stderr)
-        import traceback; traceback.print_exc(file=sys.stderr)
+        log.exception("Error: %s", e)
         return {
-            "questions": body.base_questions,
+            "questions": base_questions,
             "adaptations": {c: {"adapted": False, "reason": f"Error: {e}", "score": 0} for c in _CATEGORY_ORDER},
         }
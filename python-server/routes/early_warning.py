@@ -0,0 +1,37 @@
+from fastapi import APIRouter, BackgroundTasks, HTTPException
+from services.early_warning import EarlyWarningSweep
+from services.log import get_logger
+from routes.recommendations import xgb_predictor
+
+log = get_logger(__name__)
+
+router = APIRouter(tags=["Early warning"])
+sweep = EarlyWarningSweep(xgb_predictor)
+
+
+def _run_sweep():
+    try:
+        sweep.run()
+    except Exception as e:
+        log.exception("Sweep failed: %s", e)
+
+
+@router.post("/early-warning/sweep", status_code=202)
+async def start_sweep(background_tasks: BackgroundTasks):
+    """Start a population-wide sweep in the background (see early_warning_sweep.py)"""
+    if sweep.running:
+        raise HTTPException(status_code=409, detail="A sweep is already running")
+    sweep.running = True  # claimed now so a second POST before the task starts is refused
+    background_tasks.add_task(_run_sweep)
+    return {"started": True}
+
+
+@router.get("/early-warning/sweep")
+async def get_sweep(limit: int = 50):
+    """Status and summary of the latest sweep, with its top `limit` flagged users"""
+    return {
+        "running": sweep.running,
+        "last_error": sweep.last_error,
+        "summary": sweep.last_summary,
+        "flagged": sweep.top(limit),
+    }
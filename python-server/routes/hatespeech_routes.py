@@ -1,7 +1,9 @@
 from fastapi import APIRouter, HTTPException, status
 from pydantic import BaseModel, Field
 from typing import Dict
+from services.admission import queues as admission
 from services.hatespeech_service import get_hate_speech_score
+import asyncio
 
 router = APIRouter(tags=["HateSpeech"])
 
@@ -16,11 +18,12 @@ async def analyze_text(data: TextInput) -> Dict[str, float]:
     if not data.text.strip():
         return {"paragraphScore": 0.0}
 
-    try:
-        score = get_hate_speech_score(data.text)
-        return {"paragraphScore": round(score, 3)}
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Error analyzing text: {str(e)}"
-        )
\ No newline at end of file
+    async with admission["hatespeech"].admit():
+        try:
+            score = await asyncio.to_thread(get_hate_speech_score, data.text)
+            return {"paragraphScore": round(score, 3)}
+        except Exception as e:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Error analyzing text: {str(e)}"
+            )
\ No newline at end of file
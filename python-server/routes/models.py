@@ -0,0 +1,84 @@
+from fastapi import APIRouter, BackgroundTasks, HTTPException
+from pydantic import BaseModel
+from typing import Optional
+from services.log import get_logger
+from services.model_store import store
+from routes.recommendations import xgb_predictor
+from services.risk_weights import risk_weights
+import asyncio
+import os
+
+log = get_logger(__name__)
+
+router = APIRouter(tags=["Models"])
+
+# How often each worker checks the CURRENT pointer for versions published
+# by another process (training scripts, another worker's activate call)
+MODEL_POLL_SECONDS = float(os.environ.get("MODEL_POLL_SECONDS", "30"))
+
+
+class ActivateRequest(BaseModel):
+    version: str
+
+
+class ModelStatus(BaseModel):
+    active_version: Optional[str]
+    serving_version: Optional[str]
+
+
+def _status() -> dict:
+    return {
+        "active_version": store.current_version(),
+        "serving_version": xgb_predictor.version,
+    }
+
+
+@router.get("/models")
+async def list_models():
+    """List published model versions and which one this worker is serving"""
+    return {**_status(), "versions": store.list_versions()}
+
+
+@router.post("/models/activate", status_code=202, response_model=ModelStatus)
+async def activate_model(body: ActivateRequest, background_tasks: BackgroundTasks):
+    """
+    Flip CURRENT to `version`, then preload and swap it into this worker in
+    the background. Other workers pick it up on their next poll.
+    """
+    try:
+        store.activate(body.version)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    background_tasks.add_task(xgb_predictor.activate, body.version)
+    background_tasks.add_task(risk_weights.activate, body.version)
+    return _status()
+
+
+@router.post("/models/rollback", status_code=202, response_model=ModelStatus)
+async def rollback_model(background_tasks: BackgroundTasks):
+    """Point CURRENT back at the previously active version"""
+    try:
+        version = store.rollback()
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    background_tasks.add_task(xgb_predictor.activate, version)
+    background_tasks.add_task(risk_weights.activate, version)
+    return _status()
+
+
+async def watch_model_versions():
+    """
+    Background loop: hot-swap the predictor and risk weights when CURRENT
+    changes on disk, and pick up online updates made by other workers
+    """
+    while True:
+        await asyncio.sleep(MODEL_POLL_SECONDS)
+        try:
+            current = store.current_version()
+            if current != xgb_predictor.version:
+                await asyncio.to_thread(xgb_predictor.activate)
+            if current != risk_weights.version:
+                await asyncio.to_thread(risk_weights.activate, current)
+            await asyncio.to_thread(xgb_predictor.refresh_overlay)
+        except Exception as e:
+            log.error("Hot-swap failed: %s", e)
@@ -1,13 +1,41 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import List, Optional
-from services.recommendations import get_recommendations
-from services.xgboost_service import XGBoostPredictor
-import traceback
-import sys
+from services.recommendations import fallback_recommendation, recommend, stream_recommendation
+from services.xgboost_service import XGBoostPredictor, detect_early_warning
+from services.online_update import OnlineUpdater
+from services.risk_weights import risk_weights
+from services.risk_history import risk_history
+from services.metrics import register_collector
+from services.log import get_logger
+from services.singleflight import SingleFlight
+from services.admission import queues as admission
+from email.utils import parsedate_to_datetime
+import asyncio
+import json
+import os
+
+log = get_logger(__name__)
 
 router = APIRouter()
 xgb_predictor = XGBoostPredictor()  # Initialize once
+online_updater = OnlineUpdater(xgb_predictor)
+register_collector(online_updater.collect)
+
+# Identical concurrent requests (e.g. several Node instances on a cold
+# cache) share one load or forecast instead of each running it
+weights_flight = SingleFlight("risk_weights")
+forecast_flight = SingleFlight("predict")
+
+# Latency budget for the recommendation text of /recommendations (LLM and
+# forecast run concurrently); past it the local fallback is served instead
+RECOMMENDATION_BUDGET_SECONDS = float(os.environ.get("RECOMMENDATION_BUDGET_SECONDS", "8"))
+# /recommendations/stream: falls back if no message text arrived by then
+RECOMMENDATION_STREAM_BUDGET_SECONDS = float(os.environ.get("RECOMMENDATION_STREAM_BUDGET_SECONDS", "3"))
+# The forecast is dropped (early_warning_partial=True) if it isn't ready by
+# this point and the LLM answer already is
+FORECAST_BUDGET_SECONDS = float(os.environ.get("FORECAST_BUDGET_SECONDS", "2"))
 
 
 class RecommendationRequest(BaseModel):
@@ -18,7 +46,42 @@ class RecommendationRequest(BaseModel):
     top_factors:                 Optional[List[str]] = []
     days_since_checkin:          Optional[int] = 0
     consecutive_high_risk_days:  Optional[int] = 0
-    recent_risks:                Optional[List[float]] = []  # Last 7 days of risk scores for XGBoost
+    recent_risks:                Optional[List[float]] = []  # Recent daily risk scores for XGBoost (server-side history if omitted)
+
+
+class RiskScoreIngest(BaseModel):
+    user_id:     str
+    risk_score:  float                  # Daily overall risk score (0-10)
+    date:        Optional[str] = None   # YYYY-MM-DD, defaults to today
+
+
+def _urgent(body: RecommendationRequest) -> bool:
+    """Admitted ahead of other recommendation requests when the endpoint is busy"""
+    return body.risk_level.upper() in ("HIGH", "CRITICAL")
+
+
+class _AdmittedStreamingResponse(StreamingResponse):
+    """Holds an admission slot until the stream ends, however it ends"""
+
+    def __init__(self, content, release, **kwargs):
+        super().__init__(content, **kwargs)
+        self._release = release
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self._release()
+
+
+def _recent_risks(body: RecommendationRequest) -> List[float]:
+    """
+    The posted window, else the server-side history, else today's score
+    repeated. Reads the history store: call it off the event loop.
+    """
+    if body.recent_risks:
+        return body.recent_risks
+    return risk_history.recent(body.user_id) or [body.risk_score] * 7
 
 
 @router.post("/recommendations")
@@ -41,54 +104,145 @@ async def recommendations(body: RecommendationRequest):
         "motivational_message": "...",
         "coping_steps": [...],
         "xgboost_prediction": [...],  # NEW
-        "early_warning": false|true    # NEW
+        "early_warning": false|true,   # NEW
+        "early_warning_partial": false # true if the forecast missed its budget
+        "source": "llm" | "retrieval" | "static",
+        "fallback": true               # only when the LLM failed or missed its budget
     }
     """
+    queue = admission["recommendations"]
+    admitted_at = await queue.acquire(priority=_urgent(body))
+    llm_task = forecast_task = None
     try:
-        # Get current recommendation (existing logic)
         request_dict = body.dict()
-        result = get_recommendations(request_dict)
-        
-        # NEW: Get XGBoost prediction
         user_id = body.user_id
         current_risk = body.risk_score
-        recent_risks = body.recent_risks if body.recent_risks else [current_risk] * 7
-        
+        recent_risks = await asyncio.to_thread(_recent_risks, body)
+
         # Debug logging
-        print(f"[Recommendations] User: {user_id}, Risk: {current_risk}, Recent: {len(recent_risks) if recent_risks else 0} days", file=sys.stderr)
-        
-        xgb_pred = xgb_predictor.predict(user_id=user_id, days_ahead=7, recent_risks=recent_risks)
-        
+        log.debug("User: %s, Risk: %s, Recent: %d days", user_id, current_risk, len(recent_risks) if recent_risks else 0,
+                  extra={"event": "recommendation_request"})
+
+        # LLM call and forecast are independent: start both, then wait
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        # Pooled LLM responses and/or local retrieval, per RECOMMENDATION_ENGINE
+        llm_task = asyncio.create_task(recommend(request_dict))
+        forecast_task = asyncio.create_task(asyncio.to_thread(
+            xgb_predictor.predict, user_id=user_id, days_ahead=7, recent_risks=recent_risks))
+
+        try:
+            result = await asyncio.wait_for(llm_task, RECOMMENDATION_BUDGET_SECONDS)
+        except asyncio.TimeoutError:
+            log.warning("Recommendation missed its %ss budget for user %s, serving local fallback",
+                        RECOMMENDATION_BUDGET_SECONDS, user_id, extra={"user_id": user_id})
+            result = await fallback_recommendation(request_dict)
+
+        # The forecast may use whatever is left of its own budget, and is
+        # never waited on past the point the LLM answer is ready and it's over
+        remaining = max(0.0, started + FORECAST_BUDGET_SECONDS - loop.time())
+        try:
+            xgb_pred = await asyncio.wait_for(forecast_task, remaining)
+            partial = False
+        except asyncio.TimeoutError:
+            log.warning("XGBoost forecast missed its %ss budget for user %s", FORECAST_BUDGET_SECONDS, user_id,
+                        extra={"user_id": user_id})
+            xgb_pred, partial = None, True
+
         # Debug: log if prediction failed
         if xgb_pred is None:
-            print(f"[WARNING] XGBoost prediction returned None for user {user_id}", file=sys.stderr)
+            log.warning("XGBoost prediction returned None for user %s", user_id, extra={"user_id": user_id})
         else:
-            print(f"[XGBoost] Got {len(xgb_pred)} predictions for user {user_id}", file=sys.stderr)
-        
-        # NEW: Check for early warning (risk spike detected)
-        early_warning = False
-        if xgb_pred:
-            max_future_risk = max([p['predicted_risk'] for p in xgb_pred])
-            days_to_peak = next((p['days_ahead'] for p in xgb_pred 
-                                if p['predicted_risk'] == max_future_risk), None)
-            
-            # Warning if peak crosses CRITICAL and current is not already critical
-            if max_future_risk >= 7 and current_risk < 7:
-                early_warning = True
-            # Warning if significant spike coming (+ 2 points) in next 3 days
-            elif days_to_peak and days_to_peak <= 3 and max_future_risk >= current_risk + 1.5:
-                early_warning = True
-        
+            log.debug("Got %d XGBoost predictions for user %s", len(xgb_pred), user_id)
+
+        # Check for early warning (risk spike detected)
+        early_warning = detect_early_warning(xgb_pred, current_risk)
+
         # Return enhanced response
         result['xgboost_prediction'] = xgb_pred
         result['early_warning'] = early_warning
-        
+        result['early_warning_partial'] = partial  # True: forecast was skipped, early_warning is not conclusive
+
         return result
-        
+
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"Recommendation error: {str(e)}", file=sys.stderr)
-        traceback.print_exc()
+        log.exception("Recommendation error: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        queue.release(admitted_at)
+        for task in (llm_task, forecast_task):
+            if task is not None and not task.done():
+                task.cancel()
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@router.post("/recommendations/stream")
+async def recommendations_stream(body: RecommendationRequest):
+    """
+    Same inputs as /recommendations, answered as Server-Sent Events:
+
+        event: message        {"delta": "..."}          (repeated, as the LLM writes it)
+        event: coping_steps   {"coping_steps": [...]}
+        event: forecast       {"xgboost_prediction": [...], "early_warning": bool,
+                               "early_warning_partial": bool}
+        event: done           {"source": "llm" | "retrieval" | "static"}
+        event: error          {"detail": "..."}          (instead of the rest on failure)
+
+    The forecast runs concurrently with generation, under the same
+    FORECAST_BUDGET_SECONDS as /recommendations. If no message text has
+    arrived within RECOMMENDATION_STREAM_BUDGET_SECONDS, the local fallback
+    is sent whole instead.
+    """
+    request_dict = body.dict()
+    current_risk = body.risk_score
+    recent_risks = await asyncio.to_thread(_recent_risks, body)
+
+    async def events():
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        forecast_task = asyncio.create_task(asyncio.to_thread(
+            xgb_predictor.predict, user_id=body.user_id, days_ahead=7, recent_risks=recent_risks))
+        source = None
+        try:
+            async for event, data in stream_recommendation(request_dict, RECOMMENDATION_STREAM_BUDGET_SECONDS):
+                if event == "source":
+                    source = data["source"]
+                else:
+                    yield _sse(event, data)
+
+            remaining = max(0.0, started + FORECAST_BUDGET_SECONDS - loop.time())
+            try:
+                xgb_pred, partial = await asyncio.wait_for(forecast_task, remaining), False
+            except asyncio.TimeoutError:
+                xgb_pred, partial = None, True
+            yield _sse("forecast", {
+                "xgboost_prediction": xgb_pred,
+                "early_warning": detect_early_warning(xgb_pred, current_risk),
+                "early_warning_partial": partial,
+            })
+            yield _sse("done", {"source": source})
+        except Exception as e:
+            log.error("Recommendation stream error: %s", e)
+            yield _sse("error", {"detail": str(e)})
+        finally:
+            forecast_task.cancel()
+
+    queue = admission["recommendations"]
+    admitted_at = await queue.acquire(priority=_urgent(body))
+    return _AdmittedStreamingResponse(events(), lambda: queue.release(admitted_at),
+                                      media_type="text/event-stream",
+                                      headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+def _forecast(user_id: str, days: int):
+    # Server-side history (fed by /risk-scores); predict() has its own default without one
+    recent_risks = risk_history.recent(user_id) or None
+    return xgb_predictor.predict(user_id=user_id, days_ahead=days, recent_risks=recent_risks)
 
 
 @router.get("/predict/{user_id}")
@@ -110,7 +264,7 @@ async def predict_user_risk(user_id: str, days: int = 7):
     }
     """
     try:
-        predictions = xgb_predictor.predict(user_id=user_id, days_ahead=days)
+        predictions = await forecast_flight.do((user_id, days), asyncio.to_thread, _forecast, user_id, days)
         
         if not predictions:
             return {
@@ -134,31 +288,48 @@ async def predict_user_risk(user_id: str, days: int = 7):
         }
         
     except Exception as e:
-        print(f"Prediction error for user {user_id}: {str(e)}", file=sys.stderr)
+        log.error("Prediction error for user %s: %s", user_id, e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.get("/risk-weights")
-async def get_risk_weights():
+@router.post("/risk-scores", status_code=202)
+async def ingest_risk_score(body: RiskScoreIngest):
     """
-    Returns dynamically learned weights for risk components using XGBoost
+    Record a user's daily risk score and queue an incremental refresh of
+    their forecast model (debounced, runs in the background).
     """
+    if not 0 <= body.risk_score <= 10:
+        raise HTTPException(status_code=422, detail="risk_score must be between 0 and 10")
     try:
-        weights = xgb_predictor.get_risk_weights()
-        if not weights:
-             # Fallback to current hardcoded defaults if model not found
-             return {
-                "depression_quiz_score": 0.20,
-                "anxiety_quiz_score":    0.15,
-                "stress_quiz_score":     0.15,
-                "sleep_quiz_score":      0.12,
-                "journal_score":         0.13,
-                "chatbot_score":         0.11,
-                "quiz_score":            0.07,
-                "community_score":       0.03,
-                "disengagement_score":   0.04
-            }
-        return weights
-    except Exception as e:
-        print(f"Error fetching risk weights: {str(e)}", file=sys.stderr)
-        raise HTTPException(status_code=500, detail=str(e))
+        # Ring-buffer write (sqlite, memmap growth under a file lock): off the event loop
+        await asyncio.to_thread(online_updater.submit, body.user_id, body.risk_score, body.date)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return {"queued": True, "pending_updates": online_updater.pending()}
+
+
+@router.get("/risk-weights")
+async def get_risk_weights(request: Request):
+    """
+    Learned weights for the risk components (defaults until a weight model
+    is trained). Served from memory with an ETag (the weights' content hash)
+    and Last-Modified (training time); send If-None-Match to revalidate.
+    """
+    weights = risk_weights.loaded
+    if weights is None:
+        weights = await weights_flight.do("current", asyncio.to_thread, risk_weights.current)
+    headers = {"ETag": weights.etag, "Cache-Control": "no-cache"}
+    if weights.last_modified:
+        headers["Last-Modified"] = weights.http_last_modified
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if weights.etag in if_none_match or if_none_match.strip() == "*":
+            return Response(status_code=304, headers=headers)
+    elif weights.last_modified and request.headers.get("if-modified-since"):
+        try:
+            if weights.last_modified <= parsedate_to_datetime(request.headers["if-modified-since"]):
+                return Response(status_code=304, headers=headers)
+        except (TypeError, ValueError):
+            pass
+    return Response(content=weights.body, media_type="application/json", headers=headers)
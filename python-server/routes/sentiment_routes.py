@@ -1,12 +1,23 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Header
 from pydantic import BaseModel
-from services.sentiment_service import get_mental_health_score
+from typing import Optional
+from services.admission import queues as admission
+from services.sentiment_service import get_mental_health_score, is_crisis_text
+import asyncio
 router = APIRouter()
 
 class TextInput(BaseModel):
     text: str
 
 @router.post("/analyze")
-def analyze_text(data: TextInput):
-    score = get_mental_health_score(data.text)
+async def analyze_text(data: TextInput, x_priority: Optional[str] = Header(None)):
+    """
+    Send X-Priority: high for crisis-relevant calls (a live check-in) so they
+    are admitted ahead of bulk scoring when the endpoint is busy. Text with a
+    crisis keyword is scored without the model and is never queued.
+    """
+    if is_crisis_text(data.text):
+        return {"paragraphScore": round(get_mental_health_score(data.text), 3)}
+    async with admission["sentiment"].admit(priority=x_priority == "high"):
+        score = await asyncio.to_thread(get_mental_health_score, data.text)
     return {"paragraphScore": round(score, 3)}
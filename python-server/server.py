@@ -1,6 +1,8 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 from dotenv import load_dotenv
+import asyncio
 import os
 
 load_dotenv()
@@ -8,7 +10,12 @@ load_dotenv()
 from routes.sentiment_routes import router as sentiment_router
 from routes.hatespeech_routes import router as hatespeech_router
 import routes.recommendations as recommendation
-from routes.adaptive_quiz import router as adaptive_quiz_router
+from routes.adaptive_quiz import router as adaptive_quiz_router, top_up_generated_questions
+from routes.models import router as models_router, watch_model_versions
+from routes.early_warning import router as early_warning_router
+from services.admission import Overloaded
+from services.llm_gateway import llm_gateway
+from services import metrics
 
 app = FastAPI(title="SoulSync Mental Health API")
 
@@ -22,16 +29,43 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(metrics.MetricsMiddleware)
+
+
+@app.exception_handler(Overloaded)
+async def overloaded(request, exc: Overloaded):
+    # Refused before any work was done: safe to retry
+    return JSONResponse(status_code=503, content={"detail": str(exc)},
+                        headers={"Retry-After": str(exc.retry_after)})
+
 
 app.include_router(sentiment_router, prefix="/sentiment")
 app.include_router(hatespeech_router, prefix="/hatespeech")
 app.include_router(recommendation.router, prefix="/api")
 app.include_router(adaptive_quiz_router, prefix="/api")
+app.include_router(models_router, prefix="/api")
+app.include_router(early_warning_router, prefix="/api")
+
+
+@app.on_event("startup")
+async def start_background_jobs():
+    asyncio.create_task(watch_model_versions())
+    asyncio.create_task(top_up_generated_questions())
+    asyncio.create_task(metrics.flush_periodically())
+
+
+@app.on_event("shutdown")
+async def close_clients():
+    await llm_gateway.aclose()
 
 
 @app.get("/health")
 def health():
-    return {"status": "ok"}
+    return {"status": "ok", "llm": llm_gateway.snapshot()}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
 
 @app.get("/")
 def root():
@@ -0,0 +1,167 @@
+"""
+Admission control for the model-backed endpoints.
+
+Each endpoint gets an AdmissionQueue: at most `concurrency` requests run at
+once, and up to `queue_size` more wait for a slot. Anything beyond that, or
+a request that has waited ADMISSION_MAX_WAIT_SECONDS, is refused at once
+with Overloaded, which server.py answers as 503 with a Retry-After header.
+A burst then fails its excess fast instead of making every request slow
+until the caller's own timeout gives up on it.
+
+Waiting requests are in two lanes with a queue_size bound each. A freed
+slot always goes to the priority lane first (crisis-relevant calls, e.g.
+sentiment requests sent with X-Priority: high, recommendations for HIGH or
+CRITICAL risk), then to the normal lane in arrival order.
+
+    ADMISSION_LIMITS             per endpoint concurrency:queue_size, e.g.
+                                 "hatespeech=2:32,sentiment=8:64"; a
+                                 concurrency of 0 turns the limit off
+    ADMISSION_MAX_WAIT_SECONDS   longest wait for a slot (default 5)
+
+Limits are per worker process.
+"""
+
+import asyncio
+import math
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Dict, Optional, Tuple
+
+from services.log import get_logger
+from services.metrics import admission_requests, admission_wait_seconds, register_collector
+
+log = get_logger(__name__)
+
+ADMISSION_MAX_WAIT_SECONDS = float(os.environ.get("ADMISSION_MAX_WAIT_SECONDS", "5"))
+
+# endpoint -> (concurrency, queue_size)
+DEFAULT_LIMITS: Dict[str, Tuple[int, int]] = {
+    "hatespeech": (2, 32),        # toxic-bert, CPU bound
+    "sentiment": (8, 64),         # TextBlob
+    "recommendations": (32, 64),  # LLM calls, mostly waiting on the provider
+}
+
+PRIORITY, NORMAL = "priority", "normal"
+
+
+class Overloaded(Exception):
+    """The endpoint's queue is full, or the wait for a slot ran out"""
+
+    def __init__(self, endpoint: str, reason: str, retry_after: int):
+        super().__init__(f"{endpoint} is overloaded ({reason}), retry in {retry_after}s")
+        self.endpoint = endpoint
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionQueue:
+    def __init__(self, name: str, concurrency: int, queue_size: int, max_wait: float = ADMISSION_MAX_WAIT_SECONDS):
+        self.name = name
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.max_wait = max_wait
+        self.active = 0
+        self._waiters = {PRIORITY: deque(), NORMAL: deque()}
+        self._service_seconds = 0.0  # moving average of how long a request holds its slot
+
+    def queued(self, lane: Optional[str] = None) -> int:
+        """Requests waiting, in `lane` or in both"""
+        return sum(len(waiters) for name, waiters in self._waiters.items() if lane in (None, name))
+
+    def retry_after(self) -> int:
+        """Seconds until the queue ahead of a new request has likely drained"""
+        return max(1, math.ceil(self._service_seconds * (self.queued() + 1) / max(1, self.concurrency)))
+
+    async def acquire(self, priority: bool = False) -> float:
+        """
+        Take a slot, waiting in the request's lane if all are busy; raises
+        Overloaded. Returns the time admitted, to pass back to release().
+        """
+        lane = PRIORITY if priority else NORMAL
+        if self.concurrency <= 0:
+            return time.monotonic()
+        if self.active < self.concurrency and not self.queued():
+            self.active += 1
+            admission_requests.inc(self.name, lane, "admitted")
+            return time.monotonic()
+
+        waiters = self._waiters[lane]
+        if len(waiters) >= self.queue_size:
+            admission_requests.inc(self.name, lane, "queue_full")
+            raise Overloaded(self.name, "queue full", self.retry_after())
+
+        future = asyncio.get_running_loop().create_future()
+        waiters.append(future)
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(future, self.max_wait)
+        except asyncio.TimeoutError:
+            if future in waiters:  # a release may already have dropped it
+                waiters.remove(future)
+            admission_requests.inc(self.name, lane, "timed_out")
+            raise Overloaded(self.name, "no slot in time", self.retry_after())
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release()  # the slot was handed over just as the caller went away
+            elif future in waiters:
+                waiters.remove(future)
+            raise
+        admitted_at = time.monotonic()
+        admission_wait_seconds.observe(admitted_at - started, self.name)
+        admission_requests.inc(self.name, lane, "admitted")
+        return admitted_at
+
+    def release(self, admitted_at: Optional[float] = None):
+        """Give the slot back: to the first priority waiter, else the first normal one"""
+        if self.concurrency <= 0:
+            return
+        if admitted_at is not None:
+            self._service_seconds += 0.2 * (time.monotonic() - admitted_at - self._service_seconds)
+        for lane in (PRIORITY, NORMAL):
+            waiters = self._waiters[lane]
+            while waiters:
+                future = waiters.popleft()
+                if not future.done():
+                    future.set_result(None)  # the slot passes on; self.active is unchanged
+                    return
+        self.active -= 1
+
+    @asynccontextmanager
+    async def admit(self, priority: bool = False):
+        admitted_at = await self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release(admitted_at)
+
+
+def _parse_limits(spec: str) -> Dict[str, Tuple[int, int]]:
+    limits = dict(DEFAULT_LIMITS)
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        endpoint, _, values = item.partition("=")
+        endpoint = endpoint.strip()
+        concurrency, _, queue_size = values.partition(":")
+        try:
+            # "sentiment=4" keeps the default queue size
+            limits[endpoint] = (int(concurrency), int(queue_size) if queue_size else limits.get(endpoint, (0, 0))[1])
+        except ValueError:
+            log.warning("Ignoring ADMISSION_LIMITS entry %r", item)
+    return limits
+
+
+queues: Dict[str, AdmissionQueue] = {
+    name: AdmissionQueue(name, concurrency, queue_size)
+    for name, (concurrency, queue_size) in _parse_limits(os.environ.get("ADMISSION_LIMITS", "")).items()
+}
+
+
+def _collect():
+    yield ("soulsync_admission_active", "gauge", "Requests holding an admission slot",
+           [({"endpoint": q.name}, q.active) for q in queues.values()])
+    yield ("soulsync_admission_queued", "gauge", "Requests waiting for an admission slot",
+           [({"endpoint": q.name, "lane": lane}, q.queued(lane)) for q in queues.values() for lane in (PRIORITY, NORMAL)])
+
+
+register_collector(_collect)
@@ -0,0 +1,106 @@
+"""
+Circuit breaker for calls to an unreliable upstream (one per LLM provider).
+
+closed     calls go through; the outcome and latency of the last
+           LLM_BREAKER_WINDOW calls are kept. Once at least
+           LLM_BREAKER_MIN_CALLS are recorded and the share of failures, or of
+           calls slower than LLM_BREAKER_SLOW_SECONDS, reaches its threshold,
+           the breaker opens.
+open       calls are refused immediately for LLM_BREAKER_COOLDOWN_SECONDS.
+half_open  after the cooldown a single probe call is let through; success
+           closes the breaker, failure (or a slow answer) opens it again.
+"""
+
+import os
+import time
+from collections import deque
+from typing import Dict
+
+from services.log import get_logger
+
+log = get_logger(__name__)
+
+LLM_BREAKER_WINDOW = int(os.environ.get("LLM_BREAKER_WINDOW", "20"))
+LLM_BREAKER_MIN_CALLS = int(os.environ.get("LLM_BREAKER_MIN_CALLS", "5"))
+LLM_BREAKER_ERROR_RATE = float(os.environ.get("LLM_BREAKER_ERROR_RATE", "0.5"))
+LLM_BREAKER_SLOW_SECONDS = float(os.environ.get("LLM_BREAKER_SLOW_SECONDS", "8"))
+LLM_BREAKER_SLOW_RATE = float(os.environ.get("LLM_BREAKER_SLOW_RATE", "0.5"))
+LLM_BREAKER_COOLDOWN_SECONDS = float(os.environ.get("LLM_BREAKER_COOLDOWN_SECONDS", "30"))
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, window=LLM_BREAKER_WINDOW, min_calls=LLM_BREAKER_MIN_CALLS,
+                 error_rate=LLM_BREAKER_ERROR_RATE, slow_seconds=LLM_BREAKER_SLOW_SECONDS,
+                 slow_rate=LLM_BREAKER_SLOW_RATE, cooldown=LLM_BREAKER_COOLDOWN_SECONDS):
+        self.name = name
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.slow_seconds = slow_seconds
+        self.slow_rate = slow_rate
+        self.cooldown = cooldown
+        self.state = CLOSED
+        self._calls = deque(maxlen=window)  # (ok, slow)
+        self._opened_at = 0.0
+        self._probing = False
+        self.stats = {"opened": 0, "rejected": 0}
+
+    def allow(self) -> bool:
+        """Whether a call may go out now; in half_open only one probe at a time"""
+        if self.state == OPEN and time.monotonic() - self._opened_at >= self.cooldown:
+            self.state, self._probing = HALF_OPEN, False
+            log.info("%s half-open, probing", self.name)
+        if self.state == CLOSED:
+            return True
+        if self.state == HALF_OPEN and not self._probing:
+            self._probing = True
+            return True
+        self.stats["rejected"] += 1
+        return False
+
+    def available(self) -> bool:
+        """Like allow(), but without claiming the probe slot"""
+        if self.state == OPEN:
+            return time.monotonic() - self._opened_at >= self.cooldown
+        return self.state == CLOSED or not self._probing
+
+    def record(self, ok: bool, latency: float):
+        slow = latency >= self.slow_seconds
+        if self.state == HALF_OPEN:
+            self._probing = False
+            if ok and not slow:
+                self.state = CLOSED
+                self._calls.clear()
+                log.info("%s closed", self.name)
+            else:
+                self._open("probe failed" if not ok else f"probe took {latency:.1f}s")
+            return
+        if self.state != CLOSED:
+            return
+        self._calls.append((ok, slow))
+        n = len(self._calls)
+        if n < self.min_calls:
+            return
+        failures = sum(1 for ok, _ in self._calls if not ok)
+        slow_calls = sum(1 for _, slow in self._calls if slow)
+        if failures / n >= self.error_rate:
+            self._open(f"{failures}/{n} recent calls failed")
+        elif slow_calls / n >= self.slow_rate:
+            self._open(f"{slow_calls}/{n} recent calls slower than {self.slow_seconds}s")
+
+    def release(self):
+        """Give back a probe slot whose call ended without a verdict (e.g. cancelled)"""
+        if self.state == HALF_OPEN:
+            self._probing = False
+
+    def _open(self, reason: str):
+        self.state = OPEN
+        self._opened_at = time.monotonic()
+        self._probing = False
+        self.stats["opened"] += 1
+        log.warning("%s open for %ss: %s", self.name, self.cooldown, reason)
+
+    def snapshot(self) -> Dict:
+        failures = sum(1 for ok, _ in self._calls if not ok)
+        return {"state": self.state, "window_calls": len(self._calls), "window_failures": failures, **self.stats}
@@ -0,0 +1,250 @@
+"""
+Population-wide early-warning sweep.
+
+Forecasts the next 7 days for every user in the risk history store
+(services/risk_history.py) and applies the same rule /api/recommendations
+uses (detect_early_warning): the forecast peak reaches 7 while the current
+score is below it, or a rise of 1.5+ peaks within 3 days.
+
+Users are processed in chunks of SWEEP_CHUNK_USERS. Each chunk is one
+feature matrix and the recursive forecast is 7 batched predict() calls, so
+a million users take a few hundred model calls rather than millions. The
+forecaster is the cross-user model (global_user_forecast_xgb.pkl, or the
+7-lag global model when that is all there is); per-user models can't be
+batched across users, so a sweep is a screening pass and users it flags
+still get their exact forecast from /api/recommendations.
+
+Results go to data/online/early_warnings/<date>.csv, ranked by peak risk,
+with a summary (counts, throughput) in latest.json.
+"""
+
+import csv
+import json
+import os
+import threading
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Dict, Optional
+
+import numpy as np
+
+from services.log import get_logger
+from services.risk_history import HISTORY_DIR, risk_history
+from services.xgboost_service import USER_STATS_WINDOW, normalize_user_key
+
+log = get_logger(__name__)
+
+OUTPUT_DIR = Path(os.environ.get("EARLY_WARNING_DIR", HISTORY_DIR.parent / "early_warnings"))
+SWEEP_CHUNK_USERS = int(os.environ.get("SWEEP_CHUNK_USERS", "50000"))
+# Users whose latest score is older than this are not forecast
+SWEEP_ACTIVE_DAYS = int(os.environ.get("SWEEP_ACTIVE_DAYS", "14"))
+FORECAST_DAYS = 7
+
+# detect_early_warning thresholds
+CRITICAL_RISK = 7
+SPIKE_RISE = 1.5
+SPIKE_DAYS = 3
+
+_TREND_WEIGHTS = np.arange(7) - 3.0  # least-squares slope over 7 points: w @ y / 28
+
+
+def _histories(scores: np.ndarray) -> np.ndarray:
+    """
+    Windows with gaps squeezed out, the way risk_history.recent() returns
+    them: valid scores right-aligned, NaN to the left, and padded to at
+    least 7 days with the oldest score (as the forecasters pad).
+    """
+    valid = ~np.isnan(scores)
+    order = np.argsort(valid, axis=1, kind="stable")
+    history = np.round(np.take_along_axis(scores, order, axis=1).astype(np.float64), 4)
+    counts = valid.sum(axis=1)
+    width = history.shape[1]
+    oldest = history[np.arange(len(history)), np.clip(width - counts, 0, width - 1)]
+    cols = np.arange(width)
+    pad = (cols >= width - 7) & (cols < (width - counts)[:, None])
+    history[pad] = np.broadcast_to(oldest[:, None], history.shape)[pad]
+    return history
+
+
+def _step_features(history: np.ndarray, future_date: datetime) -> np.ndarray:
+    """Vectorized xgboost_service.step_features over rows of `history`"""
+    last_7 = history[:, -7:]
+    std_7 = last_7.std(axis=1)
+    return np.column_stack([
+        last_7[:, ::-1],                        # lag_1 .. lag_7
+        last_7[:, -3:].mean(axis=1),
+        last_7.mean(axis=1),
+        last_7[:, -3:].std(axis=1),
+        np.where(std_7 > 0, std_7, 0.1),
+        last_7 @ _TREND_WEIGHTS / 28.0,
+        np.full(len(history), future_date.weekday(), dtype=np.float64),
+    ])
+
+
+def forecast_batch(model, history: np.ndarray, user_type_codes: Optional[np.ndarray],
+                   days_ahead: int = FORECAST_DAYS, as_of: Optional[datetime] = None) -> np.ndarray:
+    """
+    Recursive multi-step forecast for many users at once, matching
+    XGBoostPredictor._forecast: predictions are clipped to [0, 10], fed
+    back unrounded and reported rounded to 2 decimals. With
+    `user_type_codes` the cross-user feature set is used, otherwise the
+    7-lag global model's.
+    """
+    now = as_of or datetime.now()
+    history = history.copy()
+    predictions = np.empty((len(history), days_ahead))
+    for day in range(days_ahead):
+        future_date = now + timedelta(days=day + 1)
+        if user_type_codes is None:
+            X = history[:, -7:]
+        else:
+            window = history[:, -USER_STATS_WINDOW:]
+            X = np.column_stack([_step_features(history, future_date),
+                                 np.nanmean(window, axis=1), np.nanstd(window, axis=1), user_type_codes])
+        pred = np.clip(model.predict(X), 0, 10)
+        predictions[:, day] = np.round(pred, 2)
+        history = np.column_stack([history[:, 1:], pred])
+    return predictions
+
+
+def early_warnings(predictions: np.ndarray, current: np.ndarray):
+    """Vectorized detect_early_warning: (flags, peak, days to peak)"""
+    peak = predictions.max(axis=1)
+    days_to_peak = predictions.argmax(axis=1) + 1
+    flags = ((peak >= CRITICAL_RISK) & (current < CRITICAL_RISK)) | \
+            ((days_to_peak <= SPIKE_DAYS) & (peak >= current + SPIKE_RISE))
+    return flags, peak, days_to_peak
+
+
+class EarlyWarningSweep:
+    def __init__(self, predictor, history=risk_history, output_dir=OUTPUT_DIR):
+        self.predictor = predictor
+        self.history = history
+        self.output_dir = Path(output_dir)
+        self._lock = threading.Lock()
+        self.running = False
+        self.last_summary: Optional[Dict] = None
+        self.last_error: Optional[str] = None
+        try:
+            with open(self.output_dir / "latest.json") as f:
+                self.last_summary = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            pass
+
+    def _forecaster(self):
+        """(model, user type codes by user key or None) for batched forecasts"""
+        snapshot = self.predictor._snapshot
+        bundle = self.predictor._load_global_user_model(snapshot)
+        if bundle is not None:
+            user_types = bundle["user_types"]
+            codes = {user: user_types.index(t) for user, t in bundle["user_type_by_user"].items() if t in user_types}
+            return bundle["model"], codes
+        model = self.predictor._load_global_model(snapshot)
+        if model is not None:
+            return model, None
+        raise RuntimeError("No cross-user forecaster published; run train_global_forecaster.py first")
+
+    def run(self, active_days: int = SWEEP_ACTIVE_DAYS, chunk_users: int = SWEEP_CHUNK_USERS,
+            as_of: Optional[date] = None) -> Dict:
+        """Sweep every active user; writes the ranked CSV and returns the summary"""
+        if not self._lock.acquire(blocking=False):
+            raise RuntimeError("A sweep is already running")
+        self.running = True
+        try:
+            summary = self._run(active_days, chunk_users, as_of or date.today())
+            self.last_summary, self.last_error = summary, None
+            return summary
+        except Exception as e:
+            self.last_error = str(e)
+            raise
+        finally:
+            self.running = False
+            self._lock.release()
+
+    def _run(self, active_days, chunk_users, as_of: date) -> Dict:
+        started = time.perf_counter()
+        model, type_codes = self._forecaster()
+        now = datetime.combine(as_of, datetime.min.time())
+        min_day = as_of.toordinal() - active_days
+        swept, chunks, forecast_seconds = 0, 0, 0.0
+        flagged = []  # (user keys, current, peak, days to peak, predictions) per chunk
+
+        for keys, last_day, scores in self.history.chunks(chunk_users, USER_STATS_WINDOW):
+            active = last_day > min_day
+            if not active.any():
+                continue
+            history = _histories(scores[active])
+            keys = [k for k, a in zip(keys, active) if a]
+            codes = None
+            if type_codes is not None:
+                codes = np.array([type_codes.get(normalize_user_key(k), -1) for k in keys], dtype=np.float64)
+
+            t0 = time.perf_counter()
+            predictions = forecast_batch(model, history, codes, FORECAST_DAYS, now)
+            forecast_seconds += time.perf_counter() - t0
+
+            current = history[:, -1]
+            flags, peak, days_to_peak = early_warnings(predictions, current)
+            idx = np.flatnonzero(flags)
+            if len(idx):
+                flagged.append(([keys[i] for i in idx], current[idx], peak[idx], days_to_peak[idx], predictions[idx]))
+            swept += len(keys)
+            chunks += 1
+            elapsed = time.perf_counter() - started
+            log.info("chunk %d: %d users swept, %d flagged (%.0f users/s)",
+                     chunks, swept, sum(len(f[0]) for f in flagged), swept / elapsed)
+
+        path = self._write(flagged, as_of)
+        elapsed = time.perf_counter() - started
+        summary = {
+            "as_of": as_of.isoformat(),
+            "finished_at": datetime.now().isoformat(),
+            "users_swept": swept,
+            "users_flagged": sum(len(f[0]) for f in flagged),
+            "chunks": chunks,
+            "forecaster": "global_user" if type_codes is not None else "global_7lag",
+            "seconds": round(elapsed, 3),
+            "forecast_seconds": round(forecast_seconds, 3),
+            "users_per_second": round(swept / elapsed, 1) if elapsed else None,
+            "output": str(path),
+        }
+        with open(self.output_dir / "latest.json", "w") as f:
+            json.dump(summary, f, indent=2)
+        log.info("%d/%d users flagged in %.1fs (%s users/s) -> %s",
+                 summary["users_flagged"], swept, elapsed, summary["users_per_second"], path)
+        return summary
+
+    def _write(self, flagged, as_of: date) -> Path:
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        if flagged:
+            keys = [k for f in flagged for k in f[0]]
+            current, peak, days_to_peak, predictions = (np.concatenate([f[i] for f in flagged]) for i in range(1, 5))
+        else:
+            keys, current, peak, days_to_peak, predictions = [], np.empty(0), np.empty(0), np.empty(0), np.empty((0, 7))
+        # Highest peak first; among equal peaks the biggest rise
+        order = np.lexsort((-(peak - current), -peak))
+        path = self.output_dir / f"{as_of.isoformat()}.csv"
+        tmp = path.with_suffix(".csv.tmp")
+        with open(tmp, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["rank", "user_id", "current_risk", "peak_risk", "peak_date", "days_to_peak", "rise",
+                             "forecast"])
+            for rank, i in enumerate(order, 1):
+                writer.writerow([
+                    rank, keys[i], round(float(current[i]), 2), round(float(peak[i]), 2),
+                    (as_of + timedelta(days=int(days_to_peak[i]))).isoformat(), int(days_to_peak[i]),
+                    round(float(peak[i] - current[i]), 2), " ".join(f"{p:.2f}" for p in predictions[i]),
+                ])
+        os.replace(tmp, path)
+        return path
+
+    def top(self, limit: int = 50):
+        """First `limit` rows of the latest sweep's ranked list"""
+        if not self.last_summary:
+            return []
+        try:
+            with open(self.last_summary["output"], newline="") as f:
+                return [row for _, row in zip(range(limit), csv.DictReader(f))]
+        except FileNotFoundError:
+            return []
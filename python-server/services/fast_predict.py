@@ -0,0 +1,180 @@
+"""
+Pure-NumPy evaluation of trained XGBoost regressors for tiny inputs.
+
+A forecast step scores one 1x13 (or 1x7) row. XGBRegressor.predict spends
+most of that call on input validation and DMatrix construction, not on
+the trees. CompiledForest reads the booster's JSON dump once and flattens
+every tree into shared node arrays (feature, threshold, children, default
+direction, leaf value); scoring is then a handful of vectorized steps, one
+per tree level, over all trees at once.
+
+The semantics follow XGBoost: features are compared as float32,
+`x < threshold` goes left, NaN follows the node's default direction, and
+the output is base_score plus the sum of leaf values. Only identity-link
+regression objectives with numeric splits are compiled; anything else, or
+FAST_PREDICT=0, leaves the model as it is.
+
+Parity and latency: python benchmark_fast_predict.py
+"""
+
+import json
+import os
+import weakref
+from typing import Optional
+
+import numpy as np
+
+from services.log import get_logger
+
+log = get_logger(__name__)
+
+FAST_PREDICT = os.environ.get("FAST_PREDICT", "1") != "0"
+
+_IDENTITY_OBJECTIVES = {"reg:squarederror", "reg:absoluteerror", "reg:pseudohubererror", "reg:quantileerror"}
+
+
+def _parse_float(value) -> float:
+    # XGBoost >= 2 stores base_score as e.g. "[8.848194E0]"
+    return float(str(value).strip("[]"))
+
+
+class CompiledForest:
+    def __init__(self, feature, threshold, left, right, default_left, value, roots, depth, base_score, n_features):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.default_left = default_left
+        self.value = value
+        self.roots = roots
+        self.depth = depth
+        self.base_score = np.float32(base_score)
+        self.n_features = n_features
+
+    @classmethod
+    def from_model(cls, model) -> "CompiledForest":
+        """Compile an XGBRegressor (or raw Booster); ValueError if unsupported"""
+        booster = model.get_booster() if hasattr(model, "get_booster") else model
+        learner = json.loads(booster.save_raw("json"))["learner"]
+        objective = learner["objective"]["name"]
+        if objective not in _IDENTITY_OBJECTIVES:
+            raise ValueError(f"objective {objective} not supported")
+        if learner["gradient_booster"]["name"] != "gbtree":
+            raise ValueError(f"booster {learner['gradient_booster']['name']} not supported")
+        params = learner["learner_model_param"]
+        if int(params.get("num_target", "1")) > 1 or int(params.get("num_class", "0")) > 1:
+            raise ValueError("multi-output models not supported")
+
+        trees = learner["gradient_booster"]["model"]["trees"]
+        best = getattr(model, "best_iteration", None) if hasattr(model, "get_booster") else None
+        if best is not None:
+            per_round = int(learner["gradient_booster"]["model"]["gbtree_model_param"].get("num_parallel_tree", "1"))
+            trees = trees[:(best + 1) * per_round]  # what predict() uses after early stopping
+
+        feature, threshold, left, right, default_left, value, roots = [], [], [], [], [], [], []
+        offset, depth = 0, 0
+        for tree in trees:
+            if any(tree.get("split_type", [])):
+                raise ValueError("categorical splits not supported")
+            l = np.asarray(tree["left_children"], dtype=np.int64)
+            r = np.asarray(tree["right_children"], dtype=np.int64)
+            n = len(l)
+            leaf = l == -1
+            idx = np.arange(n)
+            # Leaves point at themselves, so extra descent steps are no-ops
+            left.append(np.where(leaf, idx, l) + offset)
+            right.append(np.where(leaf, idx, r) + offset)
+            feature.append(np.where(leaf, 0, np.asarray(tree["split_indices"], dtype=np.int64)))
+            cond = np.asarray(tree["split_conditions"], dtype=np.float32)
+            threshold.append(cond)
+            value.append(np.where(leaf, cond, np.float32(0)))
+            default_left.append(np.asarray(tree["default_left"], dtype=bool))
+            roots.append(offset)
+            depth = max(depth, cls._depth(l, r))
+            offset += n
+
+        cat = np.concatenate if trees else (lambda parts: np.empty(0))
+        return cls(cat(feature), cat(threshold).astype(np.float32), cat(left), cat(right), cat(default_left),
+                   cat(value).astype(np.float32), np.asarray(roots, dtype=np.int64), depth,
+                   _parse_float(params["base_score"]), int(params["num_feature"]))
+
+    @staticmethod
+    def _depth(left, right) -> int:
+        depth, level = 0, [0]
+        while True:
+            level = [c for n in level for c in (left[n], right[n]) if c != -1]
+            if not level:
+                return depth
+            depth += 1
+
+    def predict(self, X) -> np.ndarray:
+        """Same output as model.predict(X) for a 2-D (or single 1-D) feature array"""
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if X.shape[1] != self.n_features:
+            raise ValueError(f"expected {self.n_features} features, got {X.shape[1]}")
+        if len(X) == 1:
+            return np.array([self._predict_row(X[0])], dtype=np.float32)
+
+        nodes = np.broadcast_to(self.roots, (len(X), len(self.roots))).copy()
+        rows = np.arange(len(X))[:, None]
+        has_nan = np.isnan(X).any()
+        for _ in range(self.depth):
+            x = X[rows, self.feature[nodes]]
+            go_left = x < self.threshold[nodes]
+            if has_nan:
+                go_left = np.where(np.isnan(x), self.default_left[nodes], go_left)
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+        return self.value[nodes].sum(axis=1, dtype=np.float32) + self.base_score
+
+    def _predict_row(self, x: np.ndarray) -> np.float32:
+        nodes = self.roots
+        has_nan = np.isnan(x).any()
+        for _ in range(self.depth):
+            v = x[self.feature[nodes]]
+            go_left = v < self.threshold[nodes]
+            if has_nan:
+                go_left = np.where(np.isnan(v), self.default_left[nodes], go_left)
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+        return self.value[nodes].sum(dtype=np.float32) + self.base_score
+
+
+_compiled = weakref.WeakKeyDictionary()
+_UNSUPPORTED = object()
+
+
+def fast_model(model):
+    """
+    The compiled form of `model` (cached per model object), or `model`
+    itself when FAST_PREDICT is off or it can't be compiled. Either way the
+    result has a predict(X) like the original's.
+    """
+    if not FAST_PREDICT or model is None:
+        return model
+    try:
+        compiled = _compiled.get(model)
+    except TypeError:  # not weak-referenceable
+        return model
+    if compiled is None:
+        try:
+            compiled = CompiledForest.from_model(model)
+        except Exception as e:
+            log.warning("Using model.predict for %s: %s", type(model).__name__, e)
+            compiled = _UNSUPPORTED
+        _compiled[model] = compiled
+    return model if compiled is _UNSUPPORTED else compiled
+
+
+def fast_transform(scaler):
+    """scaler.transform, as plain array arithmetic for a fitted StandardScaler"""
+    mean: Optional[np.ndarray] = getattr(scaler, "mean_", None)
+    scale: Optional[np.ndarray] = getattr(scaler, "scale_", None)
+    if not FAST_PREDICT or type(scaler).__name__ != "StandardScaler" or (mean is None and scale is None):
+        return scaler.transform
+    mean = mean if getattr(scaler, "with_mean", True) and mean is not None else 0.0
+    scale = scale if getattr(scaler, "with_std", True) and scale is not None else 1.0
+
+    def transform(X):
+        return (np.asarray(X, dtype=np.float64) - mean) / scale
+    return transform
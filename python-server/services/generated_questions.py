@@ -0,0 +1,108 @@
+"""
+Persistent store of LLM-generated adaptive quiz questions.
+
+Questions that pass validation are kept in a local SQLite database, one row
+per question, tagged with category and severity band. Rows are keyed by a
+hash of the normalized question text, so the same question generated twice
+(or for two users) is stored once. The question bank indexes these rows
+alongside the curated quiz files and samples them first.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from services.question_bank import _normalize_text
+
+DB_PATH = Path(os.environ.get(
+    "GENERATED_QUESTIONS_DB",
+    Path(__file__).resolve().parent.parent / "data" / "online" / "generated_questions.db",
+))
+
+# Fields kept from a generated question; per-response fields (id, is_adaptive) are dropped
+_STORED_FIELDS = ("category", "type", "question", "options")
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(_normalize_text(text).encode()).hexdigest()
+
+
+class GeneratedQuestionStore:
+    """SQLite-backed pool of generated questions, deduplicated by text hash"""
+
+    def __init__(self, path=DB_PATH):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._conn = None
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        # Reconnect in forked workers; the inherited connection is kept, not closed
+        self._inherited_conn, self._conn = self._conn, None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS generated_questions (
+                    text_hash  TEXT PRIMARY KEY,
+                    category   TEXT NOT NULL,
+                    severity   TEXT NOT NULL,
+                    question   TEXT NOT NULL,
+                    source     TEXT,
+                    created_at REAL NOT NULL
+                )""")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_generated_band "
+                         "ON generated_questions (category, severity)")
+            self._conn = conn
+        return self._conn
+
+    def add(self, category: str, severity: str, questions: List[Dict], source: Optional[str] = None) -> int:
+        """Store validated questions; returns how many were new"""
+        rows = [
+            (text_hash(q["question"]), category, severity,
+             json.dumps({k: q[k] for k in _STORED_FIELDS if k in q}), source, time.time())
+            for q in questions
+        ]
+        with self._lock:
+            conn = self._connect()
+            before = conn.total_changes
+            with conn:
+                conn.executemany("INSERT OR IGNORE INTO generated_questions VALUES (?, ?, ?, ?, ?, ?)", rows)
+            return conn.total_changes - before
+
+    def count(self, category: str, severity: str) -> int:
+        with self._lock:
+            return self._connect().execute(
+                "SELECT COUNT(*) FROM generated_questions WHERE category = ? AND severity = ?",
+                (category, severity)).fetchone()[0]
+
+    # ------------------------------------------------------------------
+    # Question bank source interface
+    # ------------------------------------------------------------------
+
+    def revision(self):
+        """Changes whenever rows are added or removed (cheap enough to poll)"""
+        with self._lock:
+            return self._connect().execute(
+                "SELECT COUNT(*), COALESCE(MAX(rowid), 0) FROM generated_questions").fetchone()
+
+    def questions(self) -> List[Dict]:
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT text_hash, severity, question FROM generated_questions ORDER BY rowid").fetchall()
+        return [
+            {**json.loads(question), "severity": severity, "bank_id": f"generated:{digest[:16]}"}
+            for digest, severity, question in rows
+        ]
+
+
+generated_store = GeneratedQuestionStore()
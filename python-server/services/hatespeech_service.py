@@ -1,24 +1,41 @@
-from transformers import AutoTokenizer, AutoModelForSequenceClassification
-import torch
+# transformers and torch are imported on first use (load_hate_speech_model),
+# not with this module: importing them takes seconds and the app should be
+# able to answer /health before that
+import threading
+
+from services.log import get_logger
+from services.metrics import model_inference_seconds
+
+log = get_logger(__name__)
 
 
 tokenizer = None
 model = None
+# Requests run in threads (routes/hatespeech_routes.py); a fast tokenizer
+# must not be called from two of them at once
+_load_lock = threading.Lock()
+_tokenizer_lock = threading.Lock()
 
 def load_hate_speech_model():
     global tokenizer, model
-    if tokenizer is None or model is None:
+    with _load_lock:
+        if tokenizer is not None and model is not None:
+            return
+        from transformers import AutoTokenizer, AutoModelForSequenceClassification
         tokenizer = AutoTokenizer.from_pretrained("unitary/toxic-bert", cache_dir="./model")
         model = AutoModelForSequenceClassification.from_pretrained("unitary/toxic-bert", cache_dir="./model")
-        print("Hate speech model loaded successfully")
+        log.info("Hate speech model loaded successfully")
 
 def get_hate_speech_score(text: str) -> float:
     if not text or len(text.strip()) == 0:
         return 0.0
 
     load_hate_speech_model()
-    inputs = tokenizer(text, return_tensors="pt", truncation=True, max_length=512)
-    with torch.no_grad():
-        outputs = model(**inputs)
+    import torch
+    with model_inference_seconds.time("toxic_bert"):
+        with _tokenizer_lock:
+            inputs = tokenizer(text, return_tensors="pt", truncation=True, max_length=512)
+        with torch.no_grad():
+            outputs = model(**inputs)
     probs = torch.sigmoid(outputs.logits)
     return float(probs[0][0].item())
\ No newline at end of file
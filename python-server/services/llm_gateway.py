@@ -0,0 +1,328 @@
+"""
+Process-wide async gateway to the hosted LLM providers.
+
+One pooled httpx.AsyncClient per provider keeps TLS connections alive
+between calls. Each provider has a concurrency limit (extra callers wait
+for a slot instead of opening more connections), a per-call timeout, and
+retries with exponential backoff and full jitter for transport errors, 429
+and 5xx responses (Retry-After is honoured when the provider sends it).
+Every attempt also feeds a per-provider circuit breaker
+(services/circuit_breaker.py); while a provider's circuit is open, calls
+fail at once with CircuitOpenError instead of queueing behind it.
+
+Providers speak their public REST APIs directly, so base URLs can point at
+a local fake server for testing (see fake_llm_server.py):
+
+    GROQ_BASE_URL=http://127.0.0.1:8765/openai/v1 \\
+    GEMINI_BASE_URL=http://127.0.0.1:8765/v1beta uvicorn server:app
+"""
+
+import asyncio
+import json
+import os
+import random
+import time
+from typing import AsyncIterator, Dict, Optional
+
+import httpx
+
+from services.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+from services.log import get_logger
+from services.metrics import llm_errors, llm_request_seconds, register_collector
+
+log = get_logger(__name__)
+
+LLM_TIMEOUT_SECONDS = float(os.environ.get("LLM_TIMEOUT_SECONDS", "20"))
+LLM_MAX_RETRIES = int(os.environ.get("LLM_MAX_RETRIES", "2"))
+LLM_BACKOFF_SECONDS = float(os.environ.get("LLM_BACKOFF_SECONDS", "0.5"))
+# Concurrent in-flight calls per provider
+LLM_MAX_CONCURRENCY = int(os.environ.get("LLM_MAX_CONCURRENCY", "8"))
+
+PROVIDERS = {
+    "groq": {
+        "base_url": os.environ.get("GROQ_BASE_URL", "https://api.groq.com/openai/v1"),
+        "api_key_env": "GROQ_API_KEY",
+        "model": "llama-3.3-70b-versatile",
+    },
+    "gemini": {
+        "base_url": os.environ.get("GEMINI_BASE_URL", "https://generativelanguage.googleapis.com/v1beta"),
+        "api_key_env": "GEMINI_API_KEY",
+        "model": "gemini-2.0-flash",
+    },
+}
+
+_RETRY_STATUS = {408, 429, 500, 502, 503, 504}
+
+
+class LLMError(Exception):
+    """A provider call failed after all retries (or can't be made at all)"""
+
+    def __init__(self, provider: str, message: str, status: Optional[int] = None):
+        super().__init__(f"{provider}: {message}")
+        self.provider = provider
+        self.status = status
+
+
+class CircuitOpenError(LLMError):
+    """The provider's circuit breaker is open; no call was made"""
+
+    def __init__(self, provider: str):
+        super().__init__(provider, "circuit open")
+
+
+class LLMGateway:
+    def __init__(self, providers=PROVIDERS, timeout=LLM_TIMEOUT_SECONDS, max_retries=LLM_MAX_RETRIES,
+                 max_concurrency=LLM_MAX_CONCURRENCY):
+        self.providers = providers
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.max_concurrency = max_concurrency
+        self._loop = None
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self._slots: Dict[str, asyncio.Semaphore] = {}
+        self.breakers = {name: CircuitBreaker(name) for name in providers}
+        self.stats = {"calls": 0, "retries": 0, "failures": 0, "short_circuited": 0}
+
+    def available(self, provider: str) -> bool:
+        """False while the provider's circuit is open (a call would fail immediately)"""
+        return provider in self.breakers and self.breakers[provider].available()
+
+    def snapshot(self) -> Dict:
+        return {**self.stats, "circuits": {name: b.snapshot() for name, b in self.breakers.items()}}
+
+    def collect(self):
+        """Scrape-time metrics (services/metrics.py)"""
+        for stat, documentation in (("calls", "LLM calls made"), ("retries", "LLM attempts retried"),
+                                    ("failures", "LLM calls that failed after all retries"),
+                                    ("short_circuited", "LLM calls refused by an open circuit")):
+            yield f"soulsync_llm_{stat}_total", "counter", documentation, [({}, self.stats[stat])]
+        yield ("soulsync_llm_circuit_state", "gauge", "1 for each provider's current circuit breaker state",
+               [({"provider": name, "state": state}, int(b.state == state))
+                for name, b in self.breakers.items() for state in (CLOSED, HALF_OPEN, OPEN)])
+        yield ("soulsync_llm_circuit_opened_total", "counter", "Times each provider's circuit opened",
+               [({"provider": name}, b.stats["opened"]) for name, b in self.breakers.items()])
+
+    def _client(self, provider: str) -> httpx.AsyncClient:
+        # Pools and semaphores belong to one event loop; CLI scripts that call
+        # asyncio.run() more than once get fresh ones per loop
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop = loop
+            self._clients, self._slots = {}, {}
+        if provider not in self._clients:
+            self._clients[provider] = httpx.AsyncClient(
+                base_url=self.providers[provider]["base_url"],
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=self.max_concurrency,
+                                    max_keepalive_connections=self.max_concurrency),
+            )
+            self._slots[provider] = asyncio.Semaphore(self.max_concurrency)
+        return self._clients[provider]
+
+    def _api_key(self, provider: str) -> str:
+        env = self.providers[provider]["api_key_env"]
+        api_key = os.environ.get(env)
+        if not api_key:
+            raise LLMError(provider, f"{env} not set")
+        return api_key
+
+    def _request(self, provider: str, prompt: str, model: str, temperature: float, max_tokens: int,
+                 stream: bool = False):
+        """(path, headers, params, json body) of one completion call"""
+        api_key = self._api_key(provider)
+        if provider == "groq":
+            return ("/chat/completions", {"Authorization": f"Bearer {api_key}"}, None, {
+                "model": model,
+                "messages": [{"role": "user", "content": prompt}],
+                "temperature": temperature,
+                "max_tokens": max_tokens,
+                **({"stream": True} if stream else {}),
+            })
+        if stream:
+            path, params = f"/models/{model}:streamGenerateContent", {"key": api_key, "alt": "sse"}
+        else:
+            path, params = f"/models/{model}:generateContent", {"key": api_key}
+        return (path, None, params, {
+            "contents": [{"parts": [{"text": prompt}]}],
+            "generationConfig": {"temperature": temperature, "maxOutputTokens": max_tokens},
+        })
+
+    @staticmethod
+    def _text(provider: str, payload: dict) -> str:
+        if provider == "groq":
+            return payload["choices"][0]["message"]["content"].strip()
+        parts = payload["candidates"][0]["content"]["parts"]
+        return "".join(p.get("text", "") for p in parts).strip()
+
+    @staticmethod
+    def _delta(provider: str, payload: dict) -> str:
+        """Text of one streamed chunk"""
+        if provider == "groq":
+            return payload["choices"][0].get("delta", {}).get("content") or ""
+        candidates = payload.get("candidates") or [{}]
+        parts = candidates[0].get("content", {}).get("parts", [])
+        return "".join(p.get("text", "") for p in parts)
+
+    def _backoff(self, attempt: int, response: Optional[httpx.Response] = None) -> float:
+        retry_after = response.headers.get("retry-after") if response is not None else None
+        if retry_after:
+            try:
+                return min(float(retry_after), self.timeout)
+            except ValueError:
+                pass
+        return random.uniform(0, LLM_BACKOFF_SECONDS * 2 ** attempt)
+
+    def _breaker(self, provider: str) -> CircuitBreaker:
+        if provider not in self.providers:
+            raise LLMError(provider, "unknown provider")
+        if not self.breakers[provider].available():
+            # Fail before waiting for a concurrency slot
+            raise self._short_circuit(provider)
+        return self.breakers[provider]
+
+    def _short_circuit(self, provider: str) -> CircuitOpenError:
+        self.stats["short_circuited"] += 1
+        llm_errors.inc(provider, "circuit_open")
+        return CircuitOpenError(provider)
+
+    @staticmethod
+    def _settle(breaker: CircuitBreaker, healthy: Optional[bool], started: float):
+        """Report one attempt to the breaker; None (cancelled, 4xx, bad payload) says nothing about health"""
+        if healthy is None:
+            breaker.release()
+        else:
+            latency = time.monotonic() - started
+            breaker.record(healthy, latency)
+            llm_request_seconds.observe(latency, breaker.name, "ok" if healthy else "error")
+
+    async def complete(self, provider: str, prompt: str, model: Optional[str] = None,
+                       temperature: float = 0.7, max_tokens: int = 500,
+                       timeout: Optional[float] = None) -> str:
+        """
+        Text completion of `prompt`; raises LLMError once retries are
+        exhausted, or CircuitOpenError right away while the circuit is open
+        """
+        breaker = self._breaker(provider)
+        client = self._client(provider)
+        path, headers, params, body = self._request(
+            provider, prompt, model or self.providers[provider]["model"], temperature, max_tokens)
+
+        self.stats["calls"] += 1
+        async with self._slots[provider]:
+            error = None
+            for attempt in range(self.max_retries + 1):
+                if not breaker.allow():
+                    error = error or self._short_circuit(provider)  # opened during retries: keep the cause
+                    break
+                response, error, healthy = None, None, None
+                started = time.monotonic()
+                try:
+                    response = await client.post(path, headers=headers, params=params, json=body,
+                                                 timeout=timeout or self.timeout)
+                    if response.status_code == 200:
+                        text = self._text(provider, response.json())
+                        healthy = True
+                        return text
+                    error = LLMError(provider, f"HTTP {response.status_code}: {response.text[:200]}",
+                                     response.status_code)
+                    llm_errors.inc(provider, f"http_{response.status_code}")
+                    if response.status_code not in _RETRY_STATUS:
+                        break
+                    healthy = False
+                except httpx.TransportError as e:
+                    error = LLMError(provider, f"{type(e).__name__}: {e}")
+                    llm_errors.inc(provider, type(e).__name__)
+                    healthy = False
+                except (KeyError, IndexError, ValueError) as e:
+                    error = LLMError(provider, f"unexpected response: {e}")
+                    llm_errors.inc(provider, "bad_response")
+                    break
+                finally:
+                    self._settle(breaker, healthy, started)
+
+                if attempt < self.max_retries:
+                    self.stats["retries"] += 1
+                    delay = self._backoff(attempt, response)
+                    log.warning("%s; retrying in %.2fs", error, delay)
+                    await asyncio.sleep(delay)
+
+        self.stats["failures"] += 1
+        raise error
+
+    async def stream(self, provider: str, prompt: str, model: Optional[str] = None,
+                     temperature: float = 0.7, max_tokens: int = 500,
+                     timeout: Optional[float] = None) -> AsyncIterator[str]:
+        """
+        Yield completion text as the provider streams it (server-sent
+        events). Failures before the first chunk are retried like
+        complete(); once text has been yielded, errors are raised as-is.
+        """
+        breaker = self._breaker(provider)
+        client = self._client(provider)
+        path, headers, params, body = self._request(
+            provider, prompt, model or self.providers[provider]["model"], temperature, max_tokens, stream=True)
+
+        self.stats["calls"] += 1
+        started = False
+        async with self._slots[provider]:
+            error = None
+            for attempt in range(self.max_retries + 1):
+                if not breaker.allow():
+                    error = error or self._short_circuit(provider)  # opened during retries: keep the cause
+                    break
+                error, retry_response, healthy = None, None, None
+                sent_at = time.monotonic()
+                try:
+                    async with client.stream("POST", path, headers=headers, params=params, json=body,
+                                             timeout=timeout or self.timeout) as response:
+                        if response.status_code == 200:
+                            async for line in response.aiter_lines():
+                                if not line.startswith("data:"):
+                                    continue
+                                data = line[5:].strip()
+                                if data == "[DONE]":
+                                    break
+                                delta = self._delta(provider, json.loads(data))
+                                if delta:
+                                    if not started:
+                                        # Judged on time to first token
+                                        started, healthy = True, True
+                                        self._settle(breaker, healthy, sent_at)
+                                    yield delta
+                            healthy = True
+                            return
+                        await response.aread()
+                        error = LLMError(provider, f"HTTP {response.status_code}: {response.text[:200]}",
+                                         response.status_code)
+                        llm_errors.inc(provider, f"http_{response.status_code}")
+                        retry_response = response
+                        if response.status_code not in _RETRY_STATUS:
+                            break
+                        healthy = False
+                except httpx.TransportError as e:
+                    error = LLMError(provider, f"{type(e).__name__}: {e}")
+                    llm_errors.inc(provider, type(e).__name__)
+                    healthy = False
+                    if started:
+                        break  # text already went out; a retry would repeat it
+                finally:
+                    if not started:
+                        self._settle(breaker, healthy, sent_at)
+
+                if attempt < self.max_retries:
+                    self.stats["retries"] += 1
+                    delay = self._backoff(attempt, retry_response)
+                    log.warning("%s; retrying in %.2fs", error, delay)
+                    await asyncio.sleep(delay)
+
+        self.stats["failures"] += 1
+        raise error
+
+    async def aclose(self):
+        for client in self._clients.values():
+            await client.aclose()
+        self._clients = {}
+
+
+llm_gateway = LLMGateway()
+register_collector(llm_gateway.collect)
@@ -0,0 +1,207 @@
+"""
+Structured, non-blocking logging for the services and routes.
+
+    from services.log import get_logger
+    log = get_logger(__name__)          # logger "soulsync.<module>"
+    log.info("Serving model version %s", version)
+    log.debug("Forecast tier %s for user %s", tier, user_id, extra={"event": "forecast_tier"})
+
+A log call never writes to the stream itself. It formats the message (%-style
+arguments are only interpolated when the level is enabled) and puts the
+record on a bounded in-memory queue; one background thread (QueueListener)
+serializes and writes it. If the queue is full, because stderr is blocked
+or a burst outruns the writer, records are dropped and counted rather than
+stalling the event loop, and the writer reports how many were lost.
+
+    LOG_LEVEL        DEBUG | INFO (default) | WARNING | ERROR
+    LOG_FORMAT       json (default when stderr is not a terminal) | text
+    LOG_SAMPLE       keep 1 in N records of an event, e.g.
+                     "forecast_tier=100,quiz_adapted=10"; an event is the
+                     record's `event` extra, else the logger's module name
+    LOG_QUEUE_SIZE   records buffered before dropping (default 10000)
+
+JSON lines carry ts, level, logger, msg, any `extra` fields, and exc for
+exceptions. Only the soulsync.* loggers are handled here; uvicorn,
+gunicorn and library loggers keep their own handlers.
+"""
+
+import atexit
+import itertools
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict
+
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.environ.get("LOG_FORMAT", "text" if sys.stderr.isatty() else "json")
+LOG_QUEUE_SIZE = int(os.environ.get("LOG_QUEUE_SIZE", "10000"))
+
+ROOT = "soulsync"
+
+# Attributes every LogRecord has; anything else on a record came from `extra`
+_STANDARD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+def _parse_sampling(spec: str) -> Dict[str, int]:
+    rates = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        event, _, keep_one_in = item.partition("=")
+        try:
+            rates[event.strip()] = max(1, int(keep_one_in))
+        except ValueError:
+            print(f"[log] Ignoring LOG_SAMPLE entry {item!r}", file=sys.stderr)
+    return rates
+
+
+class SamplingFilter(logging.Filter):
+    """Keep every Nth record of a sampled event (deterministic, no RNG on the hot path)"""
+
+    def __init__(self, rates: Dict[str, int]):
+        super().__init__()
+        self.rates = rates
+        self._counters = {event: itertools.count() for event in rates}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not self.rates:
+            return True
+        event = getattr(record, "event", None) or record.name.rpartition(".")[2]
+        rate = self.rates.get(event)
+        return rate is None or next(self._counters[event]) % rate == 0
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _STANDARD_ATTRS and key not in entry:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+    """The [module] message lines the services used to print"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = f"[{record.name.rpartition('.')[2]}] {record.getMessage()}"
+        if record.levelno >= logging.WARNING:
+            line = f"{record.levelname}: {line}"
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+        return line
+
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Enqueue without blocking; count what doesn't fit"""
+
+    dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Interpolate now (arguments may change after the call); JSON and
+        # tracebacks are rendered on the writer thread
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            _DroppingQueueHandler.dropped += 1
+
+
+class _StderrHandler(logging.StreamHandler):
+    """Writer-thread side: reports dropped records before the next line it writes"""
+
+    def __init__(self):
+        super().__init__(sys.stderr)
+        self._reported = 0
+        self._last_report = 0.0
+
+    def report_dropped(self, every: float = 10.0):
+        dropped = _DroppingQueueHandler.dropped
+        if dropped > self._reported and time.monotonic() - self._last_report >= every:
+            self.stream.write(self.format(logging.LogRecord(
+                f"{ROOT}.log", logging.WARNING, __file__, 0,
+                "Log queue full: dropped %d records", (dropped - self._reported,), None)) + self.terminator)
+            self.flush()
+            self._reported, self._last_report = dropped, time.monotonic()
+
+    def emit(self, record: logging.LogRecord):
+        self.report_dropped()
+        super().emit(record)
+
+
+_listener = None
+_handler = None
+_writer = None
+_lock = threading.Lock()
+
+
+def _start():
+    """(Re)create the queue, the handler on the soulsync logger and its writer thread"""
+    global _listener, _handler, _writer
+    records = queue.Queue(LOG_QUEUE_SIZE)
+    writer = _StderrHandler()
+    writer.setFormatter(JsonFormatter() if LOG_FORMAT == "json" else TextFormatter())
+    handler = _DroppingQueueHandler(records)
+    handler.addFilter(SamplingFilter(_parse_sampling(os.environ.get("LOG_SAMPLE", ""))))
+
+    root = logging.getLogger(ROOT)
+    if _handler is not None:
+        root.removeHandler(_handler)
+    root.addHandler(handler)
+    root.setLevel(LOG_LEVEL)
+    root.propagate = False
+    _listener = logging.handlers.QueueListener(records, writer)
+    _listener.start()
+    _handler, _writer = handler, writer
+
+
+def _after_fork():
+    # The writer thread does not survive fork (gunicorn workers): start a
+    # fresh one with its own queue; records the parent had queued stay there
+    global _listener
+    _listener = None
+    _DroppingQueueHandler.dropped = 0
+    _start()
+
+
+def dropped() -> int:
+    """Records lost to a full queue since this process started"""
+    return _DroppingQueueHandler.dropped
+
+
+def flush():
+    """Write out everything queued so far (e.g. before a CLI prints its report)"""
+    if _listener is not None:
+        _listener.stop()
+        _listener.start()
+
+
+def _stop():
+    if _listener is not None:
+        _listener.stop()
+        _writer.report_dropped(every=0)
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Logger for a module: get_logger(__name__) -> soulsync.<module>"""
+    with _lock:
+        if _listener is None:
+            _start()
+            os.register_at_fork(after_in_child=_after_fork)
+            atexit.register(_stop)
+    return logging.getLogger(f"{ROOT}.{name.rpartition('.')[2]}")
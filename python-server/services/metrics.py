@@ -0,0 +1,358 @@
+"""
+In-process metrics, exposed in the Prometheus text format at /metrics.
+
+Counters and histograms live in plain dicts keyed by label values; an
+update is a bisect and a couple of additions under an uncontended lock,
+so instrumenting a hot path costs about a microsecond. Values that services
+already track (LLM gateway stats, circuit states, queue depths) are not
+duplicated: collectors registered with register_collector() read them only
+when /metrics is scraped.
+
+With several gunicorn workers (METRICS_DIR set, see gunicorn.conf.py) each
+worker writes its values to METRICS_DIR/<pid>.json every
+METRICS_FLUSH_SECONDS, and whichever worker answers the scrape sums the
+counters and histograms of all of them. Gauges are per process and get a
+`pid` label; those of workers that have exited are dropped.
+"""
+
+import asyncio
+import bisect
+import json
+import os
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from services.log import dropped as log_records_dropped, get_logger
+
+log = get_logger(__name__)
+
+METRICS_DIR = os.environ.get("METRICS_DIR")
+METRICS_FLUSH_SECONDS = float(os.environ.get("METRICS_FLUSH_SECONDS", "5"))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+INFERENCE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+
+# A family: (kind, help, [(labels, value), ...]); a histogram's value is
+# {"le": [...], "counts": [...per bucket, +Inf last], "sum": float}
+Family = Tuple[str, str, List[Tuple[Dict[str, str], object]]]
+
+_metrics = []
+_collectors: List[Callable[[], Iterable[Tuple[str, str, str, list]]]] = []
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+        _metrics.append(self)
+
+    def _samples(self) -> list:
+        with self._lock:
+            items = [(k, list(v) if isinstance(v, list) else v) for k, v in self._values.items()]
+        return [(dict(zip(self.labels, k)), self._value(v)) for k, v in items]
+
+    def _value(self, raw):
+        return raw
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labels, amount: float = 1.0):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, *labels):
+        i = bisect.bisect_left(self.buckets, value)  # first bucket with value <= le
+        with self._lock:
+            series = self._values.get(labels)
+            if series is None:
+                series = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[i] += 1
+            series[-1] += value
+
+    def time(self, *labels) -> "_Timer":
+        """Context manager observing the duration of its block"""
+        return _Timer(self, labels)
+
+    def _value(self, raw):
+        return {"le": list(self.buckets), "counts": raw[:-1], "sum": raw[-1]}
+
+
+class _Timer:
+    __slots__ = ("histogram", "labels", "started")
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.started, *self.labels)
+        return False
+
+
+def _reset_after_fork():
+    # A forked worker starts from zero; it would otherwise also report
+    # whatever the parent counted (e.g. warm-up calls in the gunicorn master)
+    global _loop
+    _loop = None
+    for metric in _metrics:
+        metric._values = {}
+        metric._lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def register_collector(collect: Callable[[], Iterable[Tuple[str, str, str, list]]]):
+    """
+    Add a scrape-time source: `collect()` yields (name, kind, help, samples)
+    with kind "counter" or "gauge" and samples [(labels dict, value), ...]
+    """
+    _collectors.append(collect)
+
+
+# ---------------------------------------------------------------------------
+# Shared metrics
+# ---------------------------------------------------------------------------
+
+http_request_seconds = Histogram(
+    "soulsync_http_request_duration_seconds", "HTTP request latency (streams: until the last byte)",
+    ("method", "route", "status"))
+model_inference_seconds = Histogram(
+    "soulsync_model_inference_seconds", "Time spent in one model call (XGBoost: a whole forecast)",
+    ("model",), INFERENCE_BUCKETS)
+llm_request_seconds = Histogram(
+    "soulsync_llm_request_duration_seconds", "LLM provider latency per attempt (streams: to first token)",
+    ("provider", "outcome"))
+llm_errors = Counter("soulsync_llm_errors_total", "Failed LLM attempts by cause", ("provider", "error"))
+cache_requests = Counter("soulsync_cache_requests_total", "Cache lookups", ("cache", "result"))
+singleflight_calls = Counter("soulsync_singleflight_calls_total",
+                             "Calls to coalesced operations: leader ran it, shared awaited a run in flight",
+                             ("operation", "role"))
+admission_requests = Counter("soulsync_admission_requests_total",
+                             "Admission decisions: admitted, or refused with 503 (queue_full, timed_out)",
+                             ("endpoint", "lane", "outcome"))
+admission_wait_seconds = Histogram("soulsync_admission_wait_seconds", "Time queued requests waited for a slot",
+                                   ("endpoint",))
+
+_in_flight = 0
+# The event loop serving requests, recorded by MetricsMiddleware: /metrics
+# itself may be rendered on a threadpool thread, which has no running loop
+_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def _process_families():
+    executor_queue, executor_threads = 0, 0
+    try:
+        executor = _loop._default_executor  # asyncio.to_thread / run_in_executor(None)
+        if executor is not None:
+            executor_queue, executor_threads = executor._work_queue.qsize(), len(executor._threads)
+    except AttributeError:
+        pass
+    lookups = {}
+    for labels, count in cache_requests._samples():
+        lookups.setdefault(labels["cache"], {})[labels["result"]] = count
+    yield ("soulsync_cache_hit_ratio", "gauge", "Hits / lookups since this process started",
+           [({"cache": cache}, counts.get("hit", 0) / sum(counts.values())) for cache, counts in lookups.items()])
+    yield ("soulsync_http_requests_in_flight", "gauge", "Requests being handled", [({}, _in_flight)])
+    yield ("soulsync_executor_queue_depth", "gauge", "Jobs waiting for a thread in the default executor",
+           [({}, executor_queue)])
+    yield ("soulsync_executor_threads", "gauge", "Threads started by the default executor", [({}, executor_threads)])
+    yield ("soulsync_log_records_dropped_total", "counter", "Log records dropped because the log queue was full",
+           [({}, log_records_dropped())])
+
+
+register_collector(_process_families)
+
+
+# ---------------------------------------------------------------------------
+# Middleware
+# ---------------------------------------------------------------------------
+
+_PARAM = re.compile(r"{(\w+)(?::\w+)?}")
+_route_prefixes = {}  # id(route) -> prefix it was included under; routes live as long as the app
+
+
+def _route_template(scope) -> str:
+    """
+    Full path template of the matched route, e.g. /api/predict/{user_id}.
+    Routers included with a prefix may report only their own part of the
+    path, so the prefix is recovered from the request path once per route.
+    """
+    route = scope.get("route")
+    template = getattr(route, "path", None)
+    if template is None:
+        return "unmatched"
+    prefix = _route_prefixes.get(id(route))
+    if prefix is None:
+        params = scope.get("path_params", {})
+        rendered = _PARAM.sub(lambda m: str(params.get(m.group(1), m.group(0))), template)
+        path = scope["path"]
+        prefix = path[:-len(rendered)] if rendered and path.endswith(rendered) else ""
+        _route_prefixes[id(route)] = prefix
+    return prefix + template
+
+
+class MetricsMiddleware:
+    """ASGI middleware timing every HTTP request by route template"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        global _in_flight, _loop
+        if _loop is None:
+            _loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        status = 500
+
+        async def send_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        _in_flight += 1
+        try:
+            await self.app(scope, receive, send_status)
+        finally:
+            _in_flight -= 1
+            http_request_seconds.observe(time.perf_counter() - started, scope["method"], _route_template(scope),
+                                         str(status))
+
+
+# ---------------------------------------------------------------------------
+# Exposition
+# ---------------------------------------------------------------------------
+
+def _families() -> Dict[str, Family]:
+    families = {m.name: (m.kind, m.documentation, m._samples()) for m in _metrics}
+    for collect in _collectors:
+        try:
+            for name, kind, documentation, samples in collect():
+                families[name] = (kind, documentation, samples)
+        except Exception as e:
+            log.error("Collector %s failed: %s", getattr(collect, "__qualname__", collect), e)
+    return families
+
+
+def flush():
+    """Write this process's values for the other workers to merge"""
+    if not METRICS_DIR:
+        return
+    directory = Path(METRICS_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f"{os.getpid()}.json"
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "w") as f:
+        json.dump(_families(), f)
+    os.replace(tmp, path)
+
+
+async def flush_periodically():
+    """Background loop for multi-worker setups (no-op without METRICS_DIR)"""
+    while METRICS_DIR:
+        try:
+            await asyncio.to_thread(flush)
+        except Exception as e:
+            log.error("Flush failed: %s", e)
+        await asyncio.sleep(METRICS_FLUSH_SECONDS)
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _merged() -> Dict[str, Family]:
+    """Every worker's families: counters and histograms summed, gauges labelled by pid"""
+    own = os.getpid()
+    per_process = {own: _families()}
+    for path in Path(METRICS_DIR).glob("*.json"):
+        try:
+            pid = int(path.stem)
+            if pid != own:
+                with open(path) as f:
+                    per_process[pid] = json.load(f)
+        except (ValueError, OSError):
+            continue
+
+    merged: Dict[str, Tuple[str, str, dict]] = {}
+    for pid, families in per_process.items():
+        alive = pid == own or _alive(pid)
+        for name, (kind, documentation, samples) in families.items():
+            series = merged.setdefault(name, (kind, documentation, {}))[2]
+            for labels, value in samples:
+                if kind == "gauge":
+                    if not alive:
+                        continue
+                    labels = {**labels, "pid": str(pid)}
+                key = tuple(sorted(labels.items()))
+                if key not in series:
+                    series[key] = (labels, value if kind != "histogram" else {**value, "counts": list(value["counts"])})
+                elif kind == "histogram":
+                    total = series[key][1]
+                    total["counts"] = [a + b for a, b in zip(total["counts"], value["counts"])]
+                    total["sum"] += value["sum"]
+                else:
+                    series[key] = (labels, series[key][1] + value)
+    return {name: (kind, doc, list(series.values())) for name, (kind, doc, series) in merged.items()}
+
+
+def _label_text(labels: Dict[str, str], extra: Optional[Tuple[str, str]] = None) -> str:
+    items = list(labels.items()) + ([extra] if extra else [])
+    if not items:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in items)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(items, escaped)) + "}"
+
+
+def _number(value) -> str:
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+def render() -> str:
+    families = _merged() if METRICS_DIR else _families()
+    lines = []
+    for name, (kind, documentation, samples) in sorted(families.items()):
+        lines.append(f"# HELP {name} {documentation}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in samples:
+            if kind == "histogram":
+                cumulative = 0
+                for le, count in zip(value["le"] + ["+Inf"], value["counts"]):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_label_text(labels, ('le', str(le)))} {cumulative}")
+                lines.append(f"{name}_sum{_label_text(labels)} {_number(value['sum'])}")
+                lines.append(f"{name}_count{_label_text(labels)} {cumulative}")
+            else:
+                lines.append(f"{name}{_label_text(labels)} {_number(value)}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,230 @@
+"""
+Versioned model store.
+
+Layout (relative to the python-server directory):
+
+    models/
+      xgboost_models/          legacy, unversioned artifacts (still read if
+      weight_models/           no version has been published yet)
+      versions/<version_id>/
+        xgboost_models/...
+        weight_models/...
+        manifest.json          sha256 + size per file, metrics, parent version
+      CURRENT                  {"version": ..., "previous": ...}
+
+Versions are immutable once published. A version directory is assembled
+under a temporary name and renamed into place, and CURRENT is replaced with
+os.replace, so readers never observe a half-written model or pointer.
+Rollback is just rewriting CURRENT to point at an older version.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+from services.log import get_logger
+
+log = get_logger(__name__)
+
+MODEL_ROOT = Path(os.environ.get("MODEL_ROOT", Path(__file__).resolve().parent.parent / "models"))
+
+# Sub-directories that make up one model version
+ARTIFACT_DIRS = ("xgboost_models", "weight_models")
+
+
+def _sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _write_json_atomic(path: Path, data: dict):
+    """Write JSON to a temp file in the same directory, fsync, then os.replace."""
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f, indent=2, default=str)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except Exception:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+
+
+class ModelStore:
+    """Publish, activate and roll back immutable model versions"""
+
+    def __init__(self, root=MODEL_ROOT):
+        self.root = Path(root)
+        self.versions_dir = self.root / "versions"
+        self.pointer_file = self.root / "CURRENT"
+
+    # ------------------------------------------------------------------
+    # Reading
+    # ------------------------------------------------------------------
+
+    def _read_pointer(self) -> dict:
+        try:
+            with open(self.pointer_file) as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def current_version(self):
+        """Active version id, or None when serving the legacy layout"""
+        return self._read_pointer().get("version")
+
+    def version_dir(self, version=None) -> Path:
+        """Directory holding the artifacts of `version` (default: active one)"""
+        version = version or self.current_version()
+        if version is None:
+            return self.root  # legacy: models/xgboost_models, models/weight_models
+        return self.versions_dir / version
+
+    def manifest(self, version) -> dict:
+        with open(self.versions_dir / version / "manifest.json") as f:
+            return json.load(f)
+
+    def list_versions(self) -> list:
+        if not self.versions_dir.exists():
+            return []
+        versions = []
+        for d in sorted(self.versions_dir.iterdir()):
+            if d.name.startswith(".") or not (d / "manifest.json").exists():
+                continue
+            m = self.manifest(d.name)
+            versions.append({
+                "version": d.name,
+                "created_at": m.get("created_at"),
+                "parent": m.get("parent"),
+                "metrics": m.get("metrics", {}),
+            })
+        return versions
+
+    def verify(self, version) -> bool:
+        """Check every file listed in the manifest against its checksum"""
+        vdir = self.versions_dir / version
+        try:
+            files = self.manifest(version)["files"]
+        except (FileNotFoundError, KeyError, json.JSONDecodeError):
+            return False
+        for rel, meta in files.items():
+            path = vdir / rel
+            if not path.exists() or path.stat().st_size != meta["bytes"] or _sha256(path) != meta["sha256"]:
+                log.error("Checksum mismatch in %s: %s", version, rel)
+                return False
+        return True
+
+    # ------------------------------------------------------------------
+    # Writing
+    # ------------------------------------------------------------------
+
+    @contextmanager
+    def staged(self, name):
+        """
+        Yield a scratch copy of the active `name` artifact dir. Training
+        scripts write their outputs into it and pass it to publish(), so
+        files they don't produce are carried into the new version.
+        """
+        if name not in ARTIFACT_DIRS:
+            raise ValueError(f"Unknown artifact dir: {name}")
+        tmp = Path(tempfile.mkdtemp(prefix="soulsync-stage-"))
+        stage_dir = tmp / name
+        src = self.version_dir() / name
+        if src.exists():
+            shutil.copytree(src, stage_dir)
+        else:
+            stage_dir.mkdir()
+        try:
+            yield stage_dir
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    def publish(self, artifacts: dict, metrics: dict = None, activate: bool = True) -> str:
+        """
+        Publish a new immutable version.
+
+        Args:
+            artifacts: {artifact_dir_name: staging_path} e.g.
+                       {"xgboost_models": "/tmp/stage/xgboost_models"}.
+                       Artifact dirs not given are carried over from the
+                       currently active version (or the legacy layout).
+            metrics:   Free-form metrics recorded in the manifest
+            activate:  Flip CURRENT to the new version once it is in place
+
+        Returns:
+            The new version id
+        """
+        unknown = set(artifacts) - set(ARTIFACT_DIRS)
+        if unknown:
+            raise ValueError(f"Unknown artifact dirs: {sorted(unknown)}")
+
+        parent = self.current_version()
+        parent_dir = self.version_dir(parent)
+        version = datetime.now().strftime("%Y%m%dT%H%M%S") + "-" + uuid.uuid4().hex[:6]
+
+        self.versions_dir.mkdir(parents=True, exist_ok=True)
+        staging = Path(tempfile.mkdtemp(dir=self.versions_dir, prefix=f".{version}."))
+        try:
+            for name in ARTIFACT_DIRS:
+                src = Path(artifacts[name]) if name in artifacts else parent_dir / name
+                if src.exists():
+                    shutil.copytree(src, staging / name)
+
+            files = {}
+            for path in sorted(staging.rglob("*")):
+                if path.is_file():
+                    rel = path.relative_to(staging).as_posix()
+                    files[rel] = {"sha256": _sha256(path), "bytes": path.stat().st_size}
+
+            _write_json_atomic(staging / "manifest.json", {
+                "version": version,
+                "parent": parent,
+                "created_at": datetime.now().isoformat(),
+                "metrics": metrics or {},
+                "files": files,
+            })
+            os.rename(staging, self.versions_dir / version)
+        except Exception:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+        log.info("Published version %s (%d files)", version, len(files))
+        if activate:
+            self.activate(version)
+        return version
+
+    def activate(self, version):
+        """Point CURRENT at `version` after verifying its checksums"""
+        if not self.verify(version):
+            raise ValueError(f"Model version {version} is missing or corrupt")
+        previous = self.current_version()
+        if previous == version:
+            return
+        _write_json_atomic(self.pointer_file, {
+            "version": version,
+            "previous": previous,
+            "activated_at": datetime.now().isoformat(),
+        })
+        log.info("Activated %s (previous: %s)", version, previous)
+
+    def rollback(self):
+        """Flip CURRENT back to the previously active version"""
+        previous = self._read_pointer().get("previous")
+        if not previous:
+            raise ValueError("No previous model version to roll back to")
+        self.activate(previous)
+        return previous
+
+
+store = ModelStore()
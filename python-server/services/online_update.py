@@ -0,0 +1,181 @@
+"""
+Online incremental updates for per-user forecast models.
+
+New daily risk scores are appended to the user's history (the ring buffers
+in services/risk_history.py) and the user is queued for a refresh. A single
+background thread debounces the queue (a user who gets several scores in a
+burst is only refit once) and then either continues boosting the user's
+existing booster on the recent window (warm start) or refits just that user
+from scratch when there is no model yet or the booster has grown too large.
+"""
+
+import copy
+import os
+import threading
+import time
+from datetime import date, datetime
+
+import numpy as np
+
+from services.log import get_logger
+from services.risk_history import risk_history
+from services.xgboost_service import FORECAST_MODE, normalize_user_key
+
+log = get_logger(__name__)
+
+# Seconds a user must be quiet before their model is refreshed
+ONLINE_DEBOUNCE_SECONDS = float(os.environ.get("ONLINE_DEBOUNCE_SECONDS", "60"))
+# Extra boosting rounds added per warm-start update
+ONLINE_BOOST_ROUNDS = int(os.environ.get("ONLINE_BOOST_ROUNDS", "10"))
+# Warm starts train on the most recent N days only
+ONLINE_WINDOW_DAYS = int(os.environ.get("ONLINE_WINDOW_DAYS", "30"))
+# Refit from scratch once a booster grows past this many trees
+ONLINE_MAX_TREES = int(os.environ.get("ONLINE_MAX_TREES", "300"))
+# Minimum history before a user without a model gets one
+ONLINE_MIN_HISTORY = int(os.environ.get("ONLINE_MIN_HISTORY", "14"))
+
+
+def build_training_features(risks, dates):
+    """
+    Numpy port of train_xgboost_model.create_features so online refits see
+    the same feature semantics as the batch trainer. Columns follow
+    XGBoostPredictor.feature_cols.
+    """
+    r = np.asarray(risks, dtype=float)
+    n = len(r)
+    idx = np.arange(n)
+
+    def window(i, w):
+        return r[max(0, i - w + 1):i + 1]
+
+    def trend(series):
+        return float(np.polyfit(np.arange(len(series)), series, 1)[0])
+
+    def bfill_first(col):
+        # pandas rolling(min_periods) leaves NaN on row 0; trainer back-fills it
+        if n > 1:
+            col[0] = col[1]
+        else:
+            col[0] = 0.0
+        return col
+
+    lags = [r[np.maximum(idx - lag, 0)] for lag in range(1, 8)]
+    mean_3 = np.array([window(i, 3).mean() for i in idx])
+    mean_7 = np.array([window(i, 7).mean() for i in idx])
+    std_3 = bfill_first(np.array([np.std(window(i, 3), ddof=1) if i else np.nan for i in idx]))
+    std_7 = bfill_first(np.array([np.std(window(i, 7), ddof=1) if i else np.nan for i in idx]))
+    trend_7 = bfill_first(np.array([trend(window(i, 7)) if i else np.nan for i in idx]))
+    dow = np.array([datetime.strptime(d, "%Y-%m-%d").weekday() for d in dates], dtype=float)
+
+    X = np.column_stack(lags + [mean_3, mean_7, std_3, std_7, trend_7, dow])
+    return X, r
+
+
+class OnlineUpdater:
+    """Debounced background queue of per-user model refreshes"""
+
+    def __init__(self, predictor, history=None, debounce_seconds=ONLINE_DEBOUNCE_SECONDS):
+        self.predictor = predictor
+        self.history = history or risk_history
+        self.debounce_seconds = debounce_seconds
+        self._due = {}  # user key -> monotonic time the refresh may run
+        self._cond = threading.Condition()
+        self._thread = None
+        self.stats = {"queued": 0, "warm_starts": 0, "refits": 0, "skipped": 0, "errors": 0}
+
+    def submit(self, user_id, risk_score, day=None):
+        """Record a new daily score and (re)schedule the user's refresh"""
+        user_key = normalize_user_key(user_id)
+        if user_key is None:
+            raise ValueError(f"Invalid user_id: {user_id!r}")
+        self.history.append(user_key, day or date.today().isoformat(), float(risk_score))
+        with self._cond:
+            self._due[user_key] = time.monotonic() + self.debounce_seconds
+            self.stats["queued"] += 1
+            self._cond.notify()
+        self._ensure_worker()
+
+    def pending(self):
+        with self._cond:
+            return len(self._due)
+
+    def collect(self):
+        """Scrape-time metrics (services/metrics.py)"""
+        yield ("soulsync_online_update_queue_depth", "gauge", "Users waiting for a model refresh",
+               [({}, self.pending())])
+        yield ("soulsync_online_updates_total", "counter", "Online model refreshes by outcome",
+               [({"outcome": outcome}, count) for outcome, count in self.stats.items() if outcome != "queued"])
+
+    def _ensure_worker(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="online-updater", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    now = time.monotonic()
+                    ready = [k for k, t in self._due.items() if t <= now]
+                    if ready:
+                        for k in ready:
+                            del self._due[k]
+                        break
+                    timeout = min(self._due.values()) - now if self._due else None
+                    self._cond.wait(timeout)
+            for user_key in ready:
+                try:
+                    self.update_user(user_key)
+                except Exception as e:
+                    self.stats["errors"] += 1
+                    log.error("Update failed for user %s: %s", user_key, e)
+
+    def update_user(self, user_key):
+        """Warm-start or refit one user's model from their history"""
+        version = self.predictor.version
+        series = self.history.get(user_key)
+        if FORECAST_MODE == "global" or len(series) < ONLINE_MIN_HISTORY:
+            # Global mode serves everyone from one model; history is still recorded
+            self.stats["skipped"] += 1
+            return None
+
+        dates, risks = zip(*series)
+        X, y = build_training_features(risks, dates)
+        model, scaler = self.predictor._load_model(user_key)
+
+        if model is not None and len(model.get_booster().get_dump()) + ONLINE_BOOST_ROUNDS <= ONLINE_MAX_TREES:
+            # Continue boosting on the recent window with the existing scaler
+            X_recent = scaler.transform(X[-ONLINE_WINDOW_DAYS:])
+            new_model = copy.deepcopy(model)
+            new_model.set_params(n_estimators=ONLINE_BOOST_ROUNDS)
+            new_model.fit(X_recent, y[-ONLINE_WINDOW_DAYS:], xgb_model=model.get_booster())
+            new_scaler = scaler
+            kind = "warm_starts"
+        else:
+            new_model, new_scaler = self._refit(X, y)
+            kind = "refits"
+
+        if self.predictor.install_user_model(user_key, new_model, new_scaler, version):
+            self.stats[kind] += 1
+            log.info("%s for user %s on %d days (model version %s)", kind[:-1], user_key, len(y), version,
+                     extra={"event": "online_update"})
+        return kind
+
+    @staticmethod
+    def _refit(X, y):
+        """Same estimator settings as train_xgboost_model.train_xgboost_per_user"""
+        from sklearn.preprocessing import StandardScaler
+        from xgboost import XGBRegressor
+
+        scaler = StandardScaler()
+        model = XGBRegressor(
+            n_estimators=100,
+            max_depth=6,
+            learning_rate=0.1,
+            subsample=0.8,
+            colsample_bytree=0.8,
+            random_state=42,
+            verbosity=0
+        )
+        model.fit(scaler.fit_transform(X), y)
+        return model, scaler
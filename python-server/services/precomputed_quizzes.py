@@ -0,0 +1,126 @@
+"""
+Keyed store of materialized adaptive quizzes.
+
+A user's adaptive quiz is fully determined by their category scores, the
+base quiz, the day and the question pool, so it can be built ahead of time.
+The store keeps the last scores seen for each user (which users are active,
+and what to build for them) and one pre-serialized, zlib-compressed quiz per
+(user, day), tagged with a fingerprint of the inputs. A lookup only hits if
+the fingerprint still matches, so a user whose scores changed since the
+batch ran gets a live quiz instead of a stale one.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from services.question_bank import canonical_json
+
+DB_PATH = Path(os.environ.get(
+    "PRECOMPUTED_QUIZ_DB",
+    Path(__file__).resolve().parent.parent / "data" / "online" / "precomputed_quizzes.db",
+))
+
+
+def quiz_fingerprint(score_map: Dict[str, float], base_hash: str) -> str:
+    scores = {cat: round(float(score), 4) for cat, score in score_map.items()}
+    return hashlib.sha256(canonical_json({"scores": scores, "base": base_hash})).hexdigest()[:16]
+
+
+class PrecomputedQuizStore:
+    """SQLite store of last-seen scores and materialized quizzes"""
+
+    def __init__(self, path=DB_PATH):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._conn = None
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        # Reconnect in forked workers; the inherited connection is kept, not closed
+        self._inherited_conn, self._conn = self._conn, None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS quiz_inputs (
+                    user_id   TEXT PRIMARY KEY,
+                    scores    TEXT NOT NULL,
+                    base_hash TEXT NOT NULL,
+                    seen_at   REAL NOT NULL
+                )""")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS precomputed_quizzes (
+                    user_id     TEXT NOT NULL,
+                    day         TEXT NOT NULL,
+                    fingerprint TEXT NOT NULL,
+                    payload     BLOB NOT NULL,
+                    created_at  REAL NOT NULL,
+                    PRIMARY KEY (user_id, day)
+                )""")
+            self._conn = conn
+        return self._conn
+
+    # ------------------------------------------------------------------
+    # Last-seen inputs
+    # ------------------------------------------------------------------
+
+    def record_inputs(self, user_id: str, score_map: Dict[str, float], base_hash: str):
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.execute("INSERT OR REPLACE INTO quiz_inputs VALUES (?, ?, ?, ?)",
+                             (user_id, json.dumps(score_map), base_hash, time.time()))
+
+    def active_users(self, since_seconds: float) -> List[Tuple[str, Dict[str, float], str]]:
+        """[(user_id, score_map, base_hash)] for users seen in the last `since_seconds`"""
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT user_id, scores, base_hash FROM quiz_inputs WHERE seen_at >= ?",
+                (time.time() - since_seconds,)).fetchall()
+        return [(user_id, json.loads(scores), base_hash) for user_id, scores, base_hash in rows]
+
+    # ------------------------------------------------------------------
+    # Materialized quizzes
+    # ------------------------------------------------------------------
+
+    def get(self, user_id: str, day: str, fingerprint: str) -> Optional[bytes]:
+        """Serialized JSON quiz, or None on a miss or stale fingerprint"""
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT fingerprint, payload FROM precomputed_quizzes WHERE user_id = ? AND day = ?",
+                (user_id, day)).fetchone()
+        if row is None or row[0] != fingerprint:
+            return None
+        return zlib.decompress(row[1])
+
+    def put_many(self, day: str, quizzes: List[Tuple[str, str, Dict]]):
+        """Store [(user_id, fingerprint, quiz)] for `day` in one transaction"""
+        now = time.time()
+        rows = [(user_id, day, fingerprint, zlib.compress(canonical_json(quiz)), now)
+                for user_id, fingerprint, quiz in quizzes]
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.executemany("INSERT OR REPLACE INTO precomputed_quizzes VALUES (?, ?, ?, ?, ?)", rows)
+
+    def prune(self, before_day: str) -> int:
+        """Drop quizzes for days before `before_day`; returns rows removed"""
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                return conn.execute("DELETE FROM precomputed_quizzes WHERE day < ?", (before_day,)).rowcount
+
+
+quiz_store = PrecomputedQuizStore()
@@ -0,0 +1,278 @@
+"""
+Indexed, hot-reloadable question bank for the adaptive quiz.
+
+Every quiz file in data/ is parsed into one immutable snapshot: a tuple of
+questions plus index tuples by category, type, severity and id. When any
+file is added, removed or modified the next lookup (at most once every
+QUESTION_BANK_CHECK_SECONDS) rebuilds the snapshot and swaps it in with a
+single reference assignment, so readers never see a half-built index.
+
+Extra sources (the persistent store of LLM-generated questions) can be
+attached with add_source(); their revision is part of the reload signature
+and their questions sort ahead of the curated ones in every pool.
+
+The base daily check-in (dailyCheckinQuiz.json) is held in the same
+snapshot, parsed and pre-serialized, under a content-hash version id so
+callers can reference it instead of posting it with every request.
+
+Sampling draws k questions with a seeded partial Fisher-Yates over a sparse
+swap map, so it costs O(k) no matter how large a category grows.
+"""
+
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from services.log import get_logger
+
+log = get_logger(__name__)
+
+DATA_DIR = Path(__file__).resolve().parent.parent.parent / "data"
+
+# The default daily check-in; its questions are the base quiz, not follow-ups
+BASE_QUIZ_FILE = "dailyCheckinQuiz.json"
+
+ADAPTIVE_CATEGORIES = ("anxiety", "sleep", "stress", "depression")
+SEVERITIES = ("moderate", "significant", "severe")
+
+QUESTION_BANK_CHECK_SECONDS = float(os.environ.get("QUESTION_BANK_CHECK_SECONDS", "5"))
+
+
+def load_quiz_file(path) -> dict:
+    with open(path, "r", encoding="utf-8") as f:
+        content = f.read()
+        # Strip JS-style comments (the JSON files start with //)
+        lines = content.split("\n")
+        clean = "\n".join(l for l in lines if not l.strip().startswith("//"))
+        return json.loads(clean)
+
+
+def canonical_json(obj) -> bytes:
+    return json.dumps(obj, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode()
+
+
+def base_quiz_hash(base_questions: List[Dict]) -> str:
+    """Content version id of a base quiz (independent of key order/whitespace)"""
+    return hashlib.sha256(canonical_json(base_questions)).hexdigest()[:16]
+
+
+def severity_for_score(score: float) -> str:
+    """Severity band of a 0-1 category score (matches the LLM prompt wording)"""
+    if score >= 0.75:
+        return "severe"
+    if score >= 0.6:
+        return "significant"
+    return "moderate"
+
+
+def _is_trivia(q: Dict) -> bool:
+    # Knowledge questions have lettered options ("A.", "B." ...)
+    opts = q.get("options", [])
+    return bool(opts) and any(str(o).startswith(("A.", "B.", "C.", "D.", "E.", "F.", "G.")) for o in opts)
+
+
+def _normalize_text(text: str) -> str:
+    return " ".join(str(text).lower().split())
+
+
+def sample_indices(n: int, k: int, rng: random.Random) -> List[int]:
+    """
+    First k positions of a Fisher-Yates shuffle of range(n), without
+    materializing the permutation: only swapped slots are stored.
+    """
+    swapped = {}
+    picked = []
+    for i in range(min(k, n)):
+        j = rng.randrange(i, n)
+        vi = swapped.get(i, i)
+        vj = swapped.get(j, j)
+        swapped[j] = vi
+        picked.append(vj)
+    return picked
+
+
+class _BankSnapshot:
+    """Immutable questions + indices built from one set of files"""
+
+    def __init__(self, questions: List[Dict], signature, preferred=(), base_questions=None):
+        self.signature = signature
+        self.base_questions = base_questions
+        self.base_version = base_quiz_hash(base_questions) if base_questions is not None else None
+        self.base_json = json.dumps(base_questions, ensure_ascii=False).encode() if base_questions is not None else None
+        self.version = hashlib.sha256(repr(signature).encode()).hexdigest()[:12]
+        # Preferred (source) questions go first so each pool starts with them
+        self.questions = tuple(preferred) + tuple(questions)
+        by_id, by_category, by_type, by_severity = {}, {}, {}, {}
+        by_category_severity = {}
+        for i, q in enumerate(self.questions):
+            by_id[q["bank_id"]] = i
+            by_category.setdefault(q["category"], []).append(i)
+            by_type.setdefault(q.get("type"), []).append(i)
+            severity = q.get("severity")
+            by_severity.setdefault(severity, []).append(i)
+            by_category_severity.setdefault((q["category"], severity), []).append(i)
+        self.by_id = by_id
+        self.by_category = {k: tuple(v) for k, v in by_category.items()}
+        self.by_type = {k: tuple(v) for k, v in by_type.items()}
+        self.by_severity = {k: tuple(v) for k, v in by_severity.items()}
+        # Untagged questions fit every severity band
+        self.by_category_severity = {}
+        for cat in self.by_category:
+            untagged = tuple(by_category_severity.get((cat, None), ()))
+            for sev in SEVERITIES:
+                tagged = tuple(by_category_severity.get((cat, sev), ()))
+                self.by_category_severity[(cat, sev)] = tuple(sorted(untagged + tagged))
+        # Length of the preferred prefix of each pool (indices are ascending)
+        n_preferred = len(preferred)
+        self.preferred_count = {
+            key: sum(1 for i in pool if i < n_preferred)
+            for index in (self.by_category, self.by_category_severity)
+            for key, pool in index.items()
+        }
+
+
+class QuestionBank:
+    """Follow-up question pool for the adaptive quiz, indexed and hot-reloadable"""
+
+    def __init__(self, data_dir=DATA_DIR, check_seconds=QUESTION_BANK_CHECK_SECONDS):
+        self.data_dir = Path(data_dir)
+        self.check_seconds = check_seconds
+        self._reload_lock = threading.Lock()
+        self._next_check = 0.0
+        self._sources = []
+        self._snapshot = _BankSnapshot([], None)
+        self.reload()
+
+    # ------------------------------------------------------------------
+    # Loading
+    # ------------------------------------------------------------------
+
+    def add_source(self, source):
+        """
+        Attach a question source: any object with revision() and questions().
+        Its questions are preferred over the quiz files when sampling.
+        """
+        self._sources.append(source)
+        self.reload(force=True)
+
+    def _signature(self):
+        try:
+            files = tuple(sorted(
+                (entry.name, entry.stat().st_mtime_ns, entry.stat().st_size)
+                for entry in os.scandir(self.data_dir)
+                if entry.is_file() and entry.name.endswith(".json")
+            ))
+        except FileNotFoundError:
+            files = ()
+        return files, tuple(source.revision() for source in self._sources)
+
+    def _build(self, signature) -> _BankSnapshot:
+        files = [name for name, _, _ in signature[0]]
+        base_questions, base_texts = None, set()
+        if BASE_QUIZ_FILE in files:
+            base_questions = load_quiz_file(self.data_dir / BASE_QUIZ_FILE)["questions"]
+            base_texts = {_normalize_text(q["question"]) for q in base_questions}
+
+        questions, seen = [], set(base_texts)
+        for name in files:
+            if name == BASE_QUIZ_FILE:
+                continue
+            try:
+                quiz = load_quiz_file(self.data_dir / name)
+            except (OSError, ValueError) as e:
+                log.warning("Skipping %s: %s", name, e)
+                continue
+            # Single-category quizzes (anxietyQuiz.json ...) carry it in quizType
+            default_category = quiz.get("quizType")
+            for q in quiz.get("questions", []):
+                category = q.get("category", default_category)
+                if category not in ADAPTIVE_CATEGORIES or _is_trivia(q):
+                    continue
+                key = _normalize_text(q.get("question", ""))
+                if not key or key in seen:
+                    continue
+                seen.add(key)
+                questions.append({**q, "category": category, "bank_id": f"{Path(name).stem}:{q.get('id')}"})
+
+        # Source questions that duplicate a curated one are dropped
+        preferred = []
+        for source in self._sources:
+            for q in source.questions():
+                key = _normalize_text(q.get("question", ""))
+                if q.get("category") not in ADAPTIVE_CATEGORIES or not key or key in seen:
+                    continue
+                seen.add(key)
+                preferred.append(q)
+        return _BankSnapshot(questions, signature, preferred, base_questions)
+
+    def reload(self, force=False) -> bool:
+        """Rebuild the snapshot if any quiz file changed; returns True if swapped"""
+        with self._reload_lock:
+            self._next_check = time.monotonic() + self.check_seconds
+            try:
+                signature = self._signature()
+                if not force and signature == self._snapshot.signature:
+                    return False
+                snapshot = self._build(signature)
+            except Exception as e:
+                log.error("Reload failed, keeping version %s: %s", self._snapshot.version, e)
+                return False
+            self._snapshot = snapshot
+        counts = {c: len(snapshot.by_category.get(c, ())) for c in ADAPTIVE_CATEGORIES}
+        log.info("Loaded version %s: %s", snapshot.version, counts)
+        return True
+
+    def snapshot(self) -> _BankSnapshot:
+        if time.monotonic() >= self._next_check and not self._reload_lock.locked():
+            self.reload()
+        return self._snapshot
+
+    # ------------------------------------------------------------------
+    # Lookups
+    # ------------------------------------------------------------------
+
+    @property
+    def version(self) -> str:
+        return self.snapshot().version
+
+    def count(self, category: str, severity: Optional[str] = None) -> int:
+        snap = self.snapshot()
+        if severity:
+            return len(snap.by_category_severity.get((category, severity), ()))
+        return len(snap.by_category.get(category, ()))
+
+    def base_quiz(self):
+        """(version, questions, serialized questions) of the base quiz, or Nones"""
+        snap = self.snapshot()
+        return snap.base_version, snap.base_questions, snap.base_json
+
+    def get(self, bank_id: str) -> Optional[Dict]:
+        snap = self.snapshot()
+        i = snap.by_id.get(bank_id)
+        return None if i is None else snap.questions[i]
+
+    def sample(self, category: str, k: int, seed: str, severity: Optional[str] = None) -> List[Dict]:
+        """
+        Deterministically pick k questions of `category` (optionally limited
+        to a severity band) for `seed`. Questions from attached sources are
+        drawn first; the rest come from the quiz files. Returns shallow copies.
+        """
+        snap = self.snapshot()
+        key = (category, severity) if severity else category
+        if severity:
+            pool = snap.by_category_severity.get(key, ())
+        else:
+            pool = snap.by_category.get(key, ())
+        n_preferred = snap.preferred_count.get(key, 0)
+        rng = random.Random(int(hashlib.sha256(seed.encode()).hexdigest(), 16))
+        picked = sample_indices(n_preferred, k, rng)
+        picked += [n_preferred + i for i in sample_indices(len(pool) - n_preferred, k - len(picked), rng)]
+        return [dict(snap.questions[pool[i]]) for i in picked]
+
+
+question_bank = QuestionBank()
@@ -0,0 +1,253 @@
+"""
+Pooled cache of LLM recommendations per context bucket.
+
+build_prompt only looks at a few discrete inputs, so requests are grouped
+into buckets (risk level, trend, top factors, and bucketed days since last
+check-in / consecutive high-risk days). Each bucket holds a pool of up to
+RECOMMENDATION_POOL_SIZE distinct responses that are served round-robin, so
+users still see varied wording. A response is retired after
+RECOMMENDATION_MAX_SERVES uses, and whenever a pool drops below half full a
+background task generates more. Only a request that finds its bucket empty
+waits for the LLM, and concurrent misses on the same bucket share a single
+generation (services/singleflight.py).
+
+Refills are background traffic and yield to real requests: all of them
+together draw from one token bucket (RECOMMENDATION_REFILL_RATE calls per
+second, bursts of RECOMMENDATION_REFILL_BURST), so a cold start across many
+buckets can't flood the provider, and none start while the provider's
+circuit breaker is open or half-open. A refill that runs out of tokens
+stops early; the pool is topped up on a later request.
+"""
+
+import asyncio
+import copy
+import os
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from services.log import get_logger
+from services.metrics import cache_requests
+from services.singleflight import SingleFlight
+
+log = get_logger(__name__)
+
+RECOMMENDATION_POOL_SIZE = int(os.environ.get("RECOMMENDATION_POOL_SIZE", "8"))
+RECOMMENDATION_MAX_SERVES = int(os.environ.get("RECOMMENDATION_MAX_SERVES", "25"))
+RECOMMENDATION_CACHE_BUCKETS = int(os.environ.get("RECOMMENDATION_CACHE_BUCKETS", "2048"))
+# Parallel LLM calls per refill
+REFILL_CONCURRENCY = 2
+# LLM calls per second across all refills, and the burst allowed above that
+RECOMMENDATION_REFILL_RATE = float(os.environ.get("RECOMMENDATION_REFILL_RATE", "0.5"))
+RECOMMENDATION_REFILL_BURST = int(os.environ.get("RECOMMENDATION_REFILL_BURST", "4"))
+
+
+def _days_bucket(days: int) -> int:
+    # build_prompt distinguishes 0, 1-2 and 3+ days since the last check-in
+    days = days or 0
+    return 0 if days <= 0 else (1 if days < 3 else 3)
+
+
+def _streak_bucket(days: int) -> int:
+    # ... and 0-1, 2 and 3+ consecutive high-risk days
+    days = days or 0
+    return 1 if days <= 1 else (2 if days == 2 else 3)
+
+
+def context_bucket(data: dict) -> Tuple:
+    factors = data.get("top_factors") or []
+    return (
+        str(data.get("risk_level", "UNKNOWN")).upper(),
+        str(data.get("trend", "unknown")).lower(),
+        tuple(sorted({str(f).strip().lower() for f in factors if str(f).strip()})),
+        _days_bucket(data.get("days_since_checkin", 0)),
+        _streak_bucket(data.get("consecutive_high_risk_days", 0)),
+    )
+
+
+def bucket_context(bucket: Tuple) -> dict:
+    """Canonical prompt inputs for a bucket, so every pooled response fits all its members"""
+    risk_level, trend, factors, days, streak = bucket
+    return {
+        "risk_level": risk_level,
+        "trend": trend,
+        "top_factors": list(factors),
+        "days_since_checkin": days,
+        "consecutive_high_risk_days": streak,
+    }
+
+
+def _fingerprint(response: dict) -> str:
+    return " ".join(str(response.get("motivational_message", "")).lower().split())
+
+
+class _Pool:
+    __slots__ = ("responses", "serves", "cursor", "refilling")
+
+    def __init__(self):
+        self.responses: List[dict] = []
+        self.serves: List[int] = []
+        self.cursor = 0
+        self.refilling = False
+
+    def add(self, response: dict) -> bool:
+        if len(self.responses) >= RECOMMENDATION_POOL_SIZE:
+            return False
+        fp = _fingerprint(response)
+        if any(_fingerprint(r) == fp for r in self.responses):
+            return False
+        self.responses.append(response)
+        self.serves.append(0)
+        return True
+
+    def next(self) -> Optional[dict]:
+        if not self.responses:
+            return None
+        i = self.cursor % len(self.responses)
+        response = self.responses[i]
+        self.serves[i] += 1
+        if self.serves[i] >= RECOMMENDATION_MAX_SERVES:
+            del self.responses[i], self.serves[i]
+        else:
+            self.cursor = i + 1
+        return response
+
+    def low(self) -> bool:
+        return len(self.responses) < max(1, RECOMMENDATION_POOL_SIZE // 2)
+
+
+class _TokenBucket:
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+
+    def take(self, n: int) -> int:
+        """Take up to `n` tokens without waiting; returns how many were granted"""
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        granted = min(n, int(self._tokens))
+        self._tokens -= granted
+        return granted
+
+
+class RecommendationCache:
+    """LRU of context buckets, each a rotating pool of generated responses"""
+
+    def __init__(self, max_buckets=RECOMMENDATION_CACHE_BUCKETS,
+                 refill_rate=RECOMMENDATION_REFILL_RATE, refill_burst=RECOMMENDATION_REFILL_BURST):
+        self.max_buckets = max_buckets
+        self._pools: "OrderedDict[Tuple, _Pool]" = OrderedDict()
+        self._tasks = set()
+        self._flight = SingleFlight("recommendations")
+        self._refill_tokens = _TokenBucket(refill_rate, refill_burst)
+        # Set by the owner to report whether the provider is healthy
+        # (circuit closed); refills wait for it
+        self.provider_healthy: Callable[[], bool] = lambda: True
+        self.stats = {"hits": 0, "misses": 0, "refills": 0, "generated": 0, "refill_errors": 0,
+                      "refills_deferred": 0}
+
+    def _pool(self, bucket: Tuple) -> _Pool:
+        pool = self._pools.get(bucket)
+        if pool is None:
+            pool = self._pools[bucket] = _Pool()
+            while len(self._pools) > self.max_buckets:
+                self._pools.popitem(last=False)
+        else:
+            self._pools.move_to_end(bucket)
+        return pool
+
+    async def get(self, data: dict, generate: Callable[[dict], Awaitable[dict]]) -> dict:
+        """
+        A recommendation for `data`: from the bucket's pool if it has one,
+        otherwise generated now (once per bucket, however many requests are
+        waiting for it). Schedules a refill when the pool runs low.
+        """
+        response = self.take(data, generate)
+        if response is None:
+            response = await self._flight.do(context_bucket(data), self._generate, data, generate)
+        return copy.deepcopy(response)
+
+    async def _generate(self, data: dict, generate: Callable[[dict], Awaitable[dict]]) -> dict:
+        response = await generate(self.canonical(data))
+        self.put(data, response, generate)
+        return response
+
+    def generating(self, data: dict) -> bool:
+        """Whether a request-path generation for `data`'s bucket is in flight"""
+        return self._flight.running(context_bucket(data))
+
+    @staticmethod
+    def canonical(data: dict) -> dict:
+        """Prompt inputs to generate with, so the response can be pooled for the bucket"""
+        return bucket_context(context_bucket(data))
+
+    def take(self, data: dict, generate: Callable[[dict], Awaitable[dict]]) -> Optional[dict]:
+        """Next pooled response for `data`'s bucket, or None (counted as a miss)"""
+        bucket = context_bucket(data)
+        pool = self._pool(bucket)
+        response = pool.next()
+        if response is None:
+            self.stats["misses"] += 1
+            cache_requests.inc("recommendations", "miss")
+            return None
+        self.stats["hits"] += 1
+        cache_requests.inc("recommendations", "hit")
+        if pool.low() and not pool.refilling:
+            self._schedule_refill(bucket, pool, generate)
+        return copy.deepcopy(response)
+
+    def put(self, data: dict, response: dict, generate: Callable[[dict], Awaitable[dict]]):
+        """Pool a response generated on the request path (from canonical(data)) and top the pool up"""
+        bucket = context_bucket(data)
+        pool = self._pool(bucket)
+        self.stats["generated"] += 1
+        pool.add(copy.deepcopy(response))
+        if pool.low() and not pool.refilling:
+            self._schedule_refill(bucket, pool, generate)
+
+    def _schedule_refill(self, bucket, pool: _Pool, generate):
+        if not self.provider_healthy():
+            self.stats["refills_deferred"] += 1
+            return
+        pool.refilling = True
+        task = asyncio.create_task(self._refill(bucket, pool, generate))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _refill(self, bucket, pool: _Pool, generate):
+        self.stats["refills"] += 1
+        context = bucket_context(bucket)
+        try:
+            # Duplicates don't count, so allow a few extra attempts
+            attempts = 2 * RECOMMENDATION_POOL_SIZE
+            while len(pool.responses) < RECOMMENDATION_POOL_SIZE and attempts > 0:
+                batch = min(REFILL_CONCURRENCY, attempts, RECOMMENDATION_POOL_SIZE - len(pool.responses))
+                batch = self._refill_tokens.take(batch) if self.provider_healthy() else 0
+                if batch == 0:
+                    self.stats["refills_deferred"] += 1
+                    return
+                attempts -= batch
+                results = await asyncio.gather(*(generate(context) for _ in range(batch)),
+                                               return_exceptions=True)
+                for result in results:
+                    if isinstance(result, Exception):
+                        self.stats["refill_errors"] += 1
+                        log.warning("Refill failed for %s: %s", bucket, result)
+                        return
+                    self.stats["generated"] += 1
+                    pool.add(result)
+        finally:
+            pool.refilling = False
+
+    def snapshot(self) -> Dict:
+        return {
+            **self.stats,
+            "buckets": len(self._pools),
+            "pooled_responses": sum(len(p.responses) for p in self._pools.values()),
+        }
+
+
+recommendation_cache = RecommendationCache()
@@ -0,0 +1,204 @@
+"""
+Local retrieval-based recommendations.
+
+Every (context -> recommendation) pair in recommendation_pairs.csv is turned
+into a hashed feature vector (risk level, trend, each top factor, score and
+day buckets, user type), L2-normalized so a dot product is cosine
+similarity. A request is vectorized the same way; its nearest neighbours
+are found by a chunked scan, and the best-rated recommendations among them
+are returned. No network access is needed.
+
+The index can live in memory (built from the CSV at startup) or on disk as
+.npy files opened with mmap, built by build_recommendation_index.py. The
+on-disk form is what keeps memory and startup flat as the pair set grows:
+vectors are paged in as the scan touches them, and recommendation texts are
+read by offset only for the few winners.
+"""
+
+import json
+import os
+import random
+import zlib
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from services.log import get_logger
+from services.recommendation_cache import _days_bucket, _streak_bucket
+
+log = get_logger(__name__)
+
+PAIRS_FILE = Path(__file__).resolve().parent.parent / "data" / "training_data" / "recommendation_pairs.csv"
+INDEX_DIR = Path(os.environ.get(
+    "RECOMMENDATION_INDEX_DIR",
+    Path(__file__).resolve().parent.parent / "data" / "retrieval_index",
+))
+
+RETRIEVAL_DIM = 256
+# Neighbours considered per query, and how many top-rated ones to rotate between
+RETRIEVAL_NEIGHBORS = int(os.environ.get("RETRIEVAL_NEIGHBORS", "50"))
+RETRIEVAL_VARIETY = int(os.environ.get("RETRIEVAL_VARIETY", "3"))
+# Neighbours count as "near" if within this fraction of the best similarity
+RETRIEVAL_SIMILARITY_RATIO = 0.9
+# Rows per matrix-vector product during a scan
+SCAN_CHUNK_ROWS = 1 << 18
+
+
+def _factors(value) -> List[str]:
+    if isinstance(value, str):
+        value = value.split(",")
+    return sorted({str(f).strip().lower() for f in (value or []) if str(f).strip()})
+
+
+def context_features(context: dict) -> Dict[str, float]:
+    """Weighted feature tokens of a recommendation context"""
+    features = {
+        f"risk_level={str(context.get('risk_level', 'UNKNOWN')).upper()}": 2.0,
+        f"trend={str(context.get('trend', 'unknown')).lower()}": 1.0,
+        f"days={_days_bucket(context.get('days_since_checkin', 0))}": 0.5,
+        f"streak={_streak_bucket(context.get('consecutive_high_risk_days', 0))}": 0.5,
+    }
+    factors = _factors(context.get("top_factors"))
+    for factor in factors:
+        features[f"factor={factor}"] = 1.5 / np.sqrt(len(factors))
+    if context.get("risk_score") is not None:
+        features[f"score={int(float(context['risk_score']))}"] = 0.5
+    if context.get("user_type"):
+        features[f"user_type={context['user_type']}"] = 0.5
+    return features
+
+
+def vectorize(context: dict, dim: int = RETRIEVAL_DIM) -> np.ndarray:
+    """Signed feature hashing into `dim` buckets, L2-normalized"""
+    vec = np.zeros(dim, dtype=np.float32)
+    for token, weight in context_features(context).items():
+        h = zlib.crc32(token.encode())
+        vec[h % dim] += weight if (h >> 31) & 1 else -weight
+    norm = np.linalg.norm(vec)
+    return vec / norm if norm else vec
+
+
+class RecommendationIndex:
+    """Vectors + helpfulness + recommendation ids, in memory or memory-mapped"""
+
+    def __init__(self, vectors, helpfulness, rec_ids, recommendations=None, rec_file=None, rec_offsets=None):
+        self.vectors = vectors
+        self.helpfulness = helpfulness
+        self.rec_ids = rec_ids
+        self._recommendations = recommendations
+        self._rec_fd = os.open(rec_file, os.O_RDONLY) if rec_file else None
+        self._rec_offsets = rec_offsets
+
+    @property
+    def rows(self) -> int:
+        return len(self.rec_ids)
+
+    @classmethod
+    def from_csv(cls, path=PAIRS_FILE, dim: int = RETRIEVAL_DIM):
+        import pandas as pd
+
+        df = pd.read_csv(path)
+        recs, rec_id_by_text, rec_ids = [], {}, []
+        for text in df["output_recommendation"]:
+            if text not in rec_id_by_text:
+                rec_id_by_text[text] = len(recs)
+                recs.append(json.loads(text))
+            rec_ids.append(rec_id_by_text[text])
+        vectors = np.vstack([vectorize(json.loads(c), dim) for c in df["input_context"]]) if len(df) else \
+            np.zeros((0, dim), dtype=np.float32)
+        return cls(vectors, df["helpfulness_score"].to_numpy(np.float32), np.array(rec_ids, dtype=np.int32), recs)
+
+    @classmethod
+    def open(cls, index_dir=INDEX_DIR):
+        """Memory-map an index written by build_recommendation_index.py"""
+        index_dir = Path(index_dir)
+        return cls(
+            np.load(index_dir / "vectors.npy", mmap_mode="r"),
+            np.load(index_dir / "helpfulness.npy", mmap_mode="r"),
+            np.load(index_dir / "rec_ids.npy", mmap_mode="r"),
+            rec_file=index_dir / "recommendations.jsonl",
+            rec_offsets=np.load(index_dir / "rec_offsets.npy", mmap_mode="r"),
+        )
+
+    def recommendation(self, rec_id: int) -> dict:
+        if self._recommendations is not None:
+            return self._recommendations[rec_id]
+        start, end = int(self._rec_offsets[rec_id]), int(self._rec_offsets[rec_id + 1])
+        return json.loads(os.pread(self._rec_fd, end - start, start))
+
+    def nearest(self, query: np.ndarray, k: int):
+        """(row indices, similarities) of the k most similar rows, best first"""
+        best_idx = np.empty(0, dtype=np.int64)
+        best_sim = np.empty(0, dtype=np.float32)
+        for start in range(0, self.rows, SCAN_CHUNK_ROWS):
+            sims = np.asarray(self.vectors[start:start + SCAN_CHUNK_ROWS] @ query)
+            if len(sims) > k:
+                top = np.argpartition(sims, -k)[-k:]
+            else:
+                top = np.arange(len(sims))
+            best_idx = np.concatenate([best_idx, top + start])
+            best_sim = np.concatenate([best_sim, sims[top]])
+            if len(best_sim) > k:
+                keep = np.argpartition(best_sim, -k)[-k:]
+                best_idx, best_sim = best_idx[keep], best_sim[keep]
+        order = np.argsort(-best_sim, kind="stable")
+        return best_idx[order], best_sim[order]
+
+
+class RecommendationRetriever:
+    def __init__(self, index_dir=INDEX_DIR, pairs_file=PAIRS_FILE):
+        self.index_dir = Path(index_dir)
+        self.pairs_file = Path(pairs_file)
+        self._index = None
+
+    @property
+    def index(self) -> Optional[RecommendationIndex]:
+        if self._index is None:
+            try:
+                if (self.index_dir / "vectors.npy").exists():
+                    self._index = RecommendationIndex.open(self.index_dir)
+                    source = f"memory-mapped index {self.index_dir}"
+                elif self.pairs_file.exists():
+                    self._index = RecommendationIndex.from_csv(self.pairs_file)
+                    source = self.pairs_file.name
+                else:
+                    return None
+                log.info("Loaded %d pairs from %s", self._index.rows, source)
+            except Exception as e:
+                log.error("Could not load index: %s", e)
+                return None
+        return self._index
+
+    def candidates(self, data: dict, k: int = RETRIEVAL_NEIGHBORS) -> List[dict]:
+        """
+        Distinct recommendations among the nearest contexts (the k most
+        similar, cut to those close to the best match), best rated first
+        with ties broken by similarity. Each carries its scores.
+        """
+        index = self.index
+        if index is None or index.rows == 0:
+            return []
+        rows, sims = index.nearest(vectorize(data), k)
+        near = sims >= sims[0] * RETRIEVAL_SIMILARITY_RATIO if sims[0] > 0 else np.ones(len(sims), bool)
+        rows, sims = rows[near], sims[near]
+        best = {}
+        for row, sim in zip(rows.tolist(), sims.tolist()):
+            rec_id = int(index.rec_ids[row])
+            helpfulness = float(index.helpfulness[row])
+            if rec_id not in best or (helpfulness, sim) > best[rec_id][:2]:
+                best[rec_id] = (helpfulness, sim, rec_id)
+        ranked = sorted(best.values(), key=lambda t: (-t[0], -t[1]))
+        return [{**index.recommendation(rec_id), "helpfulness": h, "similarity": round(s, 4)}
+                for h, s, rec_id in ranked]
+
+    def recommend(self, data: dict) -> Optional[dict]:
+        """One of the top-rated nearby recommendations, or None without an index"""
+        candidates = self.candidates(data)
+        if not candidates:
+            return None
+        pick = random.choice(candidates[:RETRIEVAL_VARIETY])
+        return {"motivational_message": pick["motivational_message"], "coping_steps": list(pick["coping_steps"])}
+
+
+retriever = RecommendationRetriever()
@@ -1,21 +1,39 @@
+import asyncio
 import json
 import os
-import sys
-import groq
+from typing import AsyncIterator, Optional, Tuple
 
+from services.circuit_breaker import CLOSED
+from services.llm_gateway import LLMError, llm_gateway
+from services.log import get_logger
+from services.recommendation_cache import recommendation_cache
+from services.recommendation_retrieval import retriever
 
-def get_client():
-    api_key = os.environ.get("GROQ_API_KEY")
-    print(f"[recommendations.py] GROQ_API_KEY loaded: {bool(api_key)}", file=sys.stderr)
-    if not api_key:
-        raise ValueError("GROQ API key not configured. Please set GROQ_API_KEY environment variable.")
-    try:
-        client = groq.Groq(api_key=api_key)
-        print(f"[recommendations.py] GROQ client initialized successfully", file=sys.stderr)
-        return client
-    except Exception as e:
-        print(f"[recommendations.py] ERROR initializing GROQ client: {str(e)}", file=sys.stderr)
-        raise ValueError(f"Failed to initialize GROQ client: {str(e)}")
+log = get_logger(__name__)
+
+# Background pool refills only run while the provider's circuit is closed
+recommendation_cache.provider_healthy = lambda: llm_gateway.breakers["groq"].state == CLOSED
+
+# llm:       pooled LLM responses (recommendation_cache), generated on a cold bucket
+# retrieval: nearest-neighbour lookup in recommendation_pairs.csv only, fully offline
+# hybrid:    retrieval answer, replaced by an LLM one if it is ready within LLM_ENHANCE_SECONDS
+RECOMMENDATION_ENGINE = os.environ.get("RECOMMENDATION_ENGINE", "llm")
+LLM_ENHANCE_SECONDS = float(os.environ.get("LLM_ENHANCE_SECONDS", "2"))
+
+# Last-resort answers when neither the LLM nor the retrieval index can help
+# (the same text the Node server falls back to)
+STATIC_MESSAGES = {
+    "CRITICAL": "Your wellbeing matters. Please reach out to a mental health professional or crisis hotline for immediate support.",
+    "HIGH": "You're facing a challenging time, but you're not alone. Take it one step at a time.",
+    "MODERATE": "You're actively checking in on yourself — that's a positive step. Keep taking care.",
+    "LOW": "Great job maintaining your wellbeing! Keep up these positive habits.",
+}
+STATIC_STEPS = {
+    "depression": "Consider cognitive behavioral therapy (CBT) or counseling.",
+    "anxiety": "Practice mindfulness and relaxation techniques.",
+    "stress": "Engage in regular physical activity and stress management.",
+    "sleep": "Maintain a consistent sleep schedule and create a restful environment.",
+}
 
 
 def build_prompt(data: dict) -> str:
@@ -27,9 +45,11 @@ def build_prompt(data: dict) -> str:
 
     context_parts = []
 
+    # Day counts are described as ranges: responses are pooled per bucket
+    # (recommendation_cache), and one has to fit every count in its bucket
     if risk_level in ("CRITICAL", "HIGH"):
         if consecutive_high_risk_days >= 3:
-            context_parts.append(f"This person has been in a high-risk state for {consecutive_high_risk_days} consecutive days.")
+            context_parts.append("This person has been in a high-risk state for three or more days in a row.")
         elif consecutive_high_risk_days == 2:
             context_parts.append("This is their second high-risk day in a row.")
         else:
@@ -48,9 +68,9 @@ def build_prompt(data: dict) -> str:
         context_parts.append(trend_map[trend])
 
     if days_since_checkin >= 3:
-        context_parts.append(f"They were gone for {days_since_checkin} days and just came back.")
+        context_parts.append("They were gone for several days or more and just came back.")
     elif days_since_checkin > 0:
-        context_parts.append(f"They missed {days_since_checkin} day(s) but showed up today.")
+        context_parts.append("They missed a day or two but showed up today.")
 
     factors_text = ", ".join(top_factors) if top_factors else "general low mood"
     context = " ".join(context_parts)
@@ -85,19 +105,21 @@ Reply ONLY in this JSON format, no markdown, no extra text:
 }}"""
 
 
-def get_recommendations(data: dict) -> dict:
-    client = get_client()
+async def get_recommendations(data: dict) -> dict:
     prompt = build_prompt(data)
 
-    response = client.chat.completions.create(
-        model="llama-3.3-70b-versatile",  
-        messages=[{"role": "user", "content": prompt}],
+    raw = await llm_gateway.complete(
+        "groq", prompt,
+        model="llama-3.3-70b-versatile",
         temperature=0.7,
         max_tokens=500,
     )
 
-    raw = response.choices[0].message.content.strip()
+    return _parse_response(raw)
 
+
+def _parse_response(raw: str) -> dict:
+    raw = raw.strip()
     if raw.startswith("```"):
         lines = raw.split("\n")
         raw = "\n".join(line for line in lines if not line.strip().startswith("```")).strip()
@@ -105,32 +127,205 @@ def get_recommendations(data: dict) -> dict:
     try:
         return json.loads(raw)
     except json.JSONDecodeError as e:
+        log.warning("JSON parse error: %s", e, extra={"raw": raw})
         raise ValueError(f"LLM returned invalid JSON: {e}\nRaw: {raw}")
-    client = get_client()
 
-    prompt = build_prompt(data)
 
-    response = client.models.generate_content(
-        model="gemini-2.0-flash",
-        contents=prompt,
-        config=types.GenerateContentConfig(
-            temperature=0.7,
-            max_output_tokens=500,  # increase this, 250 was too low
-        )
-    )
+def static_recommendation(data: dict) -> dict:
+    factors = [str(f).lower() for f in data.get("top_factors") or []]
+    steps = [step for key, step in STATIC_STEPS.items() if any(key in f for f in factors)]
+    return {
+        "motivational_message": STATIC_MESSAGES.get(
+            str(data.get("risk_level", "")).upper(),
+            "Remember to prioritize your mental health and reach out if you need support."),
+        "coping_steps": steps or ["Take a moment to breathe deeply", "Check in with a trusted friend or counselor"],
+    }
 
-    raw = response.text.strip()
 
-    # Strip markdown fences if Gemini adds them
-    if raw.startswith("```"):
-        lines = raw.split("\n")
-        raw = "\n".join(
-            line for line in lines
-            if not line.strip().startswith("```")
-        ).strip()
+async def fallback_recommendation(data: dict) -> dict:
+    """
+    Local answer for when the LLM is unavailable or over budget: retrieval
+    if the index is there, static text otherwise. Marked "fallback" so
+    callers don't cache it like a generated answer.
+    """
+    local = await asyncio.to_thread(retriever.recommend, data)
+    if local is not None:
+        return {**local, "source": "retrieval", "fallback": True}
+    return {**static_recommendation(data), "source": "static", "fallback": True}
+
+
+class MessageExtractor:
+    """
+    Pulls the value of "motivational_message" out of a JSON object that is
+    still being streamed, decoding escapes as they complete. feed() returns
+    the newly available message text (possibly empty).
+    """
+
+    _KEY = '"motivational_message"'
+    _ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+    def __init__(self):
+        self._buffer = ""
+        self._pos = 0
+        self._state = "key"  # key -> value -> string -> done
+        self.done = False
+
+    def feed(self, chunk: str) -> str:
+        self._buffer += chunk
+        out = []
+        buf = self._buffer
+        while self._pos < len(buf) and not self.done:
+            if self._state == "key":
+                i = buf.find(self._KEY, self._pos)
+                if i < 0:
+                    self._pos = max(self._pos, len(buf) - len(self._KEY))
+                    break
+                self._pos, self._state = i + len(self._KEY), "value"
+            elif self._state == "value":
+                ch = buf[self._pos]
+                self._pos += 1
+                if ch == '"':
+                    self._state = "string"
+                elif ch not in " \t\r\n:":
+                    self._state = "key"  # not a string value; keep looking
+            else:
+                ch = buf[self._pos]
+                if ch == '"':
+                    self._pos += 1
+                    self.done = True
+                elif ch == "\\":
+                    if self._pos + 1 >= len(buf):
+                        break
+                    esc = buf[self._pos + 1]
+                    if esc == "u":
+                        # \uXXXX, or a \uD8XX\uDCXX surrogate pair
+                        if self._pos + 6 > len(buf):
+                            break
+                        width = 12 if 0xD800 <= int(buf[self._pos + 2:self._pos + 6], 16) < 0xDC00 else 6
+                        if self._pos + width > len(buf):
+                            break
+                        out.append(json.loads('"' + buf[self._pos:self._pos + width] + '"'))
+                        self._pos += width
+                    else:
+                        out.append(self._ESCAPES.get(esc, esc))
+                        self._pos += 2
+                else:
+                    j = self._pos
+                    while j < len(buf) and buf[j] not in '"\\':
+                        j += 1
+                    out.append(buf[self._pos:j])
+                    self._pos = j
+        return "".join(out)
+
 
+async def stream_recommendation(data: dict, first_token_timeout: Optional[float] = None
+                                ) -> AsyncIterator[Tuple[str, dict]]:
+    """
+    Streaming counterpart of recommend(): yields ("message", {"delta"}) as
+    the motivational message arrives, then ("coping_steps", {...}), then
+    ("source", {"source"}). Pooled or local answers are yielded whole; the
+    local fallback is used when the LLM fails, its circuit is open, or no
+    message text arrived within `first_token_timeout` seconds.
+    """
+    def whole(response):
+        yield "message", {"delta": response.get("motivational_message", "")}
+        yield "coping_steps", {"coping_steps": response.get("coping_steps", [])}
+        yield "source", {"source": response["source"]}
+
+    if RECOMMENDATION_ENGINE == "retrieval":
+        for event in whole(await fallback_recommendation(data)):
+            yield event
+        return
+
+    pooled = recommendation_cache.take(data, get_recommendations)
+    if pooled is None and recommendation_cache.generating(data):
+        # another request is already generating for this bucket: share its answer
+        try:
+            pooled = await recommendation_cache.get(data, get_recommendations)
+        except Exception as e:
+            log.warning("LLM unavailable, using local fallback: %s", e)
+            for event in whole(await fallback_recommendation(data)):
+                yield event
+            return
+    if pooled is not None:
+        for event in whole({**pooled, "source": "llm"}):
+            yield event
+        return
+
+    extractor, raw, sent = MessageExtractor(), [], False
+    loop = asyncio.get_running_loop()
+    deadline = None if first_token_timeout is None else loop.time() + first_token_timeout
+    chunks = None
     try:
-        return json.loads(raw)
-    except json.JSONDecodeError as e:
-        print(f"[recommendations.py] JSON parse error: {e}\nRaw response: {raw}", file=sys.stderr)
-        raise ValueError(f"Gemini returned invalid JSON: {e}\nRaw response: {raw}")
\ No newline at end of file
+        prompt = build_prompt(recommendation_cache.canonical(data))
+        chunks = llm_gateway.stream("groq", prompt, model="llama-3.3-70b-versatile",
+                                    temperature=0.7, max_tokens=500)
+        while True:
+            timeout = None if sent or deadline is None else max(0.0, deadline - loop.time())
+            try:
+                chunk = await asyncio.wait_for(chunks.__anext__(), timeout)
+            except StopAsyncIteration:
+                break
+            raw.append(chunk)
+            delta = extractor.feed(chunk)
+            if delta:
+                sent = True
+                yield "message", {"delta": delta}
+        response = _parse_response("".join(raw))
+    except Exception as e:
+        if sent:
+            raise
+        reason = f"no text within {first_token_timeout}s" if isinstance(e, asyncio.TimeoutError) else e
+        log.warning("LLM stream unavailable, using local fallback: %s", reason)
+        for event in whole(await fallback_recommendation(data)):
+            yield event
+        return
+    finally:
+        if chunks is not None:
+            await chunks.aclose()
+
+    recommendation_cache.put(data, response, get_recommendations)
+    if not sent:
+        yield "message", {"delta": response.get("motivational_message", "")}
+    yield "coping_steps", {"coping_steps": response.get("coping_steps", [])}
+    yield "source", {"source": "llm"}
+
+
+def _log_late_failure(task: asyncio.Task):
+    """Done callback for an enhancer call that outlived its request: retrieve (and log) its exception"""
+    if not task.cancelled() and task.exception() is not None:
+        log.warning("LLM enhancer failed after the local answer was sent: %s", task.exception())
+
+
+async def recommend(data: dict) -> dict:
+    """
+    Recommendation for `data` from the configured RECOMMENDATION_ENGINE;
+    adds a "source" key. LLM failures (including an open circuit) are
+    answered with fallback_recommendation().
+    """
+    if RECOMMENDATION_ENGINE == "llm":
+        try:
+            return {**await recommendation_cache.get(data, get_recommendations), "source": "llm"}
+        except (LLMError, ValueError) as e:
+            log.warning("LLM unavailable, using local fallback: %s", e)
+            return await fallback_recommendation(data)
+
+    local = await asyncio.to_thread(retriever.recommend, data)
+    if RECOMMENDATION_ENGINE == "retrieval":
+        if local is None:
+            return {**static_recommendation(data), "source": "static", "fallback": True}
+        return {**local, "source": "retrieval"}
+
+    # hybrid: the LLM is only an enhancer; a slow or failing call keeps generating
+    # in the background (it fills the pool) while the local answer is returned
+    llm = asyncio.ensure_future(recommendation_cache.get(data, get_recommendations))
+    try:
+        return {**await asyncio.wait_for(asyncio.shield(llm), LLM_ENHANCE_SECONDS), "source": "llm"}
+    except Exception as e:
+        if isinstance(e, asyncio.TimeoutError):
+            llm.add_done_callback(_log_late_failure)  # nobody awaits it from here on
+        else:
+            log.warning("LLM enhancer failed, using local answer: %s", e)
+        if local is None:
+            return {**static_recommendation(data), "source": "static", "fallback": True}
+        return {**local, "source": "retrieval"}
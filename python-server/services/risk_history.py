@@ -0,0 +1,292 @@
+"""
+Per-user ring buffers of daily risk scores.
+
+Every user owns one fixed-size row of RISK_HISTORY_DAYS float32 slots in a
+memory-mapped file; the score for day d lives in slot d % RISK_HISTORY_DAYS,
+and a parallel int32 array records the last day written, so days that were
+skipped read back as NaN and wrap-around needs no shifting. Memory and disk
+per user are constant (4 bytes per day + 4), only the rows that are touched
+are paged in, and several worker processes can share the files.
+
+    data/online/risk_history/
+      scores.f32     float32 [capacity, days]
+      last_day.i32   int32   [capacity]        date.toordinal() of the newest score, 0 = empty
+      users.db       sqlite: user key -> row, and the ring size
+
+Rows are handed out in insertion order and the files grow (doubling) as
+users arrive. Nothing is opened when the module is imported: the first call
+creates or maps the files and, for a new store, seeds it from the training
+time series and any scores the earlier CSV-based history had recorded.
+"""
+
+import csv
+import fcntl
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from datetime import date
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from services.log import get_logger
+from services.xgboost_service import normalize_user_key
+
+log = get_logger(__name__)
+
+DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+HISTORY_DIR = Path(os.environ.get("RISK_HISTORY_DIR", DATA_DIR / "online" / "risk_history"))
+SEED_FILES = (
+    DATA_DIR / "training_data" / "risk_timeseries.csv",
+    DATA_DIR / "online" / "risk_updates.csv",  # written by the previous CSV-based history
+)
+
+# Days kept per user (ring size); fixed when the store is created
+RISK_HISTORY_DAYS = int(os.environ.get("RISK_HISTORY_DAYS", "120"))
+# user key -> row lookups kept in memory
+RISK_HISTORY_CACHE_USERS = int(os.environ.get("RISK_HISTORY_CACHE_USERS", "100000"))
+# Default window handed to the forecasters (user_mean / user_std use 30 days)
+RECENT_DAYS = 30
+
+_MIN_CAPACITY = 1024
+
+
+class RiskHistoryStore:
+    def __init__(self, directory=HISTORY_DIR, days=RISK_HISTORY_DAYS, seed_files=SEED_FILES):
+        self.directory = Path(directory)
+        self.days = days
+        self._seed_files = seed_files
+        self._lock = threading.Lock()
+        self._rows: "OrderedDict[str, int]" = OrderedDict()
+        self._db: Optional[sqlite3.Connection] = None
+        self._scores_path = self.directory / "scores.f32"
+        self._last_path = self.directory / "last_day.i32"
+        self.capacity = 0
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def _open(self):
+        """Open (or create and seed) the store on first use; call with self._lock held"""
+        if self._db is not None:
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+        db = self._connect()
+        db.execute("INSERT OR IGNORE INTO meta VALUES ('days', ?)", (str(self.days),))
+        db.commit()
+        days = int(db.execute("SELECT value FROM meta WHERE key = 'days'").fetchone()[0])
+        if days != self.days:
+            log.warning("Store was created with %d days per user; ignoring RISK_HISTORY_DAYS=%d", days, self.days)
+            self.days = days
+        self._db = db
+        self._map()
+        if self._count_users() == 0:
+            self._seed(self._seed_files)
+
+    def _connect(self) -> sqlite3.Connection:
+        db = sqlite3.connect(self.directory / "users.db", check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("CREATE TABLE IF NOT EXISTS users (row INTEGER PRIMARY KEY, user_key TEXT UNIQUE NOT NULL)")
+        db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        return db
+
+    def _after_fork(self):
+        # A SQLite connection must not be used on both sides of a fork (gunicorn
+        # workers, see gunicorn.conf.py). The parent's is left open, not closed:
+        # closing it here could checkpoint the WAL under the parent.
+        if self._db is not None:
+            self._inherited_db, self._db = self._db, self._connect()
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # Files
+    # ------------------------------------------------------------------
+
+    def _map(self):
+        for path in (self._scores_path, self._last_path):
+            path.touch(exist_ok=True)
+        capacity = min(os.path.getsize(self._scores_path) // (4 * self.days),
+                       os.path.getsize(self._last_path) // 4)
+        if capacity == 0:
+            self._scores = np.zeros((0, self.days), dtype=np.float32)
+            self._last_day = np.zeros(0, dtype=np.int32)
+        else:
+            self._scores = np.memmap(self._scores_path, dtype=np.float32, mode="r+", shape=(capacity, self.days))
+            self._last_day = np.memmap(self._last_path, dtype=np.int32, mode="r+", shape=(capacity,))
+        self.capacity = capacity
+
+    def _ensure_capacity(self, row: int):
+        """Grow both files to hold `row`; another process may already have"""
+        if row < self.capacity:
+            return
+        self._map()
+        if row < self.capacity:
+            return
+        with open(self.directory / ".grow.lock", "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            capacity = max(_MIN_CAPACITY, 2 * self.capacity, row + 1)
+            for path, row_bytes in ((self._scores_path, 4 * self.days), (self._last_path, 4)):
+                if os.path.getsize(path) < capacity * row_bytes:
+                    os.truncate(path, capacity * row_bytes)  # zero-filled: last_day 0 = empty row
+        self._map()
+
+    def flush(self):
+        with self._lock:
+            if self.capacity:
+                self._scores.flush()
+                self._last_day.flush()
+
+    # ------------------------------------------------------------------
+    # Rows
+    # ------------------------------------------------------------------
+
+    def _row(self, user_key: str, create: bool) -> Optional[int]:
+        row = self._rows.get(user_key)
+        if row is not None:
+            self._rows.move_to_end(user_key)
+            return row
+        found = self._db.execute("SELECT row FROM users WHERE user_key = ?", (user_key,)).fetchone()
+        if found is not None:
+            row = found[0]
+        elif create:
+            self._db.execute("INSERT OR IGNORE INTO users (user_key) VALUES (?)", (user_key,))
+            self._db.commit()
+            row = self._db.execute("SELECT row FROM users WHERE user_key = ?", (user_key,)).fetchone()[0]
+        else:
+            return None
+        row -= 1  # sqlite rowids start at 1
+        self._rows[user_key] = row
+        while len(self._rows) > RISK_HISTORY_CACHE_USERS:
+            self._rows.popitem(last=False)
+        return row
+
+    @staticmethod
+    def _key(user_id) -> Optional[str]:
+        user_key = normalize_user_key(user_id)
+        return None if user_key is None else str(user_key)
+
+    def _count_users(self) -> int:
+        return self._db.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+
+    def users(self) -> int:
+        with self._lock:
+            self._open()
+            return self._count_users()
+
+    # ------------------------------------------------------------------
+    # Writing / reading
+    # ------------------------------------------------------------------
+
+    def append(self, user_id, day: str, risk_score: float) -> bool:
+        """
+        Record the score for `day` (YYYY-MM-DD). A newer day advances the
+        ring (clearing skipped days); a same-day or backfilled score within
+        the window overwrites its slot. Returns False if it was too old.
+        """
+        user_key = self._key(user_id)
+        if user_key is None:
+            raise ValueError(f"Invalid user_id: {user_id!r}")
+        d = date.fromisoformat(day).toordinal()
+        with self._lock:
+            self._open()
+            return self._append(user_key, d, risk_score)
+
+    def _append(self, user_key: str, d: int, risk_score: float) -> bool:
+        row = self._row(user_key, create=True)
+        self._ensure_capacity(row)
+        scores, last = self._scores[row], int(self._last_day[row])
+        if last == 0 or d - last >= self.days:
+            scores[:] = np.nan
+        elif d > last:
+            skipped = np.arange(last + 1, d) % self.days
+            scores[skipped] = np.nan
+        elif d <= last - self.days:
+            return False
+        scores[d % self.days] = risk_score
+        if d > last:
+            self._last_day[row] = d
+        return True
+
+    def _window(self, user_key: str, days: int) -> Tuple[int, np.ndarray]:
+        """(last day, scores of the `days` days ending there, oldest first) — NaN where missing"""
+        with self._lock:
+            self._open()
+            row = self._row(user_key, create=False)
+            if row is None:
+                return 0, np.empty(0, dtype=np.float32)
+            if row >= self.capacity:
+                self._map()  # grown by another process
+            last = int(self._last_day[row])
+            if last == 0:
+                return 0, np.empty(0, dtype=np.float32)
+            days = min(days, self.days)
+            return last, self._scores[row][np.arange(last - days + 1, last + 1) % self.days].copy()
+
+    def recent(self, user_id, days: int = RECENT_DAYS) -> List[float]:
+        """Scores of the last `days` recorded days (oldest first, gaps skipped); [] if unknown"""
+        user_key = self._key(user_id)
+        if user_key is None:
+            return []
+        _, scores = self._window(user_key, days)
+        return [round(float(s), 4) for s in scores if not np.isnan(s)]
+
+    def get(self, user_id) -> List[Tuple[str, float]]:
+        """Everything kept for the user: [(date, risk_score), ...] oldest first"""
+        user_key = self._key(user_id)
+        if user_key is None:
+            return []
+        last, scores = self._window(user_key, self.days)
+        first = last - len(scores) + 1
+        return [(date.fromordinal(first + i).isoformat(), round(float(s), 4))
+                for i, s in enumerate(scores) if not np.isnan(s)]
+
+    def chunks(self, size: int, days: int = RECENT_DAYS):
+        """
+        Yield (user keys, last days, scores [n, days] oldest first, NaN where
+        missing) for every stored user, `size` rows at a time. For batch jobs:
+        reads straight from the mapped arrays, a chunk per slice. The lock is
+        taken per chunk, so writers are not held up for the whole pass.
+        """
+        with self._lock:
+            self._open()
+            self._map()
+            total = min(self._count_users(), self.capacity)
+        days = min(days, self.days)
+        offsets = np.arange(-days + 1, 1)
+        for start in range(0, total, size):
+            end = min(start + size, total)
+            with self._lock:
+                keys = dict(self._db.execute("SELECT row, user_key FROM users WHERE row > ? AND row <= ?",
+                                             (start, end)).fetchall())
+                last = np.array(self._last_day[start:end])
+                block = np.array(self._scores[start:end])
+            cols = (last[:, None] + offsets) % self.days
+            scores = np.take_along_axis(block, cols, axis=1)
+            scores[last == 0] = np.nan
+            yield [keys.get(row + 1) for row in range(start, end)], last, scores
+
+    # ------------------------------------------------------------------
+    # Seeding
+    # ------------------------------------------------------------------
+
+    def _seed(self, seed_files):
+        """Called from _open(), with self._lock held"""
+        seeded = 0
+        for path in seed_files:
+            path = Path(path)
+            if not path.exists():
+                continue
+            with open(path, newline="") as f:
+                for record in csv.DictReader(f):
+                    try:
+                        user_key = self._key(record["user_id"])
+                        if user_key is not None:
+                            d = date.fromisoformat(record["date"]).toordinal()
+                            seeded += self._append(user_key, d, float(record["risk_score"]))
+                    except (KeyError, ValueError):
+                        continue
+        if seeded:
+            log.info("Seeded %d scores for %d users", seeded, self._count_users())
+
+
+risk_history = RiskHistoryStore()
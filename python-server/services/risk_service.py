@@ -1,14 +1,26 @@
-from transformers import pipeline
+import threading
+
 
 class RiskDetector:
     def __init__(self):
-        # Load the fine-tuned BERT model for mental health classification
-        # Note: This might take a while on the first load
-        self.classifier = pipeline(
-            "text-classification", 
-            model="distilbert-base-uncased-finetuned-sst-2-english",
-             device=-1 # Use CPU
-        )
+        # The fine-tuned BERT pipeline is built on the first detect_risk()
+        # call: importing transformers and loading the weights takes seconds
+        self._classifier = None
+        self._lock = threading.Lock()
+
+    @property
+    def classifier(self):
+        if self._classifier is None:
+            with self._lock:
+                if self._classifier is None:
+                    from transformers import pipeline
+                    # Load the fine-tuned BERT model for mental health classification
+                    self._classifier = pipeline(
+                        "text-classification",
+                        model="distilbert-base-uncased-finetuned-sst-2-english",
+                        device=-1 # Use CPU
+                    )
+        return self._classifier
 
     def detect_risk(self, text: str):
         if not text or len(text.strip()) == 0:
@@ -0,0 +1,156 @@
+"""
+Learned risk-component weights, served without loading the weight model.
+
+train_weight_model.py writes weight_models/risk_weights.json next to the
+pickled booster:
+
+    {"version": "<sha256 of the weights, 16 hex>", "weights": {...},
+     "feature_cols": [...], "trained_at": "<iso timestamp>"}
+
+The active model version's file is parsed once and kept in memory together
+with its serialized response, so /api/risk-weights is a dictionary lookup.
+Model versions published before the JSON existed have it extracted from the
+pickle once, on first use.
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import threading
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from services.log import get_logger
+from services.model_store import store as model_store
+
+log = get_logger(__name__)
+
+WEIGHTS_FILE = "risk_weights.json"
+WEIGHT_MODEL_FILE = "global_weights_xgb.pkl"
+
+# Served until a weight model has been trained (mirrors riskConfig.js)
+DEFAULT_WEIGHTS = {
+    "depression_quiz_score": 0.20,
+    "anxiety_quiz_score":    0.15,
+    "stress_quiz_score":     0.15,
+    "sleep_quiz_score":      0.12,
+    "journal_score":         0.13,
+    "chatbot_score":         0.11,
+    "quiz_score":            0.07,
+    "community_score":       0.03,
+    "disengagement_score":   0.04,
+}
+
+
+def weights_version(weights: Dict[str, float]) -> str:
+    """Content hash of a weight dict; identical weights get the same version"""
+    canonical = json.dumps(weights, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode()).hexdigest()[:16]
+
+
+def weights_artifact(weights: Dict[str, float], feature_cols: Optional[List[str]] = None,
+                     trained_at: Optional[str] = None) -> dict:
+    return {
+        "version": weights_version(weights),
+        "weights": weights,
+        "feature_cols": feature_cols or list(weights),
+        "trained_at": trained_at or datetime.now(timezone.utc).isoformat(),
+    }
+
+
+def write_weights_artifact(weight_dir, artifact: dict):
+    path = Path(weight_dir) / WEIGHTS_FILE
+    with open(path, "w") as f:
+        json.dump(artifact, f, indent=2)
+    return path
+
+
+class _WeightsSnapshot:
+    """One weight artifact, ready to serve"""
+
+    def __init__(self, model_version, artifact: dict):
+        self.model_version = model_version
+        self.version = artifact["version"]
+        self.weights = artifact["weights"]
+        self.etag = f'"{self.version}"'
+        self.body = json.dumps(self.weights).encode()
+        trained_at = artifact.get("trained_at")
+        self.last_modified = None
+        if trained_at:
+            modified = datetime.fromisoformat(trained_at)
+            if modified.tzinfo is None:
+                modified = modified.astimezone()
+            self.last_modified = modified.astimezone(timezone.utc).replace(microsecond=0)
+
+    @property
+    def http_last_modified(self) -> Optional[str]:
+        return format_datetime(self.last_modified, usegmt=True) if self.last_modified else None
+
+
+class RiskWeights:
+    """Weights of the active model version, reloaded when the version changes"""
+
+    def __init__(self, store=model_store):
+        self.store = store
+        self._snapshot: Optional[_WeightsSnapshot] = None
+        self._lock = threading.Lock()
+
+    @property
+    def version(self):
+        """Model version the loaded weights belong to"""
+        return self._snapshot.model_version if self._snapshot else None
+
+    @property
+    def loaded(self) -> Optional[_WeightsSnapshot]:
+        """The weights in memory, None until the first load"""
+        return self._snapshot
+
+    def current(self) -> _WeightsSnapshot:
+        snapshot = self._snapshot
+        if snapshot is None:
+            snapshot = self.activate()
+        return snapshot
+
+    def activate(self, version=None) -> _WeightsSnapshot:
+        """Load the weights of `version` (default: CURRENT) and swap them in"""
+        with self._lock:
+            version = version or self.store.current_version()
+            if self._snapshot is not None and self._snapshot.model_version == version:
+                return self._snapshot
+            snapshot = _WeightsSnapshot(version, self._load_artifact(version))
+            self._snapshot = snapshot
+            log.info("Serving weights %s (model version %s)", snapshot.version, version)
+            return snapshot
+
+    def _load_artifact(self, version) -> dict:
+        weight_dir = self.store.version_dir(version) / "weight_models"
+        try:
+            with open(weight_dir / WEIGHTS_FILE) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            pass
+        except json.JSONDecodeError as e:
+            log.error("Unreadable %s in %s: %s", WEIGHTS_FILE, weight_dir, e)
+
+        # Versions published before the JSON artifact existed
+        weight_file = weight_dir / WEIGHT_MODEL_FILE
+        if weight_file.exists():
+            try:
+                with open(weight_file, "rb") as f:
+                    data = pickle.load(f)
+                if data.get("weights"):
+                    trained_at = data.get("updated_at") or \
+                        datetime.fromtimestamp(os.path.getmtime(weight_file), timezone.utc).isoformat()
+                    log.info("Extracted weights from %s", weight_file)
+                    return weights_artifact(data["weights"], data.get("feature_cols"), str(trained_at))
+            except Exception as e:
+                log.error("Could not read %s: %s", weight_file, e)
+
+        log.warning("No learned weights in %s, serving defaults", weight_dir)
+        return {"version": "default", "weights": DEFAULT_WEIGHTS}
+
+
+risk_weights = RiskWeights()
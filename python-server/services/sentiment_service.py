@@ -1,4 +1,4 @@
-from textblob import TextBlob
+from services.metrics import model_inference_seconds
 
 RISK_KEYWORDS = [
     "die", "kill myself", "suicide", "end my life", "no reason to live", 
@@ -6,19 +6,23 @@ RISK_KEYWORDS = [
     "better off dead", "worthless", "give up", "nothing left"
 ]
 
+def is_crisis_text(text: str) -> bool:
+    text_lower = text.lower()
+    return any(keyword in text_lower for keyword in RISK_KEYWORDS)
+
 def get_mental_health_score(text: str) -> float:
     if not text or len(text.strip()) == 0:
         return 0.5
 
-    text_lower = text.lower()
-    
     # Check for critical keywords first
-    for keyword in RISK_KEYWORDS:
-        if keyword in text_lower:
-            return 0.9  # High risk
+    if is_crisis_text(text):
+        return 0.9  # High risk
+
+    from textblob import TextBlob  # pulls in nltk, scipy and sklearn: imported on first use
 
-    blob = TextBlob(text)
-    polarity = blob.sentiment.polarity 
+    with model_inference_seconds.time("textblob"):
+        blob = TextBlob(text)
+        polarity = blob.sentiment.polarity
 
     # polarity ranges from -1 to 1
     # -1 (very negative) -> 1.0 (very high risk)
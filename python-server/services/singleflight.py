@@ -0,0 +1,56 @@
+"""
+Request coalescing ("singleflight") for idempotent async work.
+
+    weights_flight = SingleFlight("risk_weights")
+    weights = await weights_flight.do("current", asyncio.to_thread, risk_weights.current)
+
+The first caller for a key starts the work as a task; callers with the same
+key that arrive while it runs await that task instead of starting their own,
+and all of them get its result (or its exception). Nothing is cached: once
+the task is done the key is free and the next caller runs the work again.
+
+A caller that is cancelled (client went away) stops waiting but does not
+cancel the shared task, which the other callers may still be waiting for.
+
+Coalescing is per process (and per event loop); with several gunicorn
+workers each worker runs the work at most once per key at a time.
+soulsync_singleflight_calls_total counts, per operation, the callers that
+ran the work (role="leader") and those that shared another's (role="shared").
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, TypeVar
+
+from services.metrics import singleflight_calls
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    def __init__(self, name: str):
+        self.name = name
+        self._tasks: Dict[Hashable, asyncio.Task] = {}
+
+    async def do(self, key: Hashable, fn: Callable[..., Awaitable[T]], *args: Any) -> T:
+        """Await fn(*args), or the run of it already in flight for `key`"""
+        task = self._tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn(*args))
+            self._tasks[key] = task
+            task.add_done_callback(lambda done: self._finished(key, done))
+            singleflight_calls.inc(self.name, "leader")
+        else:
+            singleflight_calls.inc(self.name, "shared")
+        return await asyncio.shield(task)
+
+    def _finished(self, key, task):
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+        if not task.cancelled():
+            task.exception()  # retrieved, even if every caller was cancelled
+
+    def running(self, key: Hashable) -> bool:
+        return key in self._tasks
+
+    def in_flight(self) -> int:
+        return len(self._tasks)
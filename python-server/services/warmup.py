@@ -0,0 +1,58 @@
+"""
+Load every model up front, in the process that forks the workers.
+
+Under gunicorn (gunicorn.conf.py, preload_app) this runs once in the master
+after server.py has been imported and before any worker exists. toxic-bert's
+weights, the TextBlob lexicon, the XGBoost forecasters (and their compiled
+forms), the risk weights and the retrieval index then live in pages every
+worker shares copy-on-write, instead of each worker loading a private copy
+on its first request.
+
+No inference goes through torch here: the master keeps torch single-threaded
+so no OpenMP pool exists when the workers are forked.
+"""
+
+import time
+
+from services.log import get_logger
+
+log = get_logger(__name__)
+
+
+def warm_up():
+    started = time.perf_counter()
+    loaded = []
+
+    try:
+        from services.hatespeech_service import load_hate_speech_model
+        load_hate_speech_model()
+        loaded.append("toxic-bert")
+    except Exception as e:
+        log.warning("toxic-bert not loaded, workers will load it on first use: %s", e)
+
+    from services.sentiment_service import get_mental_health_score
+    get_mental_health_score("warm up")  # TextBlob reads its lexicon on first use
+    loaded.append("TextBlob")
+
+    from routes.recommendations import xgb_predictor
+    from services.fast_predict import fast_model
+    xgb_predictor.preload()  # the predictor otherwise loads per-user models lazily
+    snapshot = xgb_predictor._snapshot
+    models = [model for model, _ in snapshot.users.values()]
+    models.append(xgb_predictor._load_global_model(snapshot))
+    bundle = xgb_predictor._load_global_user_model(snapshot)
+    if bundle is not None:
+        models.append(bundle["model"])
+    for model in models:
+        fast_model(model)
+    loaded.append(f"{len(snapshot.users)} per-user forecasters")
+
+    from services.risk_weights import risk_weights
+    risk_weights.current()
+    loaded.append("risk weights")
+
+    from services.recommendation_retrieval import retriever
+    if retriever.index is not None:
+        loaded.append("retrieval index")
+
+    log.info("Loaded %s in %.1fs", ", ".join(loaded), time.perf_counter() - started)
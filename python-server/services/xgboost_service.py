@@ -1,58 +1,249 @@
+import os
 import pickle
+import re
 import numpy as np
 from pathlib import Path
 from datetime import datetime, timedelta
-import sys
+import threading
+import time
+
+from services.fast_predict import fast_model, fast_transform
+from services.log import get_logger
+from services.metrics import model_inference_seconds
+from services.model_store import store as model_store
+
+log = get_logger(__name__)
+
+# xgboost itself (1.5s to import, with sklearn and scipy) is only imported
+# when the first model is unpickled or the on-the-fly fallback trains one
+
+# Per-user models refreshed by services.online_update live outside the
+# immutable model versions, in models/online/<version>/
+ONLINE_DIR = model_store.root / "online"
+
+_SAFE_USER_KEY = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+# "per_user": per-user models first, global user-feature model for the rest
+# "global":   serve every user through the global user-feature model
+FORECAST_MODE = os.environ.get("FORECAST_MODE", "per_user")
+
+FEATURE_COLS = [
+    'lag_1', 'lag_2', 'lag_3', 'lag_4', 'lag_5', 'lag_6', 'lag_7',
+    'rolling_mean_3', 'rolling_mean_7',
+    'rolling_std_3', 'rolling_std_7',
+    'trend_7',
+    'day_of_week'
+]
+# Cross-user model: per-step features plus per-user summary features
+GLOBAL_USER_FEATURE_COLS = FEATURE_COLS + ['user_mean', 'user_std', 'user_type']
+GLOBAL_USER_MODEL_FILE = "global_user_forecast_xgb.pkl"
+# Days of history the user_mean / user_std summaries are computed over
+USER_STATS_WINDOW = 30
+
+
+def trend(series):
+    """Calculate linear trend slope of a series"""
+    series = list(series)
+    if len(series) < 2:
+        return 0
+    x = np.arange(len(series))
+    coeffs = np.polyfit(x, series, 1)
+    return float(coeffs[0])
+
+
+def step_features(history, future_date):
+    """Features for forecasting the day `future_date` from `history`, in FEATURE_COLS order"""
+    features = [history[-lag] if lag <= len(history) else history[0] for lag in range(1, 8)]
+    last_7 = history[-7:]
+    std_7 = np.std(last_7)
+    features += [
+        np.mean(last_7[-3:]),
+        np.mean(last_7),
+        np.std(last_7[-3:]) if len(last_7) >= 3 else 0,
+        std_7 if std_7 > 0 else 0.1,
+        trend(last_7),
+        future_date.weekday(),
+    ]
+    return features
+
+
+def user_summary_features(history, user_type_code):
+    """user_mean, user_std, user_type over the last USER_STATS_WINDOW days"""
+    window = history[-USER_STATS_WINDOW:]
+    return [float(np.mean(window)), float(np.std(window)), user_type_code]
+
+
+def normalize_user_key(user_id):
+    """
+    Map a user id onto the key used in model file names.
+    "user_5" / "5" / 5 -> 5, MongoDB ObjectIds stay strings.
+    Returns None for ids that can't safely be used in a file name.
+    """
+    if isinstance(user_id, int):
+        return user_id
+    user_id = str(user_id)
+    if user_id.startswith("user_"):
+        user_id = user_id[len("user_"):]
+    if user_id.isdigit():
+        return int(user_id)
+    return user_id if _SAFE_USER_KEY.match(user_id) else None
+
+
+def detect_early_warning(predictions, current_risk):
+    """
+    Early-warning rule for a forecast:
+    - the forecast peak crosses CRITICAL (>= 7) while current risk is below it, or
+    - a spike of +1.5 or more peaks within the next 3 days
+    """
+    if not predictions:
+        return False
+    max_future_risk = max(p['predicted_risk'] for p in predictions)
+    days_to_peak = next((p['days_ahead'] for p in predictions
+                         if p['predicted_risk'] == max_future_risk), None)
+
+    # Warning if peak crosses CRITICAL and current is not already critical
+    if max_future_risk >= 7 and current_risk < 7:
+        return True
+    # Warning if significant spike coming (+ 2 points) in next 3 days
+    if days_to_peak and days_to_peak <= 3 and max_future_risk >= current_risk + 1.5:
+        return True
+    return False
+
+
+class _ModelSnapshot:
+    """Models loaded from one model directory; swapped as a whole on activation"""
+
+    def __init__(self, model_dir, version=None):
+        self.model_dir = Path(model_dir)
+        self.version = version
+        self.overlay_dir = ONLINE_DIR / (version or "legacy")
+        self.users = {}  # user key -> (model, scaler)
+        self.global_model = None
+        self.global_model_loaded = False
+        self.global_user_bundle = None
+        self.global_user_bundle_loaded = False
+        self.overlay_scanned = 0.0  # wall time of the last overlay scan
 
-try:
-    from xgboost import XGBRegressor
-except ImportError:
-    print("ERROR: xgboost not installed. Run: pip install xgboost", file=sys.stderr)
 
 class XGBoostPredictor:
     """Wrapper for XGBoost predictions"""
     
-    def __init__(self, model_dir="models/xgboost_models"):
-        self.model_dir = Path(model_dir)
-        self.models = {}
-        self.scalers = {}
+    def __init__(self, model_dir=None, store=model_store):
+        """
+        Args:
+            model_dir: Explicit directory of per-user models. When omitted the
+                       active version of the model store is used.
+            store: ModelStore used to resolve and hot-swap versions
+        """
+        self.store = store
         self.feature_cols = None
         self._load_feature_info()
+        if model_dir is not None:
+            self._snapshot = _ModelSnapshot(model_dir)
+        else:
+            version = store.current_version()
+            self._snapshot = _ModelSnapshot(store.version_dir(version) / "xgboost_models", version)
+        self._activation_lock = threading.Lock()
+
+    @property
+    def model_dir(self):
+        return self._snapshot.model_dir
+
+    @property
+    def version(self):
+        return self._snapshot.version
     
     def _load_feature_info(self):
         """Load feature column names from training"""
-        self.feature_cols = [
-            'lag_1', 'lag_2', 'lag_3', 'lag_4', 'lag_5', 'lag_6', 'lag_7',
-            'rolling_mean_3', 'rolling_mean_7',
-            'rolling_std_3', 'rolling_std_7',
-            'trend_7',
-            'day_of_week'
-        ]
+        self.feature_cols = FEATURE_COLS
+
+    def activate(self, version=None):
+        """
+        Preload every model of `version` (default: the store's active
+        version) into a fresh snapshot, then swap it in with a single
+        reference assignment. In-flight requests keep using the snapshot
+        they started with, so nothing is dropped or half-loaded.
+        """
+        with self._activation_lock:
+            version = version or self.store.current_version()
+            if version == self._snapshot.version:
+                return version
+            snapshot = _ModelSnapshot(self.store.version_dir(version) / "xgboost_models", version)
+            self._preload(snapshot)
+            self._snapshot = snapshot
+            log.info("Serving model version %s (%d user models)", version, len(snapshot.users))
+            return version
+
+    def preload(self):
+        """Load every model of the active version now rather than on first use"""
+        with self._activation_lock:
+            self._preload(self._snapshot)
+            log.info("Serving model version %s (%d user models)", self.version, len(self._snapshot.users))
+
+    def _preload(self, snapshot):
+        """Eagerly load all per-user models and the global model of a snapshot"""
+        snapshot.overlay_scanned = time.time()
+        model_files = list(snapshot.model_dir.glob("user_*_xgb.pkl"))
+        if snapshot.overlay_dir.exists():
+            model_files += list(snapshot.overlay_dir.glob("user_*_xgb.pkl"))
+        for model_file in model_files:
+            user_key = normalize_user_key(model_file.stem[len("user_"):-len("_xgb")])
+            if user_key is not None:
+                self._load_model(user_key, snapshot)
+        self._load_global_model(snapshot)
+        self._load_global_user_model(snapshot)
+
+    def _load_global_model(self, snapshot):
+        """Load the 7-lag global forecast model once per snapshot"""
+        if not snapshot.global_model_loaded:
+            global_model_path = snapshot.model_dir / "global_forecast_xgb.pkl"
+            if global_model_path.exists():
+                try:
+                    with open(global_model_path, 'rb') as f:
+                        snapshot.global_model = pickle.load(f)
+                except Exception as e:
+                    log.warning("Failed to load global model: %s", e)
+            snapshot.global_model_loaded = True
+        return snapshot.global_model
     
-    def _load_model(self, user_id):
-        """Lazy load model and scaler for a user"""
+    def _load_global_user_model(self, snapshot):
+        """
+        Load the cross-user forecaster bundle (see train_global_forecaster.py):
+        {'model', 'feature_cols', 'user_types', 'user_type_by_user'}
+        """
+        if not snapshot.global_user_bundle_loaded:
+            bundle_path = snapshot.model_dir / GLOBAL_USER_MODEL_FILE
+            if bundle_path.exists():
+                try:
+                    with open(bundle_path, 'rb') as f:
+                        snapshot.global_user_bundle = pickle.load(f)
+                except Exception as e:
+                    log.warning("Failed to load global user model: %s", e)
+            snapshot.global_user_bundle_loaded = True
+        return snapshot.global_user_bundle
+
+    def _load_model(self, user_id, snapshot=None):
+        """Lazy load model and scaler for a user (online overlay first)"""
+        snapshot = snapshot or self._snapshot
         
-        # Convert user_id to integer if it's a string
-        if isinstance(user_id, str):
-            try:
-                if user_id.startswith("user_"):
-                    user_id = int(user_id.split("_")[1])
-                else:
-                    user_id = int(user_id)
-            except (ValueError, IndexError):
-                # MongoDB ObjectId or non-numeric ID — no stored model
-                print(f"Info: user_id '{user_id}' is not numeric, will use input-based prediction", file=sys.stderr)
-                return None, None
+        user_key = normalize_user_key(user_id)
+        if user_key is None:
+            log.debug("user_id %r has no stored model, will use input-based prediction", user_id,
+                      extra={"event": "forecast_tier"})
+            return None, None
         
-        if user_id in self.models:
-            return self.models[user_id], self.scalers[user_id]
+        if user_key in snapshot.users:
+            return snapshot.users[user_key]
         
         try:
-            model_file = self.model_dir / f"user_{user_id}_xgb.pkl"
-            scaler_file = self.model_dir / f"user_{user_id}_scaler.pkl"
-            
-            if not model_file.exists():
-                print(f"Info: No stored model found for user {user_id}, will use input-based prediction", file=sys.stderr)
+            for model_dir in (snapshot.overlay_dir, snapshot.model_dir):
+                model_file = model_dir / f"user_{user_key}_xgb.pkl"
+                scaler_file = model_dir / f"user_{user_key}_scaler.pkl"
+                if model_file.exists():
+                    break
+            else:
+                log.debug("No stored model found for user %s, will use input-based prediction", user_key,
+                          extra={"event": "forecast_tier"})
                 return None, None
             
             with open(model_file, 'rb') as f:
@@ -61,16 +252,63 @@ class XGBoostPredictor:
             with open(scaler_file, 'rb') as f:
                 scaler = pickle.load(f)
             
-            self.models[user_id] = model
-            self.scalers[user_id] = scaler
+            snapshot.users[user_key] = (model, scaler)
             
             return model, scaler
             
         except Exception as e:
-            print(f"Error loading model for user {user_id}: {e}", file=sys.stderr)
+            log.warning("Error loading model for user %s: %s", user_key, e)
             return None, None
 
-    def predict_from_input(self, recent_risks: list, days_ahead: int = 7):
+    def install_user_model(self, user_id, model, scaler, version):
+        """
+        Persist an online-updated model for `user_id` next to `version` and
+        swap it into the live snapshot. Ignored if the server has since moved
+        to a different version (the update belongs to the old baseline).
+        """
+        user_key = normalize_user_key(user_id)
+        snapshot = self._snapshot
+        if user_key is None or snapshot.version != version:
+            return False
+        snapshot.overlay_dir.mkdir(parents=True, exist_ok=True)
+        for suffix, obj in (("scaler", scaler), ("xgb", model)):
+            path = snapshot.overlay_dir / f"user_{user_key}_{suffix}.pkl"
+            tmp = path.with_name(f".{path.name}.tmp")
+            with open(tmp, 'wb') as f:
+                pickle.dump(obj, f)
+            os.replace(tmp, path)
+        snapshot.users[user_key] = (model, scaler)
+        return True
+
+    def refresh_overlay(self):
+        """
+        Reload online-updated models written since the last scan. With several
+        worker processes each one installs only the updates it computed
+        itself; this picks up the others'. Returns the number reloaded.
+        """
+        snapshot = self._snapshot
+        scanned, snapshot.overlay_scanned = snapshot.overlay_scanned, time.time()
+        if not snapshot.overlay_dir.exists():
+            return 0
+        reloaded = 0
+        for model_file in snapshot.overlay_dir.glob("user_*_xgb.pkl"):
+            try:
+                if model_file.stat().st_mtime < scanned:
+                    continue
+            except FileNotFoundError:
+                continue
+            user_key = normalize_user_key(model_file.stem[len("user_"):-len("_xgb")])
+            if user_key is None:
+                continue
+            # The scaler is replaced before the model, so both are complete here
+            previous = snapshot.users.pop(user_key, None)
+            if self._load_model(user_key, snapshot)[0] is None and previous is not None:
+                snapshot.users[user_key] = previous
+            else:
+                reloaded += 1
+        return reloaded
+
+    def predict_from_input(self, recent_risks: list, days_ahead: int = 7, as_of=None):
         """
         Predict future risk scores directly from recent_risks input.
         Strategically tries:
@@ -79,113 +317,78 @@ class XGBoostPredictor:
         """
         try:
             if len(recent_risks) < 3:
-                print("predict_from_input: Need at least 3 recent_risks values", file=sys.stderr)
+                log.warning("predict_from_input: Need at least 3 recent_risks values")
                 return None
 
-            risks = np.array(recent_risks, dtype=float)
-            
             # --- Try Global Pre-trained Model First ---
-            global_model_path = self.model_dir / "global_forecast_xgb.pkl"
-            model = None
-            if global_model_path.exists():
-                try:
-                    with open(global_model_path, 'rb') as f:
-                        model = pickle.load(f)
-                    print(f"✅ Using pre-trained Global Forecast Model")
-                except Exception as e:
-                    print(f"Warning: Failed to load global model: {e}", file=sys.stderr)
+            model = self._load_global_model(self._snapshot)
+            if model is not None:
+                log.debug("Using pre-trained Global Forecast Model", extra={"event": "forecast_tier"})
+                with model_inference_seconds.time("xgboost_global_7lag"):
+                    return self._forecast_global_7lag(model, recent_risks, days_ahead, as_of)
 
             # --- Fallback to on-the-fly training if global model missing ---
-            if model is None:
-                print("⚠️ Global model missing, training on-the-fly fallback...")
-                X, y = [], []
-                for i in range(2, len(risks)):
-                    window = risks[max(0, i-7):i]
-                    features = [
-                        risks[i-1], risks[i-2] if i >= 2 else risks[0],
-                        risks[i-3] if i >= 3 else risks[0], risks[i-4] if i >= 4 else risks[0],
-                        risks[i-5] if i >= 5 else risks[0], risks[i-6] if i >= 6 else risks[0],
-                        risks[i-7] if i >= 7 else risks[0],
-                        np.mean(risks[max(0, i-3):i]), np.mean(window),
-                        np.std(risks[max(0, i-3):i]) if i >= 3 else 0,
-                        np.std(window) if len(window) > 1 else 0,
-                        self._trend(window), datetime.now().weekday()
-                    ]
-                    X.append(features)
-                    y.append(risks[i])
-                
-                model = XGBRegressor(n_estimators=50, max_depth=3).fit(np.array(X), np.array(y))
-
-            # Iteratively predict future days
-            predictions = []
-            current_values = list(risks)
-
-            for day in range(days_ahead):
-                # Ensure input exactly matching training features
-                last_7 = current_values[-7:] if len(current_values) >= 7 else current_values
-                cv = current_values
-                
-                # Check if model is the global one (expects 7 inputs) or on-the-fly (expects 13)
-                if hasattr(model, 'n_features_in_') and model.n_features_in_ == 7:
-                    # Global model only takes the last 7 risks
-                    inp = np.array(last_7[-7:]).reshape(1, -1)
-                    if inp.shape[1] < 7:
-                        inp = np.pad(inp, ((0,0), (7-inp.shape[1], 0)), 'edge')
-                    pred = model.predict(inp)[0]
-                else:
-                    # Fallback model takes engineered features
-                    feat = [
-                        cv[-1], cv[-2] if len(cv) >= 2 else cv[0],
-                        cv[-3] if len(cv) >= 3 else cv[0], cv[-4] if len(cv) >= 4 else cv[0],
-                        cv[-5] if len(cv) >= 5 else cv[0], cv[-6] if len(cv) >= 6 else cv[0],
-                        cv[-7] if len(cv) >= 7 else cv[0],
-                        np.mean(cv[-3:]), np.mean(last_7),
-                        np.std(cv[-3:]) if len(cv) >= 3 else 0,
-                        np.std(last_7) if len(last_7) > 1 else 0,
-                        self._trend(last_7), (datetime.now() + timedelta(days=day + 1)).weekday()
-                    ]
-                    pred = model.predict(np.array(feat).reshape(1, -1))[0]
-
-                pred = float(np.clip(pred, 0, 10))
-                future_date = datetime.now() + timedelta(days=day + 1)
-                predictions.append({
-                    'date': future_date.strftime('%Y-%m-%d'),
-                    'predicted_risk': round(pred, 2),
-                    'days_ahead': day + 1
-                })
-                current_values.append(pred)
-
-            return predictions
+            log.warning("Global model missing, training on-the-fly fallback", extra={"event": "forecast_tier"})
+            with model_inference_seconds.time("xgboost_on_the_fly"):
+                return self._forecast_on_the_fly(recent_risks, days_ahead, as_of)
 
         except Exception as e:
-            print(f"predict_from_input failed: {e}", file=sys.stderr)
-            import traceback; traceback.print_exc()
+            log.exception("predict_from_input failed: %s", e)
             return None
 
+    def _forecast_global_7lag(self, model, recent_risks, days_ahead, as_of=None):
+        """Global model only takes the last 7 risks (edge-padded when shorter)"""
+        def featurize(history, future_date):
+            inp = np.array(history[-7:], dtype=float).reshape(1, -1)
+            if inp.shape[1] < 7:
+                inp = np.pad(inp, ((0, 0), (7 - inp.shape[1], 0)), 'edge')
+            return inp
+
+        return self._forecast([float(r) for r in recent_risks], days_ahead, featurize, fast_model(model), as_of)
+
+    def _forecast_on_the_fly(self, recent_risks, days_ahead, as_of=None):
+        """Fit a small model on the window itself, then forecast from it"""
+        risks = np.array(recent_risks, dtype=float)
+        now = as_of or datetime.now()
+        X, y = [], []
+        for i in range(2, len(risks)):
+            window = risks[max(0, i-7):i]
+            features = [
+                risks[i-1], risks[i-2] if i >= 2 else risks[0],
+                risks[i-3] if i >= 3 else risks[0], risks[i-4] if i >= 4 else risks[0],
+                risks[i-5] if i >= 5 else risks[0], risks[i-6] if i >= 6 else risks[0],
+                risks[i-7] if i >= 7 else risks[0],
+                np.mean(risks[max(0, i-3):i]), np.mean(window),
+                np.std(risks[max(0, i-3):i]) if i >= 3 else 0,
+                np.std(window) if len(window) > 1 else 0,
+                self._trend(window), now.weekday()
+            ]
+            X.append(features)
+            y.append(risks[i])
+
+        from xgboost import XGBRegressor
+        model = XGBRegressor(n_estimators=50, max_depth=3).fit(np.array(X), np.array(y))
+
+        def featurize(cv, future_date):
+            # Fallback model takes engineered features
+            last_7 = cv[-7:]
+            feat = [
+                cv[-1], cv[-2] if len(cv) >= 2 else cv[0],
+                cv[-3] if len(cv) >= 3 else cv[0], cv[-4] if len(cv) >= 4 else cv[0],
+                cv[-5] if len(cv) >= 5 else cv[0], cv[-6] if len(cv) >= 6 else cv[0],
+                cv[-7] if len(cv) >= 7 else cv[0],
+                np.mean(cv[-3:]), np.mean(last_7),
+                np.std(cv[-3:]) if len(cv) >= 3 else 0,
+                np.std(last_7) if len(last_7) > 1 else 0,
+                self._trend(last_7), future_date.weekday()
+            ]
+            return np.array(feat).reshape(1, -1)
+
+        return self._forecast(list(risks), days_ahead, featurize, model, as_of)
+
     def _trend(self, series):
         """Calculate linear trend slope of a series"""
-        series = list(series)
-        if len(series) < 2:
-            return 0
-        x = np.arange(len(series))
-        coeffs = np.polyfit(x, series, 1)
-        return float(coeffs[0])
-
-    def get_risk_weights(self):
-        """Load and return learned weights for risk components"""
-        try:
-            weight_file = self.model_dir.parent / "weight_models" / "global_weights_xgb.pkl"
-            
-            if not weight_file.exists():
-                print(f"Info: No global weight model found at {weight_file}", file=sys.stderr)
-                return None
-            
-            with open(weight_file, 'rb') as f:
-                data = pickle.load(f)
-                return data.get('weights')
-        except Exception as e:
-            print(f"Error loading global weights: {e}", file=sys.stderr)
-            return None
+        return trend(series)
 
     def predict(self, user_id, days_ahead=7, recent_risks=None):
         """
@@ -210,54 +413,108 @@ class XGBoostPredictor:
             if recent_risks is None or len(recent_risks) == 0:
                 recent_risks = [5.0] * 7
 
-            # --- Try stored model first ---
-            model, scaler = self._load_model(user_id)
-
-            if model is not None:
-                # Use stored model with full feature pipeline
-                while len(recent_risks) < 7:
-                    recent_risks = [recent_risks[0]] + recent_risks
-
-                predictions = []
-                current_values = list(recent_risks)
-
-                for day in range(days_ahead):
-                    features_dict = {}
-
-                    for lag in range(1, 8):
-                        features_dict[f'lag_{lag}'] = current_values[-lag] if lag <= len(current_values) else current_values[0]
-
-                    last_7 = current_values[-7:] if len(current_values) >= 7 else current_values
-                    features_dict['rolling_mean_3'] = np.mean(last_7[-3:]) if len(last_7) >= 3 else np.mean(last_7)
-                    features_dict['rolling_mean_7'] = np.mean(last_7)
-                    features_dict['rolling_std_3'] = np.std(last_7[-3:]) if len(last_7) >= 3 else 0
-                    features_dict['rolling_std_7'] = np.std(last_7) if np.std(last_7) > 0 else 0.1
-                    features_dict['trend_7'] = self._trend(last_7)
+            snapshot = self._snapshot
+            bundle = self._load_global_user_model(snapshot) if FORECAST_MODE == "global" else None
 
-                    future_date = datetime.now() + timedelta(days=day + 1)
-                    features_dict['day_of_week'] = future_date.weekday()
+            # --- Try stored model first ---
+            if bundle is None:
+                model, scaler = self._load_model(user_id, snapshot)
 
-                    X_new = np.array([features_dict[col] for col in self.feature_cols], dtype=float).reshape(1, -1)
-                    X_new_scaled = scaler.transform(X_new)
-                    pred = float(np.clip(model.predict(X_new_scaled)[0], 0, 10))
+                if model is not None:
+                    with model_inference_seconds.time("xgboost_per_user"):
+                        return self._forecast_per_user(model, scaler, recent_risks, days_ahead)
 
-                    predictions.append({
-                        'date': future_date.strftime('%Y-%m-%d'),
-                        'predicted_risk': round(pred, 2),
-                        'days_ahead': day + 1
-                    })
-                    current_values.append(pred)
+                bundle = self._load_global_user_model(snapshot)
 
-                return predictions
+            # --- One cross-user model with per-user summary features ---
+            if bundle is not None:
+                with model_inference_seconds.time("xgboost_global_user"):
+                    return self.predict_global(user_id, recent_risks, days_ahead, bundle)
 
             # --- Fallback: predict from input data (for MongoDB ObjectId users) ---
-            print(f"Info: Using input-based prediction for user {user_id}", file=sys.stderr)
+            log.debug("Using input-based prediction for user %s", user_id, extra={"event": "forecast_tier"})
             return self.predict_from_input(recent_risks=recent_risks, days_ahead=days_ahead)
 
         except Exception as e:
-            print(f"XGBoost prediction error for user {user_id}: {e}", file=sys.stderr)
+            log.error("XGBoost prediction error for user %s: %s", user_id, e)
             return None
 
+    # Forecaster tiers, in the order predict() falls through them
+    TIERS = ("per_user", "global_user", "global_7lag", "on_the_fly")
+
+    def forecast(self, tier, user_id, recent_risks, days_ahead=7, as_of=None):
+        """
+        Forecast with one specific tier (no fallback), e.g. for backtests.
+        Returns None when the tier has no model for this user.
+        """
+        snapshot = self._snapshot
+        if tier == "per_user":
+            model, scaler = self._load_model(user_id, snapshot)
+            return None if model is None else self._forecast_per_user(model, scaler, recent_risks, days_ahead, as_of)
+        if tier == "global_user":
+            bundle = self._load_global_user_model(snapshot)
+            return None if bundle is None else self.predict_global(user_id, recent_risks, days_ahead, bundle, as_of)
+        if tier == "global_7lag":
+            model = self._load_global_model(snapshot)
+            return None if model is None else self._forecast_global_7lag(model, recent_risks, days_ahead, as_of)
+        if tier == "on_the_fly":
+            return self._forecast_on_the_fly(recent_risks, days_ahead, as_of) if len(recent_risks) >= 3 else None
+        raise ValueError(f"Unknown forecaster tier: {tier}")
+
+    def _forecast_per_user(self, model, scaler, recent_risks, days_ahead, as_of=None):
+        """Stored per-user model with the full feature pipeline"""
+        history = list(recent_risks)
+        while len(history) < 7:
+            history = [history[0]] + history
+        transform = fast_transform(scaler)
+        return self._forecast(
+            history, days_ahead,
+            lambda h, future_date: transform(
+                np.array(step_features(h, future_date), dtype=float).reshape(1, -1)
+            ),
+            fast_model(model),
+            as_of,
+        )
+
+    def predict_global(self, user_id, recent_risks, days_ahead=7, bundle=None, as_of=None):
+        """Forecast any user with the single cross-user model"""
+        bundle = bundle or self._load_global_user_model(self._snapshot)
+        user_types = bundle['user_types']
+        user_type = bundle['user_type_by_user'].get(normalize_user_key(user_id))
+        user_type_code = user_types.index(user_type) if user_type in user_types else -1
+
+        history = list(recent_risks)
+        while len(history) < 7:
+            history = [history[0]] + history
+
+        return self._forecast(
+            history, days_ahead,
+            lambda h, future_date: np.array(
+                step_features(h, future_date) + user_summary_features(h, user_type_code), dtype=float
+            ).reshape(1, -1),
+            fast_model(bundle['model']),
+            as_of,
+        )
+
+    @staticmethod
+    def _forecast(history, days_ahead, featurize, model, as_of=None):
+        """
+        Recursive multi-step forecast: each prediction feeds the next step.
+        `as_of` is the last day covered by `history` (default: today).
+        """
+        predictions = []
+        now = as_of or datetime.now()
+        for day in range(days_ahead):
+            future_date = now + timedelta(days=day + 1)
+            pred = float(np.clip(model.predict(featurize(history, future_date))[0], 0, 10))
+            predictions.append({
+                'date': future_date.strftime('%Y-%m-%d'),
+                'predicted_risk': round(pred, 2),
+                'days_ahead': day + 1
+            })
+            history.append(pred)
+        return predictions
+
 
 # Example usage
 if __name__ == "__main__":
@@ -0,0 +1,142 @@
+"""
+Train a single cross-user XGBoost forecaster.
+
+Replaces one-pickle-per-user models with one booster trained on every
+user's history. Each row uses the same per-step features the per-user
+models are served with (lags, rolling stats, trend, day of week) plus
+per-user summary features: recent mean, recent volatility and user_type
+from checkin_context.csv. Features are computed from the history strictly
+before the target day, exactly as they are at serving time.
+"""
+
+import pandas as pd
+import numpy as np
+from pathlib import Path
+import pickle
+import warnings
+warnings.filterwarnings('ignore')
+
+try:
+    from xgboost import XGBRegressor
+    from sklearn.metrics import mean_absolute_error, mean_squared_error
+except ImportError:
+    print("ERROR: Missing required packages. Install with:")
+    print("pip install xgboost scikit-learn")
+    exit(1)
+
+from services.model_store import store
+from services.xgboost_service import (
+    GLOBAL_USER_FEATURE_COLS, GLOBAL_USER_MODEL_FILE,
+    normalize_user_key, step_features, user_summary_features,
+)
+
+DATA_DIR = Path("data/training_data")
+
+# Share of rows whose user_type is hidden during training, so the model
+# also learns to forecast users we have no context for (e.g. new signups)
+UNKNOWN_TYPE_RATE = 0.1
+
+
+def load_user_types(context_file=DATA_DIR / "checkin_context.csv"):
+    """Map user key -> user_type, plus the ordered list of known types"""
+    if not Path(context_file).exists():
+        return {}, []
+    ctx = pd.read_csv(context_file, usecols=['user_id', 'user_type'])
+    by_user = ctx.groupby('user_id')['user_type'].agg(lambda s: s.mode().iloc[0])
+    user_type_by_user = {normalize_user_key(uid): t for uid, t in by_user.items()}
+    return user_type_by_user, sorted(set(user_type_by_user.values()))
+
+
+def build_dataset(df, user_type_by_user, user_types, split=0.8, seed=42):
+    """
+    Build (X, y) for every user. The first `split` of each user's days go
+    to train, the rest to test, so the holdout matches the per-user models.
+
+    Returns:
+        X_train, y_train, X_test, y_test
+    """
+    rng = np.random.default_rng(seed)
+    train_X, train_y, test_X, test_y = [], [], [], []
+
+    for user_id, user_data in df.groupby('user_id'):
+        user_data = user_data.sort_values('date')
+        risks = user_data['risk_score'].astype(float).tolist()
+        dates = pd.to_datetime(user_data['date']).tolist()
+        user_type = user_type_by_user.get(normalize_user_key(user_id))
+        code = user_types.index(user_type) if user_type in user_types else -1
+        split_point = int(len(risks) * split)
+
+        for i in range(7, len(risks)):
+            history = risks[:i]
+            row_code = -1 if rng.random() < UNKNOWN_TYPE_RATE else code
+            row = step_features(history, dates[i]) + user_summary_features(history, row_code)
+            if i < split_point:
+                train_X.append(row)
+                train_y.append(risks[i])
+            else:
+                test_X.append(row)
+                test_y.append(risks[i])
+
+    return (np.array(train_X, dtype=float), np.array(train_y),
+            np.array(test_X, dtype=float), np.array(test_y))
+
+
+def fit_global_model(X, y):
+    model = XGBRegressor(
+        n_estimators=300,
+        max_depth=6,
+        learning_rate=0.05,
+        subsample=0.8,
+        colsample_bytree=0.8,
+        random_state=42,
+        verbosity=0
+    )
+    model.fit(X, y)
+    return model
+
+
+def main():
+    print("=" * 80)
+    print("TRAINING GLOBAL CROSS-USER FORECAST MODEL")
+    print("=" * 80)
+
+    print("\n[1/4] Loading training data...")
+    df = pd.read_csv(DATA_DIR / "risk_timeseries.csv")
+    user_type_by_user, user_types = load_user_types()
+    print(f"✓ Loaded {len(df)} records for {df['user_id'].nunique()} users")
+    print(f"✓ User types: {user_types}")
+
+    print("\n[2/4] Building features...")
+    X_train, y_train, X_test, y_test = build_dataset(df, user_type_by_user, user_types)
+    print(f"✓ {len(X_train)} train rows, {len(X_test)} holdout rows, {len(GLOBAL_USER_FEATURE_COLS)} features")
+
+    print("\n[3/4] Training and evaluating...")
+    model = fit_global_model(X_train, y_train)
+    predictions = model.predict(X_test)
+    mae = mean_absolute_error(y_test, predictions)
+    rmse = np.sqrt(mean_squared_error(y_test, predictions))
+    print(f"✓ Holdout MAE={mae:.3f}, RMSE={rmse:.3f}")
+
+    # Production model is refit on every row
+    model = fit_global_model(np.vstack([X_train, X_test]), np.concatenate([y_train, y_test]))
+
+    print("\n[4/4] Publishing model version...")
+    with store.staged("xgboost_models") as stage_dir:
+        with open(stage_dir / GLOBAL_USER_MODEL_FILE, 'wb') as f:
+            pickle.dump({
+                'model': model,
+                'feature_cols': GLOBAL_USER_FEATURE_COLS,
+                'user_types': user_types,
+                'user_type_by_user': user_type_by_user,
+            }, f)
+        version = store.publish({"xgboost_models": stage_dir}, metrics={
+            'global_user_model': {'holdout_mae': float(mae), 'holdout_rmse': float(rmse),
+                                  'train_rows': int(len(X_train) + len(X_test))},
+        })
+
+    print(f"✓ Global forecaster published as model version {version}")
+    print("\nTo serve every user through it, set FORECAST_MODE=global")
+
+
+if __name__ == "__main__":
+    main()
@@ -9,10 +9,10 @@ from pathlib import Path
 import pickle
 from xgboost import XGBRegressor
 from sklearn.preprocessing import StandardScaler
+from services.model_store import store
+from services.risk_weights import weights_artifact, write_weights_artifact
 
 DATA_DIR = Path("data/training_data")
-MODEL_DIR = Path("models/weight_models")
-MODEL_DIR.mkdir(parents=True, exist_ok=True)
 
 def train_weight_model():
     print("=" * 80)
@@ -70,16 +70,20 @@ def train_weight_model():
         print(f"  {k:25}: {v:.3f}")
     print("-" * 40)
     
-    # 5. Save model and metadata
-    model_file = MODEL_DIR / "global_weights_xgb.pkl"
-    with open(model_file, 'wb') as f:
-        pickle.dump({
-            'model': model,
-            'feature_cols': feature_cols,
-            'weights': weight_dict
-        }, f)
+    # 5. Save model and metadata as a new model version
+    with store.staged("weight_models") as stage_dir:
+        model_file = stage_dir / "global_weights_xgb.pkl"
+        with open(model_file, 'wb') as f:
+            pickle.dump({
+                'model': model,
+                'feature_cols': feature_cols,
+                'weights': weight_dict
+            }, f)
+        # What the server actually reads: the weights alone, without the booster
+        write_weights_artifact(stage_dir, weights_artifact(weight_dict, feature_cols))
+        version = store.publish({"weight_models": stage_dir}, metrics={'weights': weight_dict})
     
-    print(f"\n✓ Weights model saved to {model_file}")
+    print(f"\n✓ Weights model saved to model version {version}")
 
 if __name__ == "__main__":
     train_weight_model()
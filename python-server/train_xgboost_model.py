@@ -20,9 +20,9 @@ except ImportError:
     print("pip install xgboost scikit-learn")
     exit(1)
 
+from services.model_store import store
+
 DATA_DIR = Path("data/training_data")
-MODEL_DIR = Path("models/xgboost_models")
-MODEL_DIR.mkdir(parents=True, exist_ok=True)
 
 
 def create_features(df, user_id, lags=7):
@@ -158,27 +158,34 @@ def train_xgboost_per_user(df):
 
 
 def save_models(models, scalers, metrics):
-    """Save trained models and scalers to disk"""
+    """Save trained models and scalers as a new version in the model store"""
     
-    # Save individual models
-    for user_id, model in models.items():
-        model_file = MODEL_DIR / f"user_{user_id}_xgb.pkl"
-        with open(model_file, 'wb') as f:
-            pickle.dump(model, f)
+    with store.staged("xgboost_models") as stage_dir:
+        # Save individual models
+        for user_id, model in models.items():
+            model_file = stage_dir / f"user_{user_id}_xgb.pkl"
+            with open(model_file, 'wb') as f:
+                pickle.dump(model, f)
+            
+            # Save scaler
+            scaler_file = stage_dir / f"user_{user_id}_scaler.pkl"
+            with open(scaler_file, 'wb') as f:
+                pickle.dump(scalers[user_id], f)
         
-        # Save scaler
-        scaler_file = MODEL_DIR / f"user_{user_id}_scaler.pkl"
-        with open(scaler_file, 'wb') as f:
-            pickle.dump(scalers[user_id], f)
-    
-    # Save metrics
-    metrics_df = pd.DataFrame(metrics).T
-    metrics_file = MODEL_DIR / "xgboost_metrics.csv"
-    metrics_df.to_csv(metrics_file)
+        # Save metrics
+        metrics_df = pd.DataFrame(metrics).T
+        metrics_df.to_csv(stage_dir / "xgboost_metrics.csv")
+        
+        succeeded = metrics_df[metrics_df['status'] == 'success'] if 'status' in metrics_df else metrics_df
+        version = store.publish({"xgboost_models": stage_dir}, metrics={
+            'per_user_models': len(models),
+            'mean_mae': float(succeeded['mae'].mean()) if len(succeeded) else None,
+            'mean_rmse': float(succeeded['rmse'].mean()) if len(succeeded) else None,
+        })
     
-    print(f"\n✓ Saved {len(models)} XGBoost models to {MODEL_DIR}")
-    print(f"✓ Saved {len(scalers)} scalers to {MODEL_DIR}")
-    print(f"✓ Saved metrics to {metrics_file}")
+    print(f"\n✓ Saved {len(models)} XGBoost models to model version {version}")
+    print(f"✓ Saved {len(scalers)} scalers to model version {version}")
+    print(f"✓ Active models: {store.version_dir(version) / 'xgboost_models'}")
 
 
 def predict_future_risk(user_id, model, scaler, last_values, feature_cols, days_ahead=7):
@@ -283,7 +290,7 @@ def main():
     
     print("\n" + "=" * 80)
     print("✓ XGBoost training complete!")
-    print(f"✓ Models ready for prediction at: {MODEL_DIR}")
+    print(f"✓ Models ready for prediction at: {store.version_dir() / 'xgboost_models'}")
     print("\nTo use in production:")
     print("  from services.xgboost_service import XGBoostPredictor")
     print("  predictor = XGBoostPredictor()")
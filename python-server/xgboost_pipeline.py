@@ -6,6 +6,9 @@ from xgboost import XGBRegressor
 import matplotlib.pyplot as plt
 from dotenv import load_dotenv
 from datetime import datetime, timedelta
+from contextlib import ExitStack
+from services.model_store import store
+from services.risk_weights import weights_artifact, write_weights_artifact
 
 load_dotenv(os.path.join(os.path.dirname(__file__), "..", "server", ".env"))
 MONGO_URI = os.getenv("MONGO_URI")
@@ -17,8 +20,10 @@ def run_soulsync_ai_pipeline():
     2. Augment with Gaussian Noise
     3. Train Weight Model (What matters now)
     4. Train Forecast Model (What happens next)
+    5. Publish weights + forecast model together as one model version
     """
 
+    stages = ExitStack()
     
     # DATA
     print("\nFetching from MongoDB...")
@@ -99,8 +104,7 @@ def run_soulsync_ai_pipeline():
         
         # SAVE WEIGHTS FOR PRODUCTION SERVICES (Python API)
         import pickle
-        weight_dir = os.path.join(os.path.dirname(__file__), "models", "weight_models")
-        os.makedirs(weight_dir, exist_ok=True)
+        weight_dir = stages.enter_context(store.staged("weight_models"))
         weight_path = os.path.join(weight_dir, "global_weights_xgb.pkl")
         
         weight_data = {
@@ -111,7 +115,11 @@ def run_soulsync_ai_pipeline():
         
         with open(weight_path, 'wb') as f:
             pickle.dump(weight_data, f)
-        print(f"Weights saved to: {weight_path}")
+        # What the server actually reads (preferred over the pickle); the staged
+        # copy of the previous version's artifact must not outlive its weights
+        write_weights_artifact(weight_dir, weights_artifact(weight_data['weights'], list(features),
+                                                            trained_at=weight_data['updated_at']))
+        print(f"Weights staged at: {weight_path}")
 
         # --- DYNAMIC UPDATE: Overwrite riskConfig.js in Editor ---
         print("Syncing new weights to Node.js riskConfig.js...")
@@ -159,13 +167,17 @@ def run_soulsync_ai_pipeline():
         forecast_model.fit(np.array(X_f), np.array(y_f))
 
         # SAVE FORECAST MODEL FOR PRODUCTION SERVICES
-        model_dir = os.path.join(os.path.dirname(__file__), "models", "xgboost_models")
-        os.makedirs(model_dir, exist_ok=True)
+        model_dir = stages.enter_context(store.staged("xgboost_models"))
         # Using a generic name or 'global' for the fallback model
         forecast_path = os.path.join(model_dir, "global_forecast_xgb.pkl")
         with open(forecast_path, 'wb') as f:
             pickle.dump(forecast_model, f)
-        print(f"Forecast model saved to: {forecast_path}")
+
+        version = store.publish(
+            {"weight_models": weight_dir, "xgboost_models": model_dir},
+            metrics={'weights': weight_data['weights'], 'training_records': len(df_train)},
+        )
+        print(f"Weights + forecast model published as model version: {version}")
         
         # --- STAGE 4: VISUALIZATION ---
         print("\nGenerating Results Visualization...")
@@ -204,6 +216,8 @@ def run_soulsync_ai_pipeline():
         print(f"\nPIPELINE ERROR: {e}")
         import traceback
         traceback.print_exc()
+    finally:
+        stages.close()
 
 if __name__ == "__main__":
     run_soulsync_ai_pipeline()
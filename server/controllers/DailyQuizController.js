@@ -274,7 +274,8 @@ export const submitDailyQuiz = async (req, res) => {
             `${process.env.PYTHON_SERVER}/sentiment/analyze`,
             {
               method: "POST",
-              headers: { "Content-Type": "application/json" },
+              // live check-in: admitted ahead of bulk (journal) scoring
+              headers: { "Content-Type": "application/json", "X-Priority": "high" },
               body: JSON.stringify({ text: userAnswer }),
             }
           );
@@ -653,7 +654,7 @@ export const getAdaptiveQuiz = async (req, res) => {
           headers: { "Content-Type": "application/json" },
           body: JSON.stringify({
             category_scores: categoryScores,
-            base_questions: defaultDailyQuiz.questions,
+            // base quiz is resolved server-side from the same dailyCheckinQuiz.json
             user_id: userId,
             today: today,
           }),
@@ -212,24 +212,45 @@ const getClinicalAssistance = (riskLevel, consecutiveHighRiskDays, alerts) => {
 };
 
 // ── DYNAMIC WEIGHTS via XGBoost ─────────────────────────────────────────────
+// The cached copy is revalidated with its ETag every few minutes, so retrained
+// weights are picked up quickly; an unchanged copy costs a 304 with no body.
+const WEIGHTS_REVALIDATE_MS = 5 * 60 * 1000;
+
 const getDynamicWeights = async () => {
   const cacheKey = "config:risk_weights";
-  let weights = await getCache(cacheKey);
-  if (weights) return weights;
+  const cached = await getCache(cacheKey);
+  if (cached?.weights && Date.now() - cached.checkedAt < WEIGHTS_REVALIDATE_MS) return cached.weights;
 
   try {
-    const res = await fetch(`${process.env.PYTHON_SERVER}/api/risk-weights`);
+    const res = await fetch(`${process.env.PYTHON_SERVER}/api/risk-weights`, {
+      headers: cached?.etag ? { "If-None-Match": cached.etag } : {},
+    });
+    if (res.status === 304 && cached?.weights) {
+      await setCache(cacheKey, { ...cached, checkedAt: Date.now() }, 86400);
+      return cached.weights;
+    }
     if (!res.ok) throw new Error(`FastAPI ${res.status}`);
-    weights = await res.json();
-    console.log("📈 [XGBoost] Fetched dynamic weights:", weights);
-    await setCache(cacheKey, weights, 86400); // 24h cache
+    const weights = await res.json();
+    console.log("📈 [XGBoost] Fetched dynamic weights:", res.headers.get("etag"), weights);
+    await setCache(cacheKey, { weights, etag: res.headers.get("etag"), checkedAt: Date.now() }, 86400);
     return weights;
   } catch (err) {
+    if (cached?.weights) return cached.weights; // keep the last known weights while FastAPI is down
     console.warn("⚠️ [XGBoost] Weights unavailable, using hardcoded fallback:", err.message);
     return RISK_WEIGHTS;
   }
 };
 
+// ── Online forecast model refresh via FastAPI ──────────────────────────────
+// Fire-and-forget: the Python service debounces and refits in the background.
+const pushRiskScore = (userId, date, overallScore) => {
+  fetch(`${process.env.PYTHON_SERVER}/api/risk-scores`, {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify({ user_id: String(userId), date, risk_score: overallScore * 10 }),
+  }).catch((err) => console.warn("⚠️ [XGBoost] Risk score ingest failed:", err.message));
+};
+
 // ── LLM via FastAPI ─────────────────────────────────────────────────────────
 const getLLMResult = async (payload) => {
   try {
@@ -248,6 +269,7 @@ const getLLMResult = async (payload) => {
     return {
       motivational_message: getStaticMotivationalMessage(payload.risk_level),
       coping_steps: staticSteps.length > 0 ? staticSteps : ["Take a moment to breathe deeply", "Check in with a trusted friend or counselor"],
+      fallback: true,
     };
   }
 };
@@ -496,8 +518,8 @@ export const calculateOverallRisk = async (req, res) => {
         consecutive_high_risk_days: consecutiveHighRiskDays,
       });
       console.log("🤖 [LLM] Got response:", llmResult);
-      // Only cache if it's a successful response (has motivational_message from API)
-      if (llmResult.motivational_message && llmResult.motivational_message !== null) {
+      // Only cache if it's a successful response (not a static or circuit-breaker fallback)
+      if (llmResult.motivational_message && !llmResult.fallback) {
         console.log("💾 [LLM] Caching successful API response");
         await setCache(llmCacheKey, llmResult, 86400);
       } else {
@@ -536,6 +558,7 @@ export const calculateOverallRisk = async (req, res) => {
       },
       { upsert: true, new: true }
     );
+    pushRiskScore(userId, today, overallScore);
 
     const response = {
       daily: {
@@ -125,7 +125,9 @@ export const createChat = async (req, res) => {
                 log("[createChat] Calling sentiment API at: " + process.env.PYTHON_SERVER);
                 const response = await axios.post(
                     `${process.env.PYTHON_SERVER}/sentiment/analyze`,
-                    { text }
+                    { text },
+                    // live chat: admitted ahead of bulk (journal) scoring
+                    { headers: { "X-Priority": "high" } }
                 );
                 sentimentScore = Math.max(sentimentScore, response.data.paragraphScore ?? 0);
                 log("[createChat] Sentiment Score from API: " + sentimentScore);
@@ -330,7 +332,8 @@ export const updateChat = async (req, res) => {
                 log("[updateChat] Calling sentiment API...");
                 const response = await axios.post(
                     `${process.env.PYTHON_SERVER}/sentiment/analyze`,
-                    { text: question }
+                    { text: question },
+                    { headers: { "X-Priority": "high" } }
                 );
                 sentimentScore = Math.max(sentimentScore, response.data.paragraphScore ?? 0);
                 log("[updateChat] Sentiment Score from API: " + sentimentScore);